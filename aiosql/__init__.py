@@ -1,7 +1,7 @@
-from .aiosql import from_path, from_str, register_adapter
+from .aiosql import from_path, from_str, register_adapter, run_script
 from .utils import SQLParseException, SQLLoadException
 from importlib.metadata import version
 
 __version__ = version("aiosql")
 
-__all__ = ["from_path", "from_str", "register_adapter", "SQLParseException", "SQLLoadException"]
+__all__ = ["from_path", "from_str", "register_adapter", "run_script", "SQLParseException", "SQLLoadException"]
@@ -3,6 +3,7 @@ from contextlib import asynccontextmanager
 
 class AioSQLiteAdapter:
     is_aio_driver = True
+    explain = "EXPLAIN QUERY PLAN"
 
     def process_sql(self, _query_name, _op_type, sql):
         """Pass through function because the ``aiosqlite`` driver can already handle the
@@ -63,3 +64,14 @@ class AioSQLiteAdapter:
     async def execute_script(self, conn, sql):
         await conn.executescript(sql)
         return "DONE"
+
+    async def execute_statement(self, conn, sql):
+        """Execute one statement of a script, unlike ``executescript`` it does not commit."""
+        async with conn.execute(sql):
+            return "DONE"
+
+    async def load_list(self, conn, table, values, sql_type):
+        """Load values in an emptied temporary table, for a large list parameter."""
+        await conn.execute(f"CREATE TEMPORARY TABLE IF NOT EXISTS {table}(value {sql_type})")
+        await conn.execute(f"DELETE FROM {table}")
+        await conn.executemany(f"INSERT INTO {table}(value) VALUES (?)", [(value,) for value in values])
@@ -1,11 +1,129 @@
+from contextlib import asynccontextmanager
+from typing import Any
+
 from .ageneric import AsyncGenericAdapter
-from .pyformat import _replacer
+from .pyformat import _replacer, _pipeline_result, _FETCH_OPS
+from ..types import SQLOperationType
 from ..utils import VAR_REF
+from ..export import byte_writer, export_sql, open_dest
+
+
+class AsyncDeferred:
+    """Result of a query queued in an asynchronous pipeline.
+
+    The value is fetched on the first ``await deferred`` or ``await deferred.result()``,
+    which forces a pipeline synchronization if needed, and on pipeline exit otherwise.
+    """
+
+    def __init__(self, cur, operation, record_class=None):
+        self._cur: Any = cur
+        self._operation = operation
+        self._record_class = record_class
+        self._done = False
+        self._value = None
+
+    async def result(self):
+        """Return the query result, fetching it if necessary."""
+        if not self._done:
+            cur = self._cur
+            try:
+                row = await cur.fetchone() if self._operation in _FETCH_OPS else None
+                self._value = _pipeline_result(cur, self._operation, self._record_class, row)
+            finally:
+                await self._close()
+            self._done = True
+        return self._value
+
+    def __await__(self):
+        return self.result().__await__()
+
+    async def _close(self):
+        if self._cur is not None:
+            await self._cur.close()
+            self._cur = None
+
+
+class AsyncPyFormatPipeline:
+    """Queue queries on an asynchronous psycopg 3 connection in pipeline mode."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._pending = []
+
+    async def defer(self, operation, sql, parameters, record_class=None) -> AsyncDeferred:
+        """Send a query and return its deferred result."""
+        cur = self.conn.cursor()
+        try:
+            if operation == SQLOperationType.INSERT_UPDATE_DELETE_MANY:
+                await cur.executemany(sql, parameters)
+            elif operation == SQLOperationType.SCRIPT:
+                await cur.execute(sql)
+            else:
+                await cur.execute(sql, parameters)
+        except BaseException:
+            await cur.close()
+            raise
+        deferred = AsyncDeferred(cur, operation, record_class)
+        self._pending.append(deferred)
+        return deferred
+
+    async def sync(self):
+        """Fetch all pending results."""
+        for deferred in self._pending:
+            await deferred.result()
+        self._pending.clear()
+
+    async def close(self):
+        """Release cursors of unresolved results."""
+        for deferred in self._pending:
+            await deferred._close()
+        self._pending.clear()
 
 
 class AsyncPyFormatAdapter(AsyncGenericAdapter):
     """Convert from named to pyformat parameter style."""
 
+    # rewrite "x IN (:v*:ids)" as "x = ANY(:ids)"
+    array_binding = True
+
+    async def load_list(self, conn, table, values, sql_type):
+        """Load values in an emptied temporary table with COPY."""
+        async with conn.cursor() as cur:
+            await cur.execute(f"CREATE TEMPORARY TABLE IF NOT EXISTS {table}(value {sql_type})")
+            await cur.execute(f"TRUNCATE {table}")
+            async with cur.copy(f"COPY {table}(value) FROM STDIN") as copy:
+                for value in values:
+                    await copy.write_row((value,))
+
+    async def export(self, conn, query_name, sql, parameters, dest, file_format, batch_size):
+        """Write the result of a select to a CSV file with ``COPY … TO STDOUT``, or return None."""
+        if file_format != "csv":
+            return None
+        copy = f"COPY (\n{export_sql(sql)}\n) TO STDOUT (FORMAT csv, HEADER)"
+        async with conn.cursor() as cur:
+            with open_dest(dest, True) as out:
+                write = byte_writer(out)
+                async with cur.copy(copy, parameters) as data:
+                    async for chunk in data:
+                        write(chunk)
+            return cur.rowcount
+
     def process_sql(self, query_name, op_type, sql):
         """From named to pyformat."""
         return VAR_REF.sub(_replacer, sql)
+
+    @asynccontextmanager
+    async def pipeline(self, conn):
+        """Run queries in psycopg 3 pipeline mode, yielding an ``AsyncPyFormatPipeline``.
+
+        All pending results are fetched when leaving the context.
+        """
+        if not hasattr(conn, "pipeline"):
+            raise ValueError(f"pipeline mode requires a psycopg 3 connection, got {type(conn)}")
+        pipe = AsyncPyFormatPipeline(conn)
+        try:
+            async with conn.pipeline():
+                yield pipe
+            await pipe.sync()
+        finally:
+            await pipe.close()
@@ -2,29 +2,40 @@ from collections import defaultdict
 from contextlib import asynccontextmanager
 
 from ..utils import VAR_REF
+from ..export import RowWriter, byte_writer, open_dest
+from ..pool import _APROVIDERS, _async_connection_provider
 
 
 class MaybeAcquire:
+    """Borrow a connection if client is a pool, pool detection is cached per type."""
+
     def __init__(self, client, driver=None):
         self.client = client
         self._driver = driver
+        self._borrowed = None
 
     async def __aenter__(self):
-        if "acquire" in dir(self.client):
-            self._managed_conn = await self.client.acquire()
-            return self._managed_conn
-        else:
-            self._managed_conn = None
-            return self.client
+        client = self.client
+        try:
+            provider = _APROVIDERS[type(client)]
+        except KeyError:
+            provider = _async_connection_provider(type(client))
+        if provider is None:
+            return client
+        self._borrowed = provider(client)
+        return await self._borrowed.__aenter__()
 
     async def __aexit__(self, exc_type, exc, tb):
-        if self._managed_conn is not None:
-            await self.client.release(self._managed_conn)
+        if self._borrowed is not None:
+            await self._borrowed.__aexit__(exc_type, exc, tb)
 
 
 class AsyncPGAdapter:
     is_aio_driver = True
 
+    # rewrite "x IN (:v*:ids)" as "x = ANY(:ids)"
+    array_binding = True
+
     def __init__(self):
         self.var_sorted = defaultdict(list)
 
@@ -127,3 +138,36 @@ class AsyncPGAdapter:
     async def execute_script(self, conn, sql):
         async with MaybeAcquire(conn) as connection:
             return await connection.execute(sql)
+
+    async def export(self, conn, query_name, sql, parameters, dest, file_format, batch_size):
+        """Write the result of a select to a file, with ``COPY … TO STDOUT`` for CSV."""
+        parameters = self.maybe_order_params(query_name, parameters)
+        async with MaybeAcquire(conn) as connection:
+            if file_format == "csv":
+                with open_dest(dest, True) as out:
+                    write = byte_writer(out)
+
+                    async def output(data):
+                        write(data)
+
+                    status = await connection.copy_from_query(
+                        sql, *parameters, output=output, format="csv", header=True
+                    )
+                return int(status.rpartition(" ")[2])
+            stmt = await connection.prepare(sql)
+            writer = RowWriter(dest, file_format, [a.name for a in stmt.get_attributes()])
+            with writer.open():
+                async with connection.transaction():
+                    cursor = await stmt.cursor(*parameters)
+                    while rows := await cursor.fetch(batch_size):
+                        writer.write([tuple(row) for row in rows])
+            return writer.rows
+
+    async def load_list(self, conn, table, values, sql_type):
+        """Load values in an emptied temporary table with COPY."""
+        async with MaybeAcquire(conn) as connection:
+            await connection.execute(f"CREATE TEMPORARY TABLE IF NOT EXISTS {table}(value {sql_type})")
+            await connection.execute(f"TRUNCATE {table}")
+            await connection.copy_records_to_table(
+                table, records=[(value,) for value in values], columns=["value"]
+            )
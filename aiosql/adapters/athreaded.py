@@ -0,0 +1,229 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from itertools import islice
+from typing import Any, Callable
+
+from ..types import SyncDriverAdapterProtocol
+
+
+class ThreadedConnection:
+    """Asynchronous facade over a synchronous connection.
+
+    All calls on the connection are run by a dedicated worker thread, so that
+    a slow query does not block the event loop. Create instances with ``connect``
+    so that the connection is also opened by the worker thread.
+
+    - :param conn: the synchronous connection.
+    - :param executor: the single-thread executor which owns it.
+    """
+
+    def __init__(self, conn: Any, executor: ThreadPoolExecutor|None = None):
+        self.connection = conn
+        self._executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="aiosql")
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run ``fn(*args, **kwargs)`` in the worker thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    async def cursor(self) -> "ThreadedCursor":
+        """Return a cursor whose methods are run in the worker thread."""
+        # drivers such as sqlite3 check that cursors are created by the connection thread
+        return ThreadedCursor(self, await self.run(self.connection.cursor))
+
+    async def commit(self) -> None:
+        # apsw connections in autocommit mode have no commit nor rollback
+        if hasattr(self.connection, "commit"):
+            await self.run(self.connection.commit)
+
+    async def rollback(self) -> None:
+        if hasattr(self.connection, "rollback"):
+            await self.run(self.connection.rollback)
+
+    async def close(self) -> None:
+        """Close the connection and stop the worker thread."""
+        try:
+            await self.run(self.connection.close)
+        finally:
+            self._executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+async def connect(connect: Callable[..., Any], *args, **kwargs) -> ThreadedConnection:
+    """Open a synchronous connection in a new worker thread.
+
+    For instance ``await connect(sqlite3.connect, "db.sqlite")``.
+    """
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="aiosql")
+    loop = asyncio.get_running_loop()
+    try:
+        conn = await loop.run_in_executor(executor, functools.partial(connect, *args, **kwargs))
+    except BaseException:
+        executor.shutdown(wait=False)
+        raise
+    return ThreadedConnection(conn, executor)
+
+
+class ThreadedCursor:
+    """Asynchronous facade over a synchronous cursor, iterated in batches."""
+
+    def __init__(self, conn: ThreadedConnection, cursor: Any, batch_size: int = 100):
+        self._conn = conn
+        self.cursor = cursor
+        self.batch_size = batch_size
+
+    @property
+    def description(self):
+        return self.cursor.description
+
+    @property
+    def rowcount(self):
+        return self.cursor.rowcount
+
+    async def execute(self, sql, parameters=()):
+        await self._conn.run(self.cursor.execute, sql, parameters)
+        return self
+
+    async def fetchone(self):
+        return await self._conn.run(self.cursor.fetchone)
+
+    async def fetchmany(self, size: int|None = None):
+        size = self.batch_size if size is None else size
+        return await self._conn.run(self.cursor.fetchmany, size)
+
+    async def fetchall(self):
+        return await self._conn.run(self.cursor.fetchall)
+
+    async def close(self):
+        await self._conn.run(self.cursor.close)
+
+    async def __aiter__(self):
+        while True:
+            rows = await self.fetchmany()
+            for row in rows:
+                yield row
+            if len(rows) < self.batch_size:
+                break
+
+
+def _next_batch(rows, size: int) -> list[Any]:
+    return list(islice(rows, size))
+
+
+class AsyncThreadedAdapter:
+    """Turn a synchronous driver adapter into an asynchronous one.
+
+    Connections must be ``ThreadedConnection`` instances, see ``connect``.
+    Rows of ``select`` queries are streamed back in batches of ``batch_size``.
+
+    - :param adapter: synchronous adapter class or factory.
+    - :param batch_size: number of rows transferred at once from the worker thread.
+    - other parameters are passed to the adapter factory.
+    """
+
+    is_aio_driver = True
+
+    def __init__(
+            self, adapter: Callable[..., SyncDriverAdapterProtocol], *args, batch_size: int = 100, **kwargs
+    ):
+        self._adapter = adapter(*args, **kwargs)
+        self.batch_size = batch_size
+        self.explain = getattr(self._adapter, "explain", "EXPLAIN")
+        self.identifier_quote = getattr(self._adapter, "identifier_quote", '"')
+        self.array_binding = getattr(self._adapter, "array_binding", False)
+        self.row_limit = getattr(self._adapter, "row_limit", "LIMIT")
+        self.backslash_escapes = getattr(self._adapter, "backslash_escapes", False)
+
+    def _check(self, conn) -> ThreadedConnection:
+        if not isinstance(conn, ThreadedConnection):
+            raise ValueError(f"expecting a ThreadedConnection, got {type(conn)}")
+        return conn
+
+    def process_sql(self, query_name, op_type, sql):
+        return self._adapter.process_sql(query_name, op_type, sql)
+
+    # this is an asynchronous generator
+    async def select(self, conn, query_name, sql, parameters, record_class=None):
+        tconn = self._check(conn)
+        # the generator is created, advanced and closed in the worker thread
+        rows = await tconn.run(
+            lambda: iter(self._adapter.select(tconn.connection, query_name, sql, parameters, record_class))
+        )
+        try:
+            while True:
+                batch = await tconn.run(_next_batch, rows, self.batch_size)
+                for row in batch:
+                    yield row
+                if len(batch) < self.batch_size:
+                    break
+        finally:
+            if hasattr(rows, "close"):
+                await tconn.run(rows.close)
+
+    async def select_one(self, conn, query_name, sql, parameters, record_class=None):
+        tconn = self._check(conn)
+        return await tconn.run(
+            self._adapter.select_one, tconn.connection, query_name, sql, parameters, record_class
+        )
+
+    async def select_value(self, conn, query_name, sql, parameters):
+        tconn = self._check(conn)
+        return await tconn.run(self._adapter.select_value, tconn.connection, query_name, sql, parameters)
+
+    @asynccontextmanager
+    async def select_cursor(self, conn, query_name, sql, parameters):
+        tconn = self._check(conn)
+        ctx = self._adapter.select_cursor(tconn.connection, query_name, sql, parameters)
+        cur = await tconn.run(ctx.__enter__)
+        try:
+            yield ThreadedCursor(tconn, cur, self.batch_size)
+        except BaseException as e:
+            if not await tconn.run(ctx.__exit__, type(e), e, e.__traceback__):
+                raise
+        else:
+            await tconn.run(ctx.__exit__, None, None, None)
+
+    async def insert_returning(self, conn, query_name, sql, parameters):
+        tconn = self._check(conn)
+        return await tconn.run(self._adapter.insert_returning, tconn.connection, query_name, sql, parameters)
+
+    async def insert_update_delete(self, conn, query_name, sql, parameters):
+        tconn = self._check(conn)
+        return await tconn.run(
+            self._adapter.insert_update_delete, tconn.connection, query_name, sql, parameters
+        )
+
+    async def insert_update_delete_many(self, conn, query_name, sql, parameters):
+        tconn = self._check(conn)
+        return await tconn.run(
+            self._adapter.insert_update_delete_many, tconn.connection, query_name, sql, parameters
+        )
+
+    async def execute_script(self, conn, sql):
+        tconn = self._check(conn)
+        return await tconn.run(self._adapter.execute_script, tconn.connection, sql)
+
+    async def execute_statement(self, conn, sql):
+        tconn = self._check(conn)
+        execute = getattr(self._adapter, "execute_statement", self._adapter.execute_script)
+        return await tconn.run(execute, tconn.connection, sql)
+
+    async def export(self, conn, query_name, sql, parameters, dest, file_format, batch_size):
+        tconn = self._check(conn)
+        export = getattr(self._adapter, "export", None)
+        if export is None:
+            return None
+        return await tconn.run(
+            export, tconn.connection, query_name, sql, parameters, dest, file_format, batch_size
+        )
+
+    async def load_list(self, conn, table, values, sql_type):
+        tconn = self._check(conn)
+        return await tconn.run(self._adapter.load_list, tconn.connection, table, values, sql_type)  # type: ignore
@@ -1,6 +1,13 @@
+import threading
+from pathlib import Path
+
 from .generic import GenericAdapter
+from ..export import export_sql
 from ..utils import VAR_REF
 
+# COPY options per export format
+_COPY_OPTIONS = {"csv": "FORMAT csv, HEADER", "jsonl": "FORMAT json", "parquet": "FORMAT parquet"}
+
 
 def _colon_to_dollar(ma) -> str:
     """Convert 'WHERE :id = 1' to 'WHERE $id = 1'."""
@@ -21,11 +28,18 @@ class DuckDBAdapter(GenericAdapter):
         # whether to converts the default tuple response to a dict.
         self._convert_row_to_dict = cursor_as_dict
         self._use_cursor = use_cursor
+        # cursor holding the lists loaded for the next query of the thread, see load_list
+        self._loaded = threading.local()
 
     def _cursor(self, conn):
-        """Get a cursor from a connection."""
+        """Get a cursor from a connection, or the one which holds the lists just loaded."""
         # For DuckDB cursor is duplicated connection so we don't want to use it
         if self._use_cursor:
+            loaded = self._loaded.__dict__.pop("cursor", None)
+            if loaded is not None and loaded[0] is conn:
+                return loaded[1]
+            elif loaded is not None:  # pragma: no cover
+                loaded[1].close()
             return conn.cursor(*self._args, **self._kwargs)
         return conn
 
@@ -91,3 +105,46 @@ class DuckDBAdapter(GenericAdapter):
             if self._use_cursor:
                 cur.close()
         return result
+
+    def export(self, conn, query_name, sql, parameters, dest, file_format, batch_size):
+        """Write the result of a select to a file with ``COPY … TO``, or return None for file-like objects."""
+        if not isinstance(dest, (str, Path)):
+            return None
+        options = _COPY_OPTIONS[file_format]
+        path = str(dest).replace("'", "''")
+        cur = self._cursor(conn)
+        try:
+            cur.execute(f"COPY (\n{export_sql(sql)}\n) TO '{path}' ({options})", parameters)
+            return cur.fetchone()[0]
+        finally:
+            if self._use_cursor:
+                cur.close()
+
+    def load_list(self, conn, table, values, sql_type):
+        """Load values in a temporary table, for a large list parameter.
+
+        Cursors are distinct connections which do not share temporary tables, so the
+        table is created on a new cursor which is then used by the next query of the
+        thread on the connection, and dropped when it is closed. Without cursors, the
+        table is replaced on the connection by the next call.
+        """
+        if self._use_cursor:
+            loaded = getattr(self._loaded, "cursor", None)
+            if loaded is None or loaded[0] is not conn:
+                loaded = self._loaded.cursor = (conn, conn.cursor(*self._args, **self._kwargs))
+            cur = loaded[1]
+        else:
+            cur = conn
+        try:
+            # parameter binding is slow, scanning an arrow table is much faster
+            import pyarrow
+        except ModuleNotFoundError:  # pragma: no cover
+            cur.execute(f"CREATE OR REPLACE TEMPORARY TABLE {table}(value {sql_type})")
+            cur.executemany(f"INSERT INTO {table}(value) VALUES ($1)", [(value,) for value in values])
+        else:
+            cur.register(f"{table}_arrow", pyarrow.table({"value": list(values)}))
+            try:
+                cur.execute(f"CREATE OR REPLACE TEMPORARY TABLE {table} AS "
+                            f"SELECT CAST(value AS {sql_type}) AS value FROM {table}_arrow")
+            finally:
+                cur.unregister(f"{table}_arrow")
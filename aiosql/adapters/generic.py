@@ -1,5 +1,5 @@
 from contextlib import contextmanager
-from ..types import SyncDriverAdapterProtocol
+from ..types import SQLOperationType, SyncDriverAdapterProtocol
 
 
 class GenericAdapter(SyncDriverAdapterProtocol):
@@ -11,6 +11,9 @@ class GenericAdapter(SyncDriverAdapterProtocol):
     Miscellaneous parameters are passed to cursor creation.
     """
 
+    # statement to empty temporary tables of large list parameters
+    truncate = "DELETE FROM"
+
     def __init__(self, *args, **kwargs):
         self._args = args
         self._kwargs = kwargs
@@ -121,3 +124,26 @@ class GenericAdapter(SyncDriverAdapterProtocol):
         msg = cur.statusmessage if hasattr(cur, "statusmessage") else "DONE"
         cur.close()
         return msg
+
+    def load_list(self, conn, table, values, sql_type):
+        """Load values in an emptied temporary table, for a large list parameter."""
+        insert = self.process_sql(
+            table, SQLOperationType.INSERT_UPDATE_DELETE_MANY, f"INSERT INTO {table}(value) VALUES (:value)"
+        )
+        # insert in one transaction, eg with sqlite3 or apsw in autocommit mode
+        begin = getattr(conn, "in_transaction", True) is False
+        cur = self._cursor(conn)
+        try:
+            cur.execute(f"CREATE TEMPORARY TABLE IF NOT EXISTS {table}(value {sql_type})")
+            if begin:
+                cur.execute("BEGIN")
+            cur.execute(f"{self.truncate} {table}")
+            cur.executemany(insert, [{"value": value} for value in values])
+            if begin:
+                cur.execute("COMMIT")
+        except BaseException:
+            if begin and conn.in_transaction:
+                cur.execute("ROLLBACK")
+            raise
+        finally:
+            cur.close()
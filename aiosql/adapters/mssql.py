@@ -0,0 +1,8 @@
+from .pyformat import PyFormatAdapter
+
+
+class MsSqlAdapter(PyFormatAdapter):
+    """MS SQL Server Adapter, which limits rows with ``TOP``."""
+
+    # row limit clause, see QueryLoader limit_one option
+    row_limit = "TOP"
@@ -3,7 +3,17 @@ from .pyformat import PyFormatAdapter
 ParamType = dict|list|None
 
 
-class BrokenMySQLAdapter(PyFormatAdapter):
+class MySQLAdapter(PyFormatAdapter):
+    """MySQL and MariaDB Adapter, with backquoted identifiers."""
+
+    # quote for identifier parameters, eg ":i:table"
+    identifier_quote = "`"
+
+    # backslashes escape quotes in strings, eg in dumps
+    backslash_escapes = True
+
+
+class BrokenMySQLAdapter(MySQLAdapter):
     """
     Work around PyMySQL and MySQLDB mishandling of empty parameters
     and lack of willingness to fix the issue.
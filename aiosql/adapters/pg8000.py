@@ -2,6 +2,10 @@ from .generic import GenericAdapter
 
 
 class Pg8000Adapter(GenericAdapter):
+    # rewrite "x IN (:v*:ids)" as "x = ANY(:ids)"
+    array_binding = True
+    truncate = "TRUNCATE"
+
     def _cursor(self, conn):
         import pg8000
 
@@ -1,5 +1,10 @@
+from contextlib import contextmanager
+from typing import Any
+
 from .generic import GenericAdapter
+from ..types import SQLOperationType
 from ..utils import VAR_REF
+from ..export import byte_writer, export_sql, open_dest
 
 
 def _replacer(ma):
@@ -13,9 +18,172 @@ def _replacer(ma):
         return f'{gd["lead"]}%({gd["var_name"]})s'
 
 
+def _pipeline_result(cur, operation, record_class, row):
+    """Shape a pipelined result like the corresponding adapter method."""
+    if operation == SQLOperationType.SELECT_ONE:
+        if row is not None and record_class is not None:
+            column_names = [c[0] for c in cur.description]
+            row = record_class(**dict(zip(column_names, row)))
+        return row
+    elif operation == SQLOperationType.SELECT_VALUE:
+        if not row:
+            return None
+        return next(iter(row.values())) if isinstance(row, dict) else row[0]
+    elif operation == SQLOperationType.INSERT_RETURNING:
+        return row[0] if row and len(row) == 1 else row
+    elif operation == SQLOperationType.SCRIPT:
+        return cur.statusmessage if hasattr(cur, "statusmessage") else "DONE"
+    else:  # INSERT_UPDATE_DELETE and INSERT_UPDATE_DELETE_MANY
+        return cur.rowcount if hasattr(cur, "rowcount") else -1
+
+
+# operations which need to fetch a row from the cursor
+_FETCH_OPS = (
+    SQLOperationType.SELECT_ONE,
+    SQLOperationType.SELECT_VALUE,
+    SQLOperationType.INSERT_RETURNING,
+)
+
+
+class Deferred:
+    """Result of a query queued in a pipeline.
+
+    The value is fetched on the first call to ``result()``, which forces a
+    pipeline synchronization if needed, and on pipeline exit otherwise.
+    """
+
+    def __init__(self, cur, operation, record_class=None):
+        self._cur: Any = cur
+        self._operation = operation
+        self._record_class = record_class
+        self._done = False
+        self._value = None
+
+    def result(self):
+        """Return the query result, fetching it if necessary."""
+        if not self._done:
+            cur = self._cur
+            try:
+                row = cur.fetchone() if self._operation in _FETCH_OPS else None
+                self._value = _pipeline_result(cur, self._operation, self._record_class, row)
+            finally:
+                self._close()
+            self._done = True
+        return self._value
+
+    def _close(self):
+        if self._cur is not None:
+            self._cur.close()
+            self._cur = None
+
+
+class PyFormatPipeline:
+    """Queue queries on a psycopg 3 connection in pipeline mode."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._pending = []
+
+    def defer(self, operation, sql, parameters, record_class=None) -> Deferred:
+        """Send a query and return its deferred result."""
+        cur = self.conn.cursor()
+        try:
+            if operation == SQLOperationType.INSERT_UPDATE_DELETE_MANY:
+                cur.executemany(sql, parameters)
+            elif operation == SQLOperationType.SCRIPT:
+                cur.execute(sql)
+            else:
+                cur.execute(sql, parameters)
+        except BaseException:
+            cur.close()
+            raise
+        deferred = Deferred(cur, operation, record_class)
+        self._pending.append(deferred)
+        return deferred
+
+    def sync(self):
+        """Fetch all pending results."""
+        for deferred in self._pending:
+            deferred.result()
+        self._pending.clear()
+
+    def close(self):
+        """Release cursors of unresolved results."""
+        for deferred in self._pending:
+            deferred._close()
+        self._pending.clear()
+
+
+class _Writer:
+    """File-like wrapper for ``copy_expert``."""
+
+    def __init__(self, write):
+        self.write = write
+
+
 class PyFormatAdapter(GenericAdapter):
     """Convert from named to pyformat parameter style."""
 
     def process_sql(self, query_name, op_type, sql):
         """From named to pyformat."""
         return VAR_REF.sub(_replacer, sql)
+
+
+class PGPyFormatAdapter(PyFormatAdapter):
+    """Postgres drivers with pyformat parameter style, which bind lists as arrays."""
+
+    # rewrite "x IN (:v*:ids)" as "x = ANY(:ids)"
+    array_binding = True
+    truncate = "TRUNCATE"
+
+    @contextmanager
+    def pipeline(self, conn):
+        """Run queries in psycopg 3 pipeline mode, yielding a ``PyFormatPipeline``.
+
+        All pending results are fetched when leaving the context.
+        """
+        if not hasattr(conn, "pipeline"):
+            raise ValueError(f"pipeline mode requires a psycopg 3 connection, got {type(conn)}")
+        pipe = PyFormatPipeline(conn)
+        try:
+            with conn.pipeline():
+                yield pipe
+            pipe.sync()
+        finally:
+            pipe.close()
+
+    def load_list(self, conn, table, values, sql_type):
+        """Load values in an emptied temporary table with COPY, for psycopg 3."""
+        cur = self._cursor(conn)
+        try:
+            if not hasattr(cur, "copy"):  # other drivers
+                return super().load_list(conn, table, values, sql_type)
+            cur.execute(f"CREATE TEMPORARY TABLE IF NOT EXISTS {table}(value {sql_type})")
+            cur.execute(f"{self.truncate} {table}")
+            with cur.copy(f"COPY {table}(value) FROM STDIN") as copy:
+                for value in values:
+                    copy.write_row((value,))
+        finally:
+            cur.close()
+
+    def export(self, conn, query_name, sql, parameters, dest, file_format, batch_size):
+        """Write the result of a select to a CSV file with ``COPY … TO STDOUT``, or return None."""
+        if file_format != "csv":
+            return None
+        copy = f"COPY (\n{export_sql(sql)}\n) TO STDOUT (FORMAT csv, HEADER)"
+        cur = self._cursor(conn)
+        if not hasattr(cur, "copy") and not (hasattr(cur, "copy_expert") and hasattr(cur, "mogrify")):
+            cur.close()  # eg pygresql, exported by the generic fetch loop
+            return None
+        try:
+            with open_dest(dest, True) as out:
+                write = byte_writer(out)
+                if hasattr(cur, "copy"):  # psycopg 3
+                    with cur.copy(copy, parameters) as data:
+                        for chunk in data:
+                            write(chunk)
+                else:  # psycopg 2, which binds parameters client-side anyway
+                    cur.copy_expert(cur.mogrify(copy, parameters).decode(), _Writer(write))
+            return cur.rowcount
+        finally:
+            cur.close()
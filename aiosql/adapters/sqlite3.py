@@ -7,6 +7,9 @@ class SQLite3Adapter(GenericAdapter):
     Overwrites two methods using sqlite3-specific non-standard methods.
     """
 
+    # prefix to get a query plan
+    explain = "EXPLAIN QUERY PLAN"
+
     def insert_returning(self, conn, query_name, sql, parameters):
         cur = self._cursor(conn)
         try:
@@ -19,3 +22,8 @@ class SQLite3Adapter(GenericAdapter):
     def execute_script(self, conn, sql):
         conn.executescript(sql)
         return "DONE"
+
+    def execute_statement(self, conn, sql):
+        """Execute one statement of a script, unlike ``executescript`` it does not commit."""
+        conn.execute(sql).close()
+        return "DONE"
@@ -1,34 +1,45 @@
+from functools import partial
 from pathlib import Path
-from typing import Callable, Type, Any
+from typing import Callable, Type, Any, cast
 
 from .adapters.aiosqlite import AioSQLiteAdapter
 from .adapters.asyncpg import AsyncPGAdapter
-from .adapters.pyformat import PyFormatAdapter
-from .adapters.mysql import BrokenMySQLAdapter
+from .adapters.pyformat import PyFormatAdapter, PGPyFormatAdapter
+from .adapters.mysql import BrokenMySQLAdapter, MySQLAdapter
+from .adapters.mssql import MsSqlAdapter
 from .adapters.generic import GenericAdapter
 from .adapters.apyformat import AsyncPyFormatAdapter
 from .adapters.sqlite3 import SQLite3Adapter
 from .adapters.pg8000 import Pg8000Adapter
 from .adapters.duckdb import DuckDBAdapter
+from .adapters.athreaded import AsyncThreadedAdapter
 from .utils import SQLLoadException, log
 from .queries import Queries
 from .query_loader import QueryLoader
+from .tracing import QueryHook
+from .slowlog import SlowQueryLog
+from .scripts import aexecute_script_file, execute_script_file
 from .types import DriverAdapterProtocol
 
 _ADAPTERS: dict[str, Callable[..., DriverAdapterProtocol]] = {
+    "aapsw": partial(AsyncThreadedAdapter, GenericAdapter),  # type: ignore
+    "aduckdb": partial(AsyncThreadedAdapter, DuckDBAdapter),  # type: ignore
     "aiosqlite": AioSQLiteAdapter,  # type: ignore
+    "apg8000": partial(AsyncThreadedAdapter, Pg8000Adapter),  # type: ignore
     "apsw": GenericAdapter,
     "apsycopg": AsyncPyFormatAdapter,  # type: ignore
+    "apymssql": partial(AsyncThreadedAdapter, MsSqlAdapter),  # type: ignore
+    "asqlite3": partial(AsyncThreadedAdapter, SQLite3Adapter),  # type: ignore
     "asyncpg": AsyncPGAdapter,  # type: ignore
     "duckdb": DuckDBAdapter,
     "mariadb": BrokenMySQLAdapter,
     "mysqldb": BrokenMySQLAdapter,
-    "mysql-connector": PyFormatAdapter,
+    "mysql-connector": MySQLAdapter,
     "pg8000": Pg8000Adapter,
-    "psycopg": PyFormatAdapter,
-    "psycopg2": PyFormatAdapter,
-    "pygresql": PyFormatAdapter,
-    "pymssql": PyFormatAdapter,
+    "psycopg": PGPyFormatAdapter,
+    "psycopg2": PGPyFormatAdapter,
+    "pygresql": PGPyFormatAdapter,
+    "pymssql": MsSqlAdapter,
     "pymysql": BrokenMySQLAdapter,
     "sqlite3": SQLite3Adapter,
 }
@@ -80,6 +91,12 @@ def from_str(
     kwargs: dict[str, Any] = {},
     loader_cls: Type[QueryLoader] = QueryLoader,
     queries_cls: Type[Queries] = Queries,
+    single_flight: bool = False,
+    metrics: bool = False,
+    hooks: list[QueryHook]|None = None,
+    slow_query: float|SlowQueryLog|None = None,
+    profile: bool = False,
+    limit_one: bool = False,
 ):
     """Load queries from a SQL string.
 
@@ -98,6 +115,17 @@ def from_str(
       declarations to the python classes which aiosql should use when marshaling SQL results.
     - **loader_cls** - *(optional)* Custom constructor for QueryLoader extensions.
     - **queries_cls** - *(optional)* Custom constructor for Queries extensions.
+    - **single_flight** - *(optional)* whether to coalesce identical concurrent ``^`` and ``$`` calls,
+      default is *False*.
+    - **metrics** - *(optional)* whether to collect per-query latency and row counts, default is *False*.
+    - **hooks** - *(optional)* list of hooks called around query executions, e.g. for tracing,
+      see ``aiosql.tracing.QueryHook``. Queries are not instrumented if *None*, the default.
+    - **slow_query** - *(optional)* threshold in seconds above which query calls are logged,
+      or an ``aiosql.slowlog.SlowQueryLog`` instance, default is *None*.
+    - **profile** - *(optional)* whether to record time spent per phase of query calls,
+      see ``aiosql.profiler.QueryProfiler``, default is *False*.
+    - **limit_one** - *(optional)* whether to add a row limit to ``^`` and ``$`` selects
+      without one, with a warning, default is *False*.
 
     **Returns:** ``Queries``
 
@@ -126,9 +154,18 @@ def from_str(
       queries.get_user_by_username(conn, username="willvaughn")
     """
     adapter = _make_driver_adapter(driver_adapter, *args, **kwargs)
-    query_loader = loader_cls(adapter, record_classes, attribute=attribute)
+    query_loader = loader_cls(adapter, record_classes, attribute=attribute, limit_one=limit_one)
     query_data = query_loader.load_query_data_from_sql(sql, [])
-    return queries_cls(adapter, kwargs_only=kwargs_only).load_from_list(query_data)
+    queries = queries_cls(
+        adapter,
+        kwargs_only=kwargs_only,
+        single_flight=single_flight,
+        metrics=metrics,
+        hooks=hooks,
+        slow_query=slow_query,
+        profile=profile,
+    )
+    return queries.load_from_list(query_data)
 
 
 def from_path(
@@ -143,6 +180,12 @@ def from_path(
     queries_cls: Type[Queries] = Queries,
     ext: tuple[str] = (".sql",),
     encoding=None,
+    single_flight: bool = False,
+    metrics: bool = False,
+    hooks: list[QueryHook]|None = None,
+    slow_query: float|SlowQueryLog|None = None,
+    profile: bool = False,
+    limit_one: bool = False,
 ):
     """Load queries from a `.sql` file, or directory of `.sql` files.
 
@@ -163,6 +206,17 @@ def from_path(
     - **queries_cls** - *(optional)* Custom constructor for `Queries` extensions.
     - **ext** - *(optional)* allowed file extensions for query files, default is `(".sql",)`.
     - **encoding** - *(optional)* encoding for reading files.
+    - **single_flight** - *(optional)* whether to coalesce identical concurrent ``^`` and ``$`` calls,
+      default is *False*.
+    - **metrics** - *(optional)* whether to collect per-query latency and row counts, default is *False*.
+    - **hooks** - *(optional)* list of hooks called around query executions, e.g. for tracing,
+      see ``aiosql.tracing.QueryHook``. Queries are not instrumented if *None*, the default.
+    - **slow_query** - *(optional)* threshold in seconds above which query calls are logged,
+      or an ``aiosql.slowlog.SlowQueryLog`` instance, default is *None*.
+    - **profile** - *(optional)* whether to record time spent per phase of query calls,
+      see ``aiosql.profiler.QueryProfiler``, default is *False*.
+    - **limit_one** - *(optional)* whether to add a row limit to ``^`` and ``$`` selects
+      without one, with a warning, default is *False*.
 
     **Returns:** `Queries`
 
@@ -179,15 +233,78 @@ def from_path(
         raise SQLLoadException(f"File does not exist: {path}")
 
     adapter = _make_driver_adapter(driver_adapter, *args, **kwargs)
-    query_loader = loader_cls(adapter, record_classes, attribute=attribute)
+    query_loader = loader_cls(adapter, record_classes, attribute=attribute, limit_one=limit_one)
+    queries = queries_cls(
+        adapter,
+        kwargs_only=kwargs_only,
+        single_flight=single_flight,
+        metrics=metrics,
+        hooks=hooks,
+        slow_query=slow_query,
+        profile=profile,
+    )
 
     if path.is_file():
         query_data = query_loader.load_query_data_from_file(path, encoding=encoding)
-        return queries_cls(adapter, kwargs_only=kwargs_only).load_from_list(query_data)
+        return queries.load_from_list(query_data)
     elif path.is_dir():
         query_data_tree = query_loader.load_query_data_from_dir_path(
             path, ext=ext, encoding=encoding
         )
-        return queries_cls(adapter, kwargs_only=kwargs_only).load_from_tree(query_data_tree)
+        return queries.load_from_tree(query_data_tree)
     else:  # pragma: no cover
         raise SQLLoadException(f"The sql_path must be a directory or file, got {sql_path}")
+
+
+def run_script(
+    sql_path: str|Path,
+    driver_adapter: str|Callable[..., DriverAdapterProtocol]|DriverAdapterProtocol,
+    conn: Any,
+    batch: int = 0,
+    progress: Callable[..., Any]|None = None,
+    progress_every: int = 1000,
+    encoding: str|None = None,
+    args: list[Any] = [],
+    kwargs: dict[str, Any] = {},
+):
+    """Execute an SQL script file statement by statement, in constant memory.
+
+    Unlike ``#`` queries, the script is not loaded as a whole: it is read by chunks
+    and split into statements which are executed one at a time.
+
+    **Parameters:**
+
+    - **sql_path** - Path to the script file.
+    - **driver_adapter** - adapter name or constructor as with ``from_path``, or an adapter instance
+      such as ``queries.driver_adapter``.
+    - **conn** - database connection.
+    - **batch** - *(optional)* commit every *batch* statements and at the end, default is *0*
+      which leaves transactions to the script or the caller.
+    - **progress** - *(optional)* callback called with an ``aiosql.scripts.ScriptProgress`` after
+      each batch, or every *progress_every* statements, and at the end.
+    - **progress_every** - *(optional)* progress interval without batches, default is *1000*.
+    - **encoding** - *(optional)* encoding of the script, default is *utf-8*.
+    - **args** - *(optional)* adapter creation args (list).
+    - **kwargs** - *(optional)* adapter creation args (dict).
+
+    **Returns:** final ``ScriptProgress``, or a coroutine with asynchronous drivers.
+
+    Usage:
+
+    .. code-block:: python
+
+      aiosql.run_script("dump.sql", "psycopg", conn, batch=10000, progress=print)
+    """
+    path = Path(sql_path)
+
+    if not path.is_file():
+        raise SQLLoadException(f"File does not exist: {path}")
+
+    # adapter classes also have an execute_script attribute
+    if not isinstance(driver_adapter, (str, type)) and hasattr(driver_adapter, "execute_script"):
+        adapter = cast(DriverAdapterProtocol, driver_adapter)
+    else:
+        factory = cast(str|Callable[..., DriverAdapterProtocol], driver_adapter)
+        adapter = _make_driver_adapter(factory, *args, **kwargs)
+    execute = aexecute_script_file if getattr(adapter, "is_aio_driver", False) else execute_script_file
+    return execute(adapter, conn, path, encoding, batch, progress_every, progress)
@@ -0,0 +1,92 @@
+import asyncio
+from typing import Any, Callable
+
+from .utils import SQLLoadException
+
+
+class BatchLoader:
+    """Collect ``^`` calls issued in the same event loop iteration and run them as one query.
+
+    Calls are grouped by connection and other parameters, and rows are
+    dispatched back to callers by key, None if there is no matching row.
+
+    - :param query_name: name of the batched query, for error messages.
+    - :param key: parameter of the batched query holding the key.
+    - :param companion: name of the set-based query, which returns rows for a list of keys.
+    - :param param: parameter of the companion query holding the list of keys.
+    - :param column: column of companion rows holding the key, the first column
+      is used for plain tuple rows.
+    """
+
+    def __init__(self, query_name: str, key: str, companion: str, param: str, column: str):
+        self.query_name = query_name
+        self.key = key
+        self.companion = companion
+        self.param = param
+        self.column = column
+        # pending batches by event loop, connection and other parameters
+        self._pending: dict[Any, dict[Any, list[asyncio.Future]]] = {}
+        # keep references to running batches
+        self._tasks: set[asyncio.Task] = set()
+        self.calls = 0
+        self.batches = 0
+
+    def _row_key(self, row: Any) -> Any:
+        if hasattr(row, "keys"):  # dict, asyncpg.Record, sqlite3.Row…
+            return row[self.column]
+        elif hasattr(row, self.column):  # record class
+            return getattr(row, self.column)
+        else:  # plain tuple
+            return row[0]
+
+    async def load(self, queries: Any, conn: Any, value: Any, others: dict[str, Any]) -> Any:
+        """Return the first row of the companion query matching value, or None."""
+        loop = asyncio.get_running_loop()
+        group = (loop, conn, tuple(sorted(others.items())))
+        batch = self._pending.get(group)
+        if batch is None:
+            batch = self._pending[group] = {}
+            # run after all tasks ready in this loop iteration had a chance to join
+            loop.call_soon(self._dispatch, queries, group, conn, others)
+        future = loop.create_future()
+        batch.setdefault(value, []).append(future)
+        self.calls += 1
+        return await future
+
+    def _dispatch(self, queries: Any, group: Any, conn: Any, others: dict[str, Any]) -> None:
+        batch = self._pending.pop(group)
+        task = asyncio.ensure_future(self._run(queries, conn, others, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(
+            self, queries: Any, conn: Any, others: dict[str, Any], batch: dict[Any, list[asyncio.Future]]
+    ) -> None:
+        """Run the companion query and dispatch its rows to waiting callers by key."""
+        self.batches += 1
+        try:
+            companion: Callable[..., Any] = getattr(queries, self.companion)
+        except AttributeError:
+            error = SQLLoadException(f"batch query {self.companion} not found for {self.query_name}")
+            for futures in batch.values():
+                for future in futures:
+                    future.set_exception(error)
+            return
+        try:
+            rows: dict[Any, Any] = {}
+            async for row in companion(conn, **others, **{self.param: list(batch.keys())}):
+                rows.setdefault(self._row_key(row), row)
+        except Exception as e:
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        for value, futures in batch.items():
+            for future in futures:
+                if not future.done():
+                    future.set_result(rows.get(value))
+
+    def stats(self) -> dict[str, int]:
+        """Return the number of calls and of batched queries actually run."""
+        return {"calls": self.calls, "batches": self.batches}
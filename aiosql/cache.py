@@ -0,0 +1,137 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Iterable
+
+# string literals and comments, removed before looking for table names
+_NOISE = re.compile(r"'(''|[^'])*'|--[^\n]*|/\*.*?\*/", re.DOTALL)
+
+# table name, possibly schema-qualified and quoted
+_NAME = r"((?:[\w$]+|\"[^\"]+\"|`[^`]+`|\[[^\]]+\])(?:\s*\.\s*(?:[\w$]+|\"[^\"]+\"|`[^`]+`|\[[^\]]+\]))*)"
+
+# tables read by a query
+_READ_TABLES = re.compile(r"(?i)\b(?:FROM|JOIN)\s+(?:ONLY\s+)?" + _NAME)
+
+# tables written by a query
+_WRITE_TABLES = re.compile(
+    r"(?i)\b(?:INSERT\s+(?:OR\s+\w+\s+)?INTO|REPLACE\s+INTO|MERGE\s+INTO|UPDATE(?:\s+OR\s+\w+)?"
+    r"|DELETE\s+FROM|TRUNCATE(?:\s+TABLE)?)\s+(?:ONLY\s+)?" + _NAME
+)
+
+
+def _table(name: str) -> str:
+    """Normalize a table name, dropping the schema so that invalidation is conservative."""
+    last = re.split(r"\s*\.\s*", name)[-1]
+    return last.strip('"`[]').lower()
+
+
+def read_tables(sql: str) -> set[str]:
+    """Return the names of tables a query reads from."""
+    return {_table(m.group(1)) for m in _READ_TABLES.finditer(_NOISE.sub(" ", sql))}
+
+
+def write_tables(sql: str) -> set[str]:
+    """Return the names of tables a query writes to, empty if unknown."""
+    return {_table(m.group(1)) for m in _WRITE_TABLES.finditer(_NOISE.sub(" ", sql))}
+
+
+class _LRU:
+    """Per-query LRU cache with an optional time to live."""
+
+    def __init__(self, ttl: float|None, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries: OrderedDict[Any, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # incremented on invalidations, so that results computed before are not stored
+        self.generation = 0
+
+
+# returned by lookup on cache misses
+MISS = object()
+
+
+class QueryCache:
+    """In-process result cache for queries with a ``-- @cache`` directive.
+
+    Results are keyed by fully qualified query name and parameters.
+    Writes through ``!``, ``<!``, ``*!`` queries invalidate cached results of
+    queries reading the same tables, and ``#`` scripts invalidate everything.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._caches: dict[str, _LRU] = {}
+        # table name to names of queries reading it
+        self._readers: dict[str, set[str]] = {}
+
+    def register(self, query_name: str, ttl: float|None, max_size: int, tables: Iterable[str]) -> None:
+        """Declare a cached query and the tables it depends on."""
+        with self._lock:
+            self._caches[query_name] = _LRU(ttl, max_size)
+            for table in tables:
+                self._readers.setdefault(table, set()).add(query_name)
+
+    def lookup(self, query_name: str, key: Any) -> tuple[Any, int]:
+        """Return the cached result or ``MISS``, and the current generation."""
+        with self._lock:
+            cache = self._caches[query_name]
+            entry = cache.entries.get(key)
+            if entry is not None:
+                if cache.ttl is None or entry[0] > time.monotonic():
+                    cache.entries.move_to_end(key)
+                    cache.hits += 1
+                    return entry[1], cache.generation
+                del cache.entries[key]
+                cache.evictions += 1
+            cache.misses += 1
+            return MISS, cache.generation
+
+    def store(self, query_name: str, key: Any, value: Any, generation: int) -> None:
+        """Cache a result unless an invalidation occurred since its lookup."""
+        with self._lock:
+            cache = self._caches[query_name]
+            if cache.generation != generation:
+                return
+            expires = time.monotonic() + cache.ttl if cache.ttl is not None else 0.0
+            cache.entries[key] = (expires, value)
+            cache.entries.move_to_end(key)
+            while len(cache.entries) > cache.max_size:
+                cache.entries.popitem(last=False)
+                cache.evictions += 1
+
+    def invalidate(self, tables: Iterable[str]|None = None) -> None:
+        """Drop cached results of queries reading these tables, or all of them if None."""
+        with self._lock:
+            if tables is None:
+                names: Iterable[str] = self._caches.keys()
+            else:
+                names = set().union(*(self._readers.get(t.lower(), ()) for t in tables))
+            for name in names:
+                cache = self._caches[name]
+                cache.generation += 1
+                if cache.entries:
+                    cache.invalidations += 1
+                    cache.entries.clear()
+
+    def clear(self) -> None:
+        """Drop all cached results."""
+        self.invalidate(None)
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Return hit, miss, eviction and invalidation counters per query."""
+        with self._lock:
+            return {
+                name: {
+                    "size": len(cache.entries),
+                    "hits": cache.hits,
+                    "misses": cache.misses,
+                    "evictions": cache.evictions,
+                    "invalidations": cache.invalidations,
+                }
+                for name, cache in self._caches.items()
+            }
@@ -0,0 +1,56 @@
+from typing import Any, Callable, NamedTuple
+
+from .utils import SQLParseException, directive_args
+
+# bounds of the chunk size change between two chunks, when targeting a duration
+_MIN_FACTOR, _MAX_FACTOR = 0.5, 2.0
+
+
+class ChunkReport(NamedTuple):
+    """Result of a chunked ``!`` query, see the ``@chunked`` directive."""
+
+    rows: int
+    chunks: int
+    elapsed: float
+
+    @property
+    def throughput(self) -> float:
+        """Rows per second."""
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def chunked_args(query_name: str, directive: str) -> tuple[str, int, float, float]:
+    """Parse a ``-- @chunked param=size size=1000 sleep=0.1 target=0.5`` directive."""
+    args = directive_args(query_name, "chunked", directive, ("param", "size", "sleep", "target"))
+    try:
+        size = int(args.get("size", "1000"))
+        sleep = float(args.get("sleep", "0"))
+        target = float(args.get("target", "0"))
+    except ValueError as e:
+        raise SQLParseException(f"invalid @chunked argument in query {query_name}: {e}")
+    if size <= 0 or sleep < 0 or target < 0:
+        raise SQLParseException(f"invalid @chunked argument in query {query_name}: {directive}")
+    return args.get("param", "chunk_size"), size, sleep, target
+
+
+def row_count(query_name: str, result: Any, changes: Callable[[], int]|None = None) -> int:
+    """Number of rows affected by a chunk, from a row count or a status such as ``DELETE 1000``.
+
+    When the driver does not report row counts, eg ``apsw`` which returns -1,
+    ``changes`` is called instead, eg the ``Connection.changes`` method of ``apsw``.
+    """
+    if isinstance(result, str) and result.rpartition(" ")[2].isdigit():
+        return int(result.rpartition(" ")[2])
+    if isinstance(result, int) and not isinstance(result, bool) and result >= 0:
+        return result
+    if result == -1 and changes is not None:
+        return changes()
+    raise ValueError(f"cannot count rows of chunk for query {query_name}: {result!r}")
+
+
+def next_size(size: int, elapsed: float, target: float) -> int:
+    """Scale the chunk size towards a target duration per chunk, within bounds."""
+    if not target or elapsed <= 0:
+        return size
+    factor = min(_MAX_FACTOR, max(_MIN_FACTOR, target / elapsed))
+    return max(1, int(size * factor))
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+from typing import Any, Callable
+
+# result of an asynchronous call whose executing task was cancelled
+_RETRY = object()
+
+
+class _Call:
+    """An execution in progress, awaited by concurrent identical calls."""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: BaseException|None = None
+
+
+class SingleFlight:
+    """Coalesce identical concurrent calls so that only one is executed.
+
+    Concurrent callers, threads or asyncio tasks, with the same key get the
+    result, or the exception, of the first one.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: dict[Any, _Call] = {}
+        self._futures: dict[Any, asyncio.Future] = {}
+        # query name to number of calls and of coalesced calls
+        self._stats: dict[str, list[int]] = {}
+
+    def _count(self, name: str, coalesced: bool) -> None:
+        counts = self._stats.get(name)
+        if counts is None:
+            counts = self._stats[name] = [0, 0]
+        counts[0] += 1
+        counts[1] += coalesced
+
+    def call(self, name: str, key: Any, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run ``fn(*args, **kwargs)`` unless an identical call is in progress."""
+        key = (name, key)
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            self._count(name, not leader)
+        assert call is not None  # help type checker
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = fn(*args, **kwargs)
+            return call.value
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def acall(self, name: str, key: Any, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Await ``fn(*args, **kwargs)`` unless an identical call is in progress.
+
+        If the executing task is cancelled, a waiting caller runs the call again.
+        """
+        loop = asyncio.get_running_loop()
+        # futures belong to an event loop
+        key = (name, key, loop)
+        first = True
+        while True:
+            with self._lock:
+                future = self._futures.get(key)
+                leader = future is None
+                if leader:
+                    future = self._futures[key] = loop.create_future()
+                if first:
+                    self._count(name, not leader)
+            assert future is not None  # help type checker
+            if leader:
+                break
+            # do not cancel the shared execution if this caller is cancelled
+            value = await asyncio.shield(future)
+            if value is not _RETRY:
+                return value
+            first = False
+        try:
+            value = await fn(*args, **kwargs)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            # only this caller is cancelled, others run the call again
+            future.set_result(_RETRY)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark as retrieved if there are no followers
+            raise
+        finally:
+            with self._lock:
+                del self._futures[key]
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Return the number of calls and of coalesced calls per query."""
+        with self._lock:
+            return {name: {"calls": c[0], "coalesced": c[1]} for name, c in self._stats.items()}
@@ -0,0 +1,245 @@
+import io
+import csv
+import json
+import codecs
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Iterator, NamedTuple
+
+from .utils import SQLParseException, directive_args
+
+FORMATS = ("csv", "jsonl", "parquet")
+
+# default format for file names, when not given by the call or the directive
+_SUFFIXES = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".parquet": "parquet"}
+
+# rows fetched and written at once
+BATCH_SIZE = 1000
+
+# rows kept before opening a parquet file while some columns are only nulls
+PENDING_ROWS = 100_000
+
+
+class ExportReport(NamedTuple):
+    """Result of a ``<name>_to_file`` export, see the ``@export`` directive."""
+
+    rows: int
+    elapsed: float
+
+    @property
+    def throughput(self) -> float:
+        """Rows per second."""
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def export_args(query_name: str, directive: str) -> str|None:
+    """Parse a ``-- @export format=csv`` directive, and return the default format if any."""
+    args = directive_args(query_name, "export", directive, ("format",))
+    file_format = args.get("format")
+    if file_format is not None and file_format not in FORMATS:
+        raise SQLParseException(f"unexpected @export format in query {query_name}: {file_format}")
+    return file_format
+
+
+def export_format(query_name: str, dest: Any, file_format: str|None) -> str:
+    """Choose the format of an export, from the call, the directive or the file name."""
+    if file_format is None:
+        name = dest if isinstance(dest, (str, Path)) else getattr(dest, "name", None)
+        file_format = _SUFFIXES.get(Path(name).suffix.lower()) if isinstance(name, (str, Path)) else None
+        if file_format is None:
+            raise ValueError(f"cannot guess export format of {query_name}_to_file for {dest!r}")
+    if file_format not in FORMATS:
+        raise ValueError(f"unexpected export format for {query_name}_to_file: {file_format}")
+    return file_format
+
+
+def export_sql(sql: str) -> str:
+    """Strip the final semicolon of a select, so that it can be wrapped, eg in ``COPY``."""
+    return sql.strip().rstrip(";").rstrip()
+
+
+@contextmanager
+def open_dest(dest: Any, binary: bool) -> Iterator[Any]:
+    """Open a file name, or use a file-like object, wrapping binary files for text output."""
+    if isinstance(dest, (str, Path)):
+        if binary:
+            with open(dest, "wb") as f:
+                yield f
+        else:
+            with open(dest, "w", encoding="utf-8", newline="") as f:
+                yield f
+    elif not binary and isinstance(dest, (io.RawIOBase, io.BufferedIOBase)):
+        text = io.TextIOWrapper(dest, encoding="utf-8", newline="")  # type: ignore
+        try:
+            yield text
+        finally:
+            text.detach()  # flush, but do not close
+    else:
+        yield dest
+
+
+def byte_writer(out: Any) -> Callable[[Any], Any]:
+    """Write chunks of native exports, as bytes, memory views or strings, to a binary or text file."""
+    if isinstance(out, io.TextIOBase):
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        return lambda data: out.write(data if isinstance(data, str) else decoder.decode(bytes(data)))
+    return lambda data: out.write(data.encode() if isinstance(data, str) else data)
+
+
+def _values(row: Any) -> Any:
+    return row.values() if isinstance(row, dict) else row
+
+
+class _CsvWriter:
+    binary = False
+
+    def __init__(self, out: Any, columns: list[str]):
+        self._writer = csv.writer(out)
+        self._writer.writerow(columns)
+
+    def write(self, rows: list[Any]) -> None:
+        self._writer.writerows(_values(row) for row in rows)
+
+    def close(self) -> None:
+        pass
+
+
+class _JsonlWriter:
+    binary = False
+
+    def __init__(self, out: Any, columns: list[str]):
+        self._out, self._columns = out, columns
+
+    def write(self, rows: list[Any]) -> None:
+        columns, dumps = self._columns, json.dumps
+        self._out.write("".join(dumps(dict(zip(columns, _values(row))), default=str) + "\n" for row in rows))
+
+    def close(self) -> None:
+        pass
+
+
+class _ParquetWriter:
+    """Parquet writer, which infers its schema from the rows.
+
+    The schema of a parquet file is fixed when it is opened, so batches are kept
+    while some columns only hold nulls, up to ``PENDING_ROWS``, and their types are
+    then promoted to a common schema, eg *null* and *int64* to *int64*.
+    """
+
+    binary = True
+
+    def __init__(self, out: Any, columns: list[str]):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ModuleNotFoundError as e:  # pragma: no cover
+            raise ModuleNotFoundError("parquet export requires pyarrow") from e
+        self._pa, self._pq = pyarrow, pyarrow.parquet
+        self._out, self._columns = out, columns
+        self._writer: Any = None
+        self._pending: list[Any] = []
+        self._pending_rows = 0
+
+    def _table(self, rows: list[Any]) -> Any:
+        pa = self._pa
+        data = list(zip(*(_values(row) for row in rows))) or [()] * len(self._columns)
+        return pa.Table.from_arrays([pa.array(values) for values in data], names=self._columns)
+
+    def _schema(self) -> Any:
+        return self._pa.unify_schemas([t.schema for t in self._pending], promote_options="permissive")
+
+    def write(self, rows: list[Any]) -> None:
+        pa, table = self._pa, self._table(rows)
+        if self._writer is not None:
+            try:
+                table = table.cast(self._writer.schema)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                raise ValueError(f"cannot export rows to parquet schema {self._writer.schema}: {e}") from e
+            self._writer.write_table(table)
+            return
+        self._pending.append(table)
+        self._pending_rows += table.num_rows
+        schema = self._schema()
+        if self._pending_rows >= PENDING_ROWS or not any(pa.types.is_null(f.type) for f in schema):
+            self._flush(schema)
+
+    def _flush(self, schema: Any) -> Any:
+        """Open the parquet file with a schema, and write the pending batches."""
+        self._writer = writer = self._pq.ParquetWriter(self._out, schema)
+        pending, self._pending = self._pending, []
+        for table in pending:
+            writer.write_table(table.cast(schema))
+        return writer
+
+    def close(self) -> None:
+        writer = self._writer
+        if writer is None:
+            if not self._pending:  # no rows, the schema is unknown
+                self._pending.append(self._table([]))
+            writer = self._flush(self._schema())
+        writer.close()
+
+
+_WRITERS: dict[str, Any] = {"csv": _CsvWriter, "jsonl": _JsonlWriter, "parquet": _ParquetWriter}
+
+
+class RowWriter:
+    """Write batches of rows to a file in one of the export formats.
+
+    - :param dest: file name or file-like object.
+    - :param file_format: one of ``csv``, ``jsonl`` or ``parquet``.
+    - :param columns: column names, eg from the cursor description.
+    """
+
+    def __init__(self, dest: Any, file_format: str, columns: list[str]):
+        self.dest, self.file_format, self.columns = dest, file_format, columns
+        self.rows = 0
+
+    @contextmanager
+    def open(self) -> Iterator["RowWriter"]:
+        cls = _WRITERS[self.file_format]
+        with open_dest(self.dest, cls.binary) as out:
+            self._writer = cls(out, self.columns)
+            try:
+                yield self
+            finally:
+                self._writer.close()
+
+    def write(self, rows: list[Any]) -> None:
+        self._writer.write(rows)
+        self.rows += len(rows)
+
+
+def columns(cur: Any) -> list[str]:
+    """Column names of a DB-API cursor."""
+    return [c[0] for c in cur.description or []]
+
+
+def batches(cur: Any, size: int) -> Iterator[list[Any]]:
+    """Fetch rows of a DB-API cursor by batches, or iterate if it cannot, eg with ``apsw``."""
+    if hasattr(cur, "fetchmany"):
+        while rows := cur.fetchmany(size):
+            yield rows
+    else:
+        it = iter(cur)
+        while rows := list(islice(it, size)):
+            yield rows
+
+
+def write_cursor(cur: Any, dest: Any, file_format: str, size: int) -> int:
+    """Write all rows of a cursor, and return their number."""
+    writer = RowWriter(dest, file_format, columns(cur))
+    with writer.open():
+        for rows in batches(cur, size):
+            writer.write(rows)
+    return writer.rows
+
+
+async def awrite_cursor(cur: Any, dest: Any, file_format: str, size: int) -> int:
+    """Write all rows of an asynchronous cursor, and return their number."""
+    writer = RowWriter(dest, file_format, columns(cur))
+    with writer.open():
+        while rows := await cur.fetchmany(size):
+            writer.write(rows)
+    return writer.rows
@@ -0,0 +1,54 @@
+import re
+
+# strings and comments, which are masked before looking for clauses
+_MASKED = re.compile(r"""'(?:''|[^'])*'|"(?:""|[^"])+"|--[^\n]*""")
+
+# innermost parenthesized groups, masked repeatedly to keep the top level only
+_GROUP = re.compile(r"\(([^()]*)\)")
+
+# statements which may be limited, clauses which limit rows already, and clauses
+# which do not combine with TOP
+_SELECT = re.compile(r"(?i)^\s*(SELECT|WITH)\b")
+_WRITE = re.compile(r"(?i)\b(INSERT\s+INTO|UPDATE\s+\S+\s+SET|DELETE\s+FROM|MERGE\s+INTO|RETURNING)\b")
+_LIMITED = re.compile(r"(?i)\b(LIMIT|TOP|FETCH\s+(FIRST|NEXT))\b")
+_NO_TOP = re.compile(r"(?i)\b(UNION|INTERSECT|EXCEPT|OFFSET)\b")
+
+# row locking clauses, which come after the limit
+_LOCKING = re.compile(r"(?i)\b(FOR\s+(UPDATE|SHARE|NO\s+KEY\s+UPDATE|KEY\s+SHARE)|LOCK\s+IN\s+SHARE\s+MODE)\b")
+
+# where to put a TOP clause
+_TOP = re.compile(r"(?i)\bSELECT(\s+(DISTINCT|ALL)\b)?")
+
+
+def _top_level(sql: str) -> str:
+    """Mask strings, comments and parenthesized groups, keeping offsets."""
+    masked = _MASKED.sub(lambda m: (" " if m.group(0).startswith("--") else "_") * len(m.group(0)), sql)
+    while True:
+        unnested = _GROUP.sub(lambda m: "[" + " " * len(m.group(1)) + "]", masked)
+        if unnested == masked:
+            return masked
+        masked = unnested
+
+
+def with_row_limit(sql: str, row_limit: str = "LIMIT") -> str|None:
+    """Return a select limited to one row, or None if it is already limited or not a select.
+
+    ``row_limit`` is the dialect clause, ``LIMIT`` appended before row locking clauses,
+    or ``TOP`` after the first top-level ``SELECT``.
+    """
+    top = _top_level(sql)
+    if not _SELECT.match(top) or _WRITE.search(top) or _LIMITED.search(top):
+        return None
+    if row_limit == "TOP":
+        if _NO_TOP.search(top):
+            return None
+        m = _TOP.search(top)
+        if m is None:  # pragma: no cover
+            return None
+        return sql[:m.end()] + " TOP 1" + sql[m.end():]
+    locking = _LOCKING.search(top)
+    if locking is not None:
+        pos = locking.start()
+    else:
+        pos = len(top.rstrip().rstrip(";").rstrip())
+    return sql[:pos].rstrip() + f" {row_limit} 1" + (" " if locking else "") + sql[pos:]
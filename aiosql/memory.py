@@ -0,0 +1,75 @@
+import sys
+import inspect
+from types import CodeType, FunctionType, MethodType, ModuleType
+from typing import Any
+
+# objects not owned by a query, when reached through closures
+_SHARED = (type, ModuleType)
+
+
+def _size(obj: Any, seen: set[int], stop: set[int]) -> int:
+    """Size of an object and of what it references, skipping seen and shared objects."""
+    if id(obj) in seen or id(obj) in stop or isinstance(obj, _SHARED) or obj is None:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, CodeType):
+        # per-query copy, see Queries._query_fn, but its contents are shared
+        return size
+    elif isinstance(obj, FunctionType):
+        refs: list[Any] = [obj.__dict__, obj.__defaults__, obj.__kwdefaults__, obj.__code__]
+        refs += [cell.cell_contents for cell in obj.__closure__ or () if _has_contents(cell)]
+        size += sum(sys.getsizeof(cell) for cell in obj.__closure__ or ())
+    elif isinstance(obj, MethodType):
+        refs = [obj.__func__]
+    elif isinstance(obj, dict):
+        refs = [*obj.keys(), *obj.values()]
+    elif isinstance(obj, (tuple, list, set, frozenset)):
+        refs = list(obj)
+    elif isinstance(obj, inspect.Signature):
+        refs = [obj._parameters]  # type: ignore
+    elif isinstance(obj, inspect.Parameter):
+        refs = [obj._name, obj._default, obj._annotation]  # type: ignore
+    elif hasattr(obj, "keys") and hasattr(obj, "values"):  # mapping proxies
+        refs = [*obj.keys(), *obj.values()]
+    else:
+        # other objects, e.g. enums or adapters, are not owned by a query
+        return size if isinstance(obj, (str, bytes, int, float)) else 0
+    return size + sum(_size(ref, seen, stop) for ref in refs)
+
+
+def _has_contents(cell) -> bool:
+    try:
+        cell.cell_contents
+        return True
+    except ValueError:  # pragma: no cover
+        return False
+
+
+def query_sizes(queries: Any) -> dict[str, dict[str, int]]:
+    """Return the approximate number of bytes retained by each loaded query method.
+
+    Sizes are split between the ``sql`` string, the ``doc`` string, the ``signature``,
+    the ``function`` (generated function and wrappers, with their code objects,
+    closures and attributes) and the bound ``method``.
+    Objects shared between queries, such as the ``Queries`` instance, adapters,
+    classes, or identical interned strings, are counted at most once, for the
+    first query which references them.
+    """
+    stop = {id(queries), id(queries.driver_adapter)}
+    seen: set[int] = set()
+    sizes = {}
+    for name in sorted(queries.available_queries):
+        method = queries
+        for part in name.split("."):
+            method = getattr(method, part)
+        fn = method.__func__
+        sizes[name] = size = {
+            "sql": _size(fn.sql, seen, stop),
+            "doc": _size(fn.__doc__, seen, stop),
+            "signature": _size(fn.__signature__, seen, stop),
+            "function": _size(fn, seen, stop),
+            "method": _size(method, seen, stop),
+        }
+        size["total"] = sum(size.values())
+    return sizes
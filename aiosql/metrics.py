@@ -0,0 +1,141 @@
+import bisect
+import threading
+from typing import Any
+
+# histogram bucket upper bounds, in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Histogram:
+    """Latency histogram with fixed buckets."""
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by linear interpolation within its bucket."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = BUCKETS[i - 1] if i > 0 else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max  # pragma: no cover
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "avg": self.sum / self.count if self.count else 0.0,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+        }
+
+
+class _Metric:
+    """Counters of one query."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.latency = _Histogram()
+        self.first_row = _Histogram()
+
+
+def _label(name: str) -> str:
+    return name.replace("\\", "\\\\").replace('"', '\\"')
+
+
+class QueryMetrics:
+    """Per-query call, error, latency and row counters.
+
+    Latencies include connection acquisition from pools and, for ``select``
+    queries, the consumption of the result generator by the caller.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: dict[str, _Metric] = {}
+
+    def observe(
+            self, query_name: str, elapsed: float, rows: int, error: bool, first_row: float|None = None
+    ) -> None:
+        """Record one call of a query."""
+        with self._lock:
+            metric = self._metrics.get(query_name)
+            if metric is None:
+                metric = self._metrics[query_name] = _Metric()
+            metric.calls += 1
+            metric.errors += error
+            metric.rows += rows
+            metric.latency.observe(elapsed)
+            if first_row is not None:
+                metric.first_row.observe(first_row)
+
+    def reset(self) -> None:
+        """Drop all collected data."""
+        with self._lock:
+            self._metrics.clear()
+
+    def as_dict(self) -> dict[str, dict[str, Any]]:
+        """Return collected data per query, with latencies in seconds."""
+        with self._lock:
+            return {
+                name: {
+                    "calls": m.calls,
+                    "errors": m.errors,
+                    "rows": m.rows,
+                    "latency": m.latency.as_dict(),
+                    "first_row": m.first_row.as_dict() if m.first_row.count else None,
+                }
+                for name, m in self._metrics.items()
+            }
+
+    def prometheus(self, prefix: str = "aiosql_query") -> str:
+        """Return collected data in Prometheus text exposition format."""
+        lines: list[str] = []
+
+        def counter(name: str, doc: str, attr: str) -> None:
+            lines.append(f"# HELP {prefix}_{name} {doc}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for query, m in self._metrics.items():
+                lines.append(f'{prefix}_{name}{{query="{_label(query)}"}} {getattr(m, attr)}')
+
+        def histogram(name: str, doc: str, attr: str) -> None:
+            lines.append(f"# HELP {prefix}_{name} {doc}")
+            lines.append(f"# TYPE {prefix}_{name} histogram")
+            for query, m in self._metrics.items():
+                h = getattr(m, attr)
+                if not h.count:
+                    continue
+                label, cumulated = _label(query), 0
+                for bound, n in zip(BUCKETS, h.counts):
+                    cumulated += n
+                    lines.append(f'{prefix}_{name}_bucket{{query="{label}",le="{bound}"}} {cumulated}')
+                lines.append(f'{prefix}_{name}_bucket{{query="{label}",le="+Inf"}} {h.count}')
+                lines.append(f'{prefix}_{name}_sum{{query="{label}"}} {h.sum}')
+                lines.append(f'{prefix}_{name}_count{{query="{label}"}} {h.count}')
+
+        with self._lock:
+            counter("calls_total", "Number of query calls.", "calls")
+            counter("errors_total", "Number of query calls which raised an exception.", "errors")
+            counter("rows_total", "Number of rows returned by queries.", "rows")
+            histogram("duration_seconds", "Query latency.", "latency")
+            histogram("first_row_seconds", "Time to the first row of select queries.", "first_row")
+        return "\n".join(lines) + "\n"
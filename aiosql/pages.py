@@ -0,0 +1,63 @@
+import re
+from typing import Any
+
+from .utils import SQLParseException, directive_args
+
+# names of the parameters and extra columns of page queries
+KEY = "_aiosql_key"
+LIMIT = "_aiosql_limit"
+
+_COLUMN = re.compile(r"[A-Za-z_]\w*")
+
+
+def pages_args(query_name: str, directive: str) -> tuple[list[str], bool]:
+    """Parse a ``-- @pages key=a,b order=desc`` directive into key columns and order."""
+    args = directive_args(query_name, "pages", directive, ("key", "order"))
+    if "key" not in args:
+        raise SQLParseException(f"missing @pages key in query {query_name}")
+    keys = args["key"].split(",")
+    if not all(_COLUMN.fullmatch(key) for key in keys):
+        raise SQLParseException(f"invalid @pages key in query {query_name}: {args['key']}")
+    order = args.get("order", "asc").lower()
+    if order not in ("asc", "desc"):
+        raise SQLParseException(f"invalid @pages order in query {query_name}: {order}")
+    return keys, order == "desc"
+
+
+def page_sql(sql: str, keys: list[str], desc: bool, after: bool) -> str:
+    """Wrap a select as a page query, ordered and limited on its key columns.
+
+    Key values are appended as extra columns, so that they can be retrieved
+    from any kind of row. Pages after the first one start after the key
+    of the last row of the previous page, which relies on a row value
+    comparison for composite keys.
+    """
+    body = sql.rstrip().rstrip(";")
+    extra = ", ".join(f"{key} AS {KEY}{i}" for i, key in enumerate(keys))
+    page = f"SELECT _aiosql_page.*, {extra}\nFROM (\n{body}\n) AS _aiosql_page"
+    if after:
+        op = "<" if desc else ">"
+        if len(keys) == 1:
+            page += f"\nWHERE {keys[0]} {op} :{KEY}0"
+        else:
+            marks = ", ".join(f":{KEY}{i}" for i in range(len(keys)))
+            page += f"\nWHERE ({', '.join(keys)}) {op} ({marks})"
+    order = " DESC" if desc else ""
+    page += f"\nORDER BY {', '.join(key + order for key in keys)}\nLIMIT :{LIMIT}"
+    return page
+
+
+def split_row(row: Any, nkeys: int) -> tuple[Any, tuple]:
+    """Separate a page row from its trailing key columns.
+
+    Plain tuples, lists and dicts are returned without the key columns,
+    other row types such as ``sqlite3.Row`` or ``asyncpg.Record`` are kept as is.
+    """
+    if isinstance(row, dict):
+        return row, tuple(row.pop(f"{KEY}{i}") for i in range(nkeys))
+    elif type(row) in (tuple, list):
+        return row[:-nkeys], tuple(row[-nkeys:])
+    elif hasattr(row, "keys"):
+        return row, tuple(row[f"{KEY}{i}"] for i in range(nkeys))
+    else:  # other sequences
+        return row, tuple(row[-nkeys:])
@@ -0,0 +1,511 @@
+import time
+import asyncio
+import threading
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable
+
+from .utils import log
+from .routing import ReplicaRouter
+
+
+class PoolStats:
+    """Acquire latency and saturation statistics of a connection pool."""
+
+    def __init__(self, max_size: int|None = None):
+        self.max_size = max_size
+        self.acquired = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.in_use = 0
+        self.max_in_use = 0
+        # third-party synchronous pools are measured from any thread
+        self._lock = threading.Lock()
+
+    def acquire(self, wait: float, waited: bool = False) -> None:
+        """Record a connection acquisition which took ``wait`` seconds."""
+        with self._lock:
+            self.acquired += 1
+            self.waits += waited
+            self.wait_time += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+
+    def release(self) -> None:
+        """Record a connection release."""
+        with self._lock:
+            self.in_use -= 1
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return statistics as a dictionary, ``saturation`` is the ratio of connections in use."""
+        with self._lock:
+            return {
+                "max_size": self.max_size,
+                "in_use": self.in_use,
+                "max_in_use": self.max_in_use,
+                "saturation": self.in_use / self.max_size if self.max_size else None,
+                "acquired": self.acquired,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "wait_time": self.wait_time,
+                "avg_wait": self.wait_time / self.acquired if self.acquired else 0.0,
+                "max_wait": self.max_wait,
+            }
+
+
+class _BasePool:
+    """Bookkeeping shared by synchronous and asynchronous pools, callers hold the lock."""
+
+    def __init__(self, connect: Callable[[], Any], max_size: int, timeout: float, idle_timeout: float):
+        if max_size < 1:
+            raise ValueError(f"pool max_size must be positive: {max_size}")
+        self._connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        # idle connections and their release time, most recently released last
+        self._idle: dict[int, tuple[Any, float]] = {}
+        self._size = 0
+        self._closed = False
+        self._stats = PoolStats(max_size)
+        self._created = 0
+        self._reaped = 0
+
+    def _reap(self, now: float) -> list[Any]:
+        """Remove expired idle connections, to be closed by the caller."""
+        expired = [cid for cid, (_, released) in self._idle.items() if now - released > self.idle_timeout]
+        conns = [self._idle.pop(cid)[0] for cid in expired]
+        self._size -= len(conns)
+        self._reaped += len(conns)
+        return conns
+
+    def _take(self, preferred: Any = None) -> tuple[Any, bool]:
+        """Get an idle connection, or tell whether a new one may be created."""
+        if self._closed:
+            raise ValueError("cannot acquire a connection from a closed pool")
+        if self._idle:
+            # the preferred connection may have been closed, and its id reused
+            if preferred is not None and self._idle.get(id(preferred), (None,))[0] is preferred:
+                return self._idle.pop(id(preferred))[0], False
+            return self._idle.popitem()[1][0], False
+        elif self._size < self.max_size:
+            self._size += 1
+            self._created += 1
+            return None, True
+        return None, False
+
+    def _put(self, conn: Any, discard: bool) -> Any:
+        """Put a connection back, return it if it must be closed."""
+        self._stats.release()
+        if discard or self._closed:
+            self._size -= 1
+            return conn
+        self._idle[id(conn)] = (conn, time.monotonic())
+        return None
+
+    def _drain(self) -> list[Any]:
+        """Mark the pool closed, return idle connections to be closed."""
+        self._closed = True
+        conns = [conn for conn, _ in self._idle.values()]
+        self._size -= len(conns)
+        self._idle.clear()
+        return conns
+
+    def _stats_dict(self) -> dict[str, Any]:
+        stats = self._stats.as_dict()
+        stats.update(size=self._size, idle=len(self._idle), created=self._created, reaped=self._reaped)
+        return stats
+
+
+class ConnectionPool(_BasePool):
+    """Thread-safe pool of PEP 249 connections.
+
+    Query functions accept a pool in place of a connection: a connection is
+    acquired for the duration of the call (or of the iteration for ``select``),
+    committed on success or rolled back on errors, and released.
+
+    - :param connect: callable which returns a new connection.
+    - :param max_size: maximum number of open connections, defaults to 10.
+    - :param timeout: seconds to wait for a connection when all are in use, defaults to 30.
+    - :param idle_timeout: seconds after which an idle connection is closed, defaults to 600.
+    - :param thread_affinity: whether to hand a thread the connection it used last, if idle.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        max_size: int = 10,
+        timeout: float = 30.0,
+        idle_timeout: float = 600.0,
+        thread_affinity: bool = True,
+    ):
+        super().__init__(connect, max_size, timeout, idle_timeout)
+        self.thread_affinity = thread_affinity
+        self._cond = threading.Condition()
+        self._local = threading.local()
+
+    def _close_all(self, conns: list[Any]) -> None:
+        # do not keep the last connection of this thread, other threads check it when acquiring
+        if any(conn is getattr(self._local, "conn", None) for conn in conns):
+            self._local.conn = None
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception as e:  # pragma: no cover
+                log.warning(f"error while closing pooled connection: {e}")
+
+    def acquire(self, timeout: float|None = None) -> Any:
+        """Get a connection from the pool, waiting if all are in use.
+
+        Raise ``TimeoutError`` if none is available within ``timeout`` seconds.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        waited, expired = False, []
+        preferred = getattr(self._local, "conn", None) if self.thread_affinity else None
+        try:
+            with self._cond:
+                while True:
+                    expired += self._reap(time.monotonic())
+                    conn, create = self._take(preferred)
+                    if conn is not None or create:
+                        break
+                    remaining = timeout - (time.monotonic() - start)
+                    if remaining <= 0:
+                        self._stats.timeouts += 1
+                        raise TimeoutError(f"no pooled connection available after {timeout} seconds")
+                    waited = True
+                    self._cond.wait(remaining)
+        finally:
+            self._close_all(expired)
+        if create:
+            try:
+                conn = self._connect()
+            except BaseException:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+        with self._cond:
+            self._stats.acquire(time.monotonic() - start, waited)
+        self._local.conn = conn
+        return conn
+
+    def release(self, conn: Any, discard: bool = False) -> None:
+        """Give back a connection to the pool, closing it if ``discard``."""
+        with self._cond:
+            conn = self._put(conn, discard)
+            self._cond.notify()
+        if conn is not None:
+            self._close_all([conn])
+
+    @contextmanager
+    def connection(self, timeout: float|None = None):
+        """Context manager to use a connection from the pool.
+
+        The transaction is committed on success and rolled back on errors.
+        A connection which fails to roll back is discarded.
+        """
+        conn = self.acquire(timeout)
+        discard = False
+        try:
+            yield conn
+            if hasattr(conn, "commit"):
+                conn.commit()
+        except BaseException:
+            if hasattr(conn, "rollback"):
+                try:
+                    conn.rollback()
+                except Exception:
+                    discard = True
+            raise
+        finally:
+            self.release(conn, discard)
+
+    def reap(self) -> int:
+        """Close idle connections older than ``idle_timeout``, return how many."""
+        with self._cond:
+            expired = self._reap(time.monotonic())
+        self._close_all(expired)
+        return len(expired)
+
+    def close(self) -> None:
+        """Close idle connections, others are closed when released."""
+        with self._cond:
+            conns = self._drain()
+            self._cond.notify_all()
+        self._close_all(conns)
+
+    def stats(self) -> dict[str, Any]:
+        """Return pool usage, acquire latency and saturation statistics."""
+        with self._cond:
+            return self._stats_dict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class AsyncConnectionPool(_BasePool):
+    """Pool of asynchronous connections, e.g. for ``aiosqlite``.
+
+    Asynchronous query functions accept a pool in place of a connection,
+    with the same semantics as ``ConnectionPool``.
+
+    - :param connect: callable which returns an awaitable new connection,
+      e.g. ``lambda: aiosqlite.connect("db.sqlite")``.
+    - :param max_size: maximum number of open connections, defaults to 10.
+    - :param timeout: seconds to wait for a connection when all are in use, defaults to 30.
+    - :param idle_timeout: seconds after which an idle connection is closed, defaults to 600.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        max_size: int = 10,
+        timeout: float = 30.0,
+        idle_timeout: float = 600.0,
+    ):
+        super().__init__(connect, max_size, timeout, idle_timeout)
+        # created on first use so that the pool may be built outside of the event loop
+        self._cond: asyncio.Condition|None = None
+
+    def _condition(self) -> asyncio.Condition:
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    async def _close_all(self, conns: list[Any]) -> None:
+        for conn in conns:
+            try:
+                await conn.close()
+            except Exception as e:  # pragma: no cover
+                log.warning(f"error while closing pooled connection: {e}")
+
+    async def acquire(self, timeout: float|None = None) -> Any:
+        """Get a connection from the pool, waiting if all are in use.
+
+        Raise ``TimeoutError`` if none is available within ``timeout`` seconds.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        waited, expired = False, []
+        cond = self._condition()
+        try:
+            async with cond:
+                while True:
+                    expired += self._reap(time.monotonic())
+                    conn, create = self._take()
+                    if conn is not None or create:
+                        break
+                    remaining = timeout - (time.monotonic() - start)
+                    if remaining <= 0:
+                        self._stats.timeouts += 1
+                        raise TimeoutError(f"no pooled connection available after {timeout} seconds")
+                    waited = True
+                    try:
+                        await asyncio.wait_for(cond.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            await self._close_all(expired)
+        if create:
+            try:
+                conn = await self._connect()
+            except BaseException:
+                async with cond:
+                    self._size -= 1
+                    cond.notify()
+                raise
+        self._stats.acquire(time.monotonic() - start, waited)
+        return conn
+
+    async def release(self, conn: Any, discard: bool = False) -> None:
+        """Give back a connection to the pool, closing it if ``discard``."""
+        cond = self._condition()
+        async with cond:
+            conn = self._put(conn, discard)
+            cond.notify()
+        if conn is not None:
+            await self._close_all([conn])
+
+    @asynccontextmanager
+    async def connection(self, timeout: float|None = None):
+        """Asynchronous context manager to use a connection from the pool.
+
+        The transaction is committed on success and rolled back on errors.
+        A connection which fails to roll back is discarded.
+        """
+        conn = await self.acquire(timeout)
+        discard = False
+        try:
+            yield conn
+            if hasattr(conn, "commit"):
+                await conn.commit()
+        except BaseException:
+            if hasattr(conn, "rollback"):
+                try:
+                    await conn.rollback()
+                except Exception:
+                    discard = True
+            raise
+        finally:
+            await self.release(conn, discard)
+
+    async def reap(self) -> int:
+        """Close idle connections older than ``idle_timeout``, return how many."""
+        async with self._condition():
+            expired = self._reap(time.monotonic())
+        await self._close_all(expired)
+        return len(expired)
+
+    async def close(self) -> None:
+        """Close idle connections, others are closed when released."""
+        cond = self._condition()
+        async with cond:
+            conns = self._drain()
+            cond.notify_all()
+        await self._close_all(conns)
+
+    def stats(self) -> dict[str, Any]:
+        """Return pool usage, acquire latency and saturation statistics."""
+        return self._stats_dict()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+# statistics about third-party pools used by query functions
+_STATS: weakref.WeakKeyDictionary[Any, PoolStats] = weakref.WeakKeyDictionary()
+
+
+def _foreign_stats(pool: Any) -> PoolStats:
+    """Get the statistics recorded about a third-party pool."""
+    stats = _STATS.get(pool)
+    if stats is None:
+        if hasattr(pool, "get_max_size"):  # asyncpg
+            max_size = pool.get_max_size()
+        else:  # psycopg_pool
+            max_size = getattr(pool, "max_size", None)
+        stats = _STATS[pool] = PoolStats(max_size)
+    return stats
+
+
+def _measured(borrow: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    """Record acquire latency and usage of a third-party pool."""
+
+    @contextmanager
+    def provider(pool, operation=None, route=None):
+        stats, start = _foreign_stats(pool), time.monotonic()
+        with borrow(pool) as conn:
+            stats.acquire(time.monotonic() - start)
+            try:
+                yield conn
+            finally:
+                stats.release()
+
+    return provider
+
+
+def _ameasured(borrow: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    """Record acquire latency and usage of an asynchronous third-party pool."""
+
+    @asynccontextmanager
+    async def provider(pool, operation=None, route=None):
+        stats, start = _foreign_stats(pool), time.monotonic()
+        async with borrow(pool) as conn:
+            stats.acquire(time.monotonic() - start)
+            try:
+                yield conn
+            finally:
+                stats.release()
+
+    return provider
+
+
+def _pooled(borrow: Callable[[Any], Any]) -> Callable[..., Any]:
+    """Ignore query details when borrowing from an aiosql pool."""
+
+    def provider(pool, operation=None, route=None):
+        return borrow(pool)
+
+    return provider
+
+
+def pool_stats(pool: Any) -> dict[str, Any]:
+    """Return acquire latency and saturation statistics about a pool.
+
+    Third-party pools (``psycopg_pool``, ``asyncpg``) are measured while used by query functions.
+    """
+    if isinstance(pool, (ConnectionPool, AsyncConnectionPool)):
+        return pool.stats()
+    return _foreign_stats(pool).as_dict()
+
+
+# known connection providers by type, None for plain connections.
+# providers are called with the pool, the query operation and its route directive,
+# and return a context manager which yields a connection, or possibly another pool.
+_PROVIDERS: dict[type, Callable[..., Any]|None] = {}
+_APROVIDERS: dict[type, Callable[..., Any]|None] = {}
+# types known to be plain connections, for a quick check in query functions.
+_PLAIN: set[type] = set()
+_APLAIN: set[type] = set()
+
+
+def _connection_provider(cls: type) -> Callable[..., Any]|None:
+    """Tell how to borrow a connection from an instance of cls, if it is a pool.
+
+    Pools are ``ConnectionPool``, ``ReplicaRouter`` or types with a ``connection()``
+    context manager along with ``getconn``/``putconn`` (psycopg_pool).
+    The answer is cached so that detection occurs once per type.
+    """
+    try:
+        return _PROVIDERS[cls]
+    except KeyError:
+        pass
+    provider = None
+    if issubclass(cls, ConnectionPool):
+        provider = _pooled(getattr(cls, "connection"))
+    elif issubclass(cls, ReplicaRouter):
+        provider = getattr(cls, "connection")
+    elif callable(getattr(cls, "connection", None)) and hasattr(cls, "getconn") and hasattr(cls, "putconn"):
+        provider = _measured(getattr(cls, "connection"))  # avoid mypy warning
+    _PROVIDERS[cls] = provider
+    if provider is None:
+        _PLAIN.add(cls)
+    return provider
+
+
+def _async_connection_provider(cls: type) -> Callable[..., Any]|None:
+    """Tell how to borrow a connection from an instance of cls, if it is an asynchronous pool.
+
+    Pools are ``AsyncConnectionPool``, ``ReplicaRouter``, types with a ``connection()`` asynchronous context
+    manager along with ``getconn``/``putconn`` (psycopg_pool), or with an ``acquire()``
+    asynchronous context manager along with ``release`` (asyncpg).
+    The answer is cached so that detection occurs once per type.
+    """
+    try:
+        return _APROVIDERS[cls]
+    except KeyError:
+        pass
+    provider = None
+    if issubclass(cls, AsyncConnectionPool):
+        provider = _pooled(getattr(cls, "connection"))
+    elif issubclass(cls, ReplicaRouter):
+        provider = getattr(cls, "aconnection")
+    elif callable(getattr(cls, "connection", None)) and hasattr(cls, "getconn") and hasattr(cls, "putconn"):
+        provider = _ameasured(getattr(cls, "connection"))  # avoid mypy warning
+    elif callable(getattr(cls, "acquire", None)) and hasattr(cls, "release"):
+        provider = _ameasured(getattr(cls, "acquire"))  # avoid mypy warning
+    _APROVIDERS[cls] = provider
+    if provider is None:
+        _APLAIN.add(cls)
+    return provider
@@ -0,0 +1,161 @@
+import time
+import threading
+from contextvars import ContextVar
+from typing import Any, Callable
+
+# phases of a query call, in order
+PHASES = ("params", "cursor", "execute", "fetch", "convert", "cleanup")
+
+# phases spent in aiosql itself, the rest of the call is attributed to aiosql as "other"
+_OWN = ("params", "convert")
+
+# per-call phase durations of the query being profiled in the current context
+_CURRENT: ContextVar[dict[str, float]|None] = ContextVar("aiosql_profile", default=None)
+
+
+def _timed(phase: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap a callable so that its duration is added to a phase of the current call."""
+
+    def timed(*args, **kwargs):
+        phases = _CURRENT.get()
+        if phases is None:
+            return fn(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            phases[phase] += time.perf_counter() - start
+
+    return timed
+
+
+class ProfiledCursor:
+    """DB-API cursor proxy which times execution, fetching and cleanup."""
+
+    def __init__(self, cursor: Any) -> None:
+        self._cursor = cursor
+        self._next = _timed("fetch", cursor.__next__) if hasattr(cursor, "__next__") else None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+    def execute(self, *args, **kwargs) -> Any:
+        result = _timed("execute", self._cursor.execute)(*args, **kwargs)
+        return self if result is self._cursor else result
+
+    def executemany(self, *args, **kwargs) -> Any:
+        result = _timed("execute", self._cursor.executemany)(*args, **kwargs)
+        return self if result is self._cursor else result
+
+    def fetchone(self) -> Any:
+        return _timed("fetch", self._cursor.fetchone)()
+
+    def fetchmany(self, *args, **kwargs) -> Any:
+        return _timed("fetch", self._cursor.fetchmany)(*args, **kwargs)
+
+    def fetchall(self) -> Any:
+        return _timed("fetch", self._cursor.fetchall)()
+
+    def close(self) -> Any:
+        return _timed("cleanup", self._cursor.close)()
+
+    def __iter__(self):
+        if self._next is None:
+            # not an iterator itself, e.g. a generator
+            self._next = _timed("fetch", iter(self._cursor).__next__)
+        return self
+
+    def __next__(self) -> Any:
+        assert self._next is not None  # help type checker
+        return self._next()
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, *exc) -> Any:
+        return _timed("cleanup", self._cursor.__exit__)(*exc)
+
+
+class ProfiledConnection:
+    """DB-API connection proxy which times cursor creation and direct executions."""
+
+    def __init__(self, connection: Any) -> None:
+        self._connection = connection
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._connection, name)
+        if name in ("execute", "executemany", "executescript"):
+            return _timed("execute", attr)
+        return attr
+
+    def cursor(self, *args, **kwargs) -> ProfiledCursor:
+        return ProfiledCursor(_timed("cursor", self._connection.cursor)(*args, **kwargs))
+
+
+class QueryProfiler:
+    """Aggregate time spent per phase of query calls, per query.
+
+    Phases are parameter preparation, cursor creation, execution, fetching,
+    row conversion to record classes and cleanup. Database phases are only
+    available with synchronous DB-API drivers, they are included in ``other``
+    otherwise, as is the remaining time spent in aiosql and adapters.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # query name to number of calls, total time and phase times
+        self._queries: dict[str, tuple[list[Any], dict[str, float]]] = {}
+
+    def start(self) -> dict[str, float]:
+        """Return per-phase durations for a new call."""
+        return dict.fromkeys(PHASES, 0.0)
+
+    def finish(self, query_name: str, total: float, phases: dict[str, float]) -> None:
+        """Record the phases of a finished call."""
+        with self._lock:
+            entry = self._queries.get(query_name)
+            if entry is None:
+                entry = self._queries[query_name] = ([0, 0.0], dict.fromkeys(PHASES, 0.0))
+            entry[0][0] += 1
+            entry[0][1] += total
+            for phase, duration in phases.items():
+                entry[1][phase] += duration
+
+    def reset(self) -> None:
+        """Drop collected data."""
+        with self._lock:
+            self._queries.clear()
+
+    def as_dict(self) -> dict[str, dict[str, Any]]:
+        """Return calls, total time, time per phase and aiosql overhead ratio per query."""
+        with self._lock:
+            data = {}
+            for name, ((calls, total), phases) in self._queries.items():
+                other = max(total - sum(phases.values()), 0.0)
+                own = sum(phases[p] for p in _OWN) + other
+                data[name] = {
+                    "calls": calls,
+                    "total": total,
+                    "phases": dict(phases, other=other),
+                    "overhead": own / total if total else 0.0,
+                }
+            return data
+
+    def report(self) -> str:
+        """Return a table of average time per call and phase, in µs, by decreasing total time."""
+        data = sorted(self.as_dict().items(), key=lambda item: -item[1]["total"])
+        columns = PHASES + ("other",)
+        lines = [
+            f"{'query':<30} {'calls':>7} {'total':>9} "
+            + " ".join(f"{c:>8}" for c in columns)
+            + f" {'aiosql%':>8}"
+        ]
+        for name, d in data:
+            calls = d["calls"]
+            lines.append(
+                f"{name[:30]:<30} {calls:>7} {1e6 * d['total'] / calls:>9.1f} "
+                + " ".join(f"{1e6 * d['phases'][c] / calls:>8.1f}" for c in columns)
+                + f" {100 * d['overhead']:>8.1f}"
+            )
+        return "\n".join(lines) + "\n"
@@ -1,5 +1,11 @@
 import re
+import time
 import inspect
+import asyncio
+import functools
+from contextlib import asynccontextmanager, contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
 from pathlib import Path
 from types import MethodType
 
@@ -7,7 +13,63 @@ from types import MethodType
 from typing import Any, Callable, cast
 
 from .types import DriverAdapterProtocol, QueryDatum, QueryDataTree, QueryFn, SQLOperationType
-from .utils import SQLLoadException, SQLParseException, log
+from .utils import SQLLoadException, SQLParseException, directive_args, log
+from .cache import MISS, QueryCache, read_tables, write_tables
+from .coalesce import SingleFlight
+from .batch import BatchLoader
+from .metrics import QueryMetrics
+from .tracing import QueryEvent, QueryHook
+from .slowlog import SlowQueryLog
+from .profiler import _CURRENT, ProfiledConnection, QueryProfiler, _timed
+from .routing import _READ_OPS, ROUTES
+from .pages import KEY, LIMIT, pages_args, split_row
+from .chunks import ChunkReport, chunked_args, next_size, row_count
+from .export import BATCH_SIZE, ExportReport, awrite_cursor, export_args, export_format, write_cursor
+from .variants import (
+    MAX_VARIANTS, expand_values, is_templated, list_names, optional_blocks, row_chunks,
+    substitute_templates, template_key, template_refs, temp_table, values_row,
+)
+from .pool import _PROVIDERS, _APROVIDERS, _PLAIN, _APLAIN, _connection_provider, _async_connection_provider
+
+# current pipeline, if any, see Queries.pipeline
+_PIPELINE: ContextVar[Any] = ContextVar("aiosql_pipeline", default=None)
+
+# operations which modify data, for cache invalidation
+_WRITE_OPS = (
+    SQLOperationType.INSERT_RETURNING,
+    SQLOperationType.INSERT_UPDATE_DELETE,
+    SQLOperationType.INSERT_UPDATE_DELETE_MANY,
+    SQLOperationType.INSERT_RETURNING_MANY,
+    SQLOperationType.SCRIPT,
+)
+
+
+def _cache_key(attributes, args, kwargs) -> Any:
+    """Build a hashable key from query parameters, None if they are not hashable."""
+    if attributes and kwargs:
+        kwargs = dict(kwargs)
+        for var, atts in attributes.items():
+            if var in kwargs:
+                val = kwargs[var]
+                kwargs[var] = tuple(getattr(val, att, None) for att in atts)
+    key = (args, tuple(sorted(kwargs.items()))) if kwargs else args
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def _has_option(query_data: Any, name: str) -> bool:
+    """Tell whether some query in a list or tree of query data has a directive."""
+    items = query_data.values() if isinstance(query_data, dict) else query_data
+    for item in items:
+        if isinstance(item, dict):
+            if _has_option(item, name):
+                return True
+        elif item.options and name in item.options:
+            return True
+    return False
 
 
 class Queries:
@@ -24,17 +86,46 @@ class Queries:
       adapters (e.g. "sqlite3", "psycopg").
       If you have defined your own adapter class, you can pass its constructor.
     - :param kwargs_only: whether to reject positional parameters, defaults to true.
+    - :param single_flight: whether to coalesce identical concurrent ``^`` and ``$`` calls,
+      defaults to false.
+    - :param metrics: whether to collect per-query latency and row counts, defaults to false.
+    - :param hooks: list of hooks called around query executions, see ``QueryHook``,
+      defaults to none. Hooks may be added to the list later.
+    - :param slow_query: threshold in seconds or ``SlowQueryLog`` to log slow query calls,
+      defaults to none.
+    - :param profile: whether to record time spent per phase of query calls, defaults to false.
     """
 
     def __init__(
             self,
             driver_adapter: DriverAdapterProtocol,
             kwargs_only: bool = True,
+            single_flight: bool = False,
+            metrics: bool = False,
+            hooks: list[QueryHook]|None = None,
+            slow_query: float|SlowQueryLog|None = None,
+            profile: bool = False,
         ):
         self.driver_adapter: DriverAdapterProtocol = driver_adapter
         self.is_aio: bool = getattr(driver_adapter, "is_aio_driver", False)
         self._kwargs_only = kwargs_only
         self._available_queries: set[str] = set()
+        # shared by child queries, created when a query has a "@cache" directive
+        self.query_cache: QueryCache|None = None
+        self.single_flight: SingleFlight|None = SingleFlight() if single_flight else None
+        self.metrics: QueryMetrics|None = QueryMetrics() if metrics else None
+        self.hooks: list[QueryHook]|None = hooks
+        # also created when a query has a "@slow" directive
+        self.slow_log: SlowQueryLog|None = (
+            SlowQueryLog(slow_query) if isinstance(slow_query, (int, float)) else slow_query
+        )
+        self.profiler: QueryProfiler|None = None
+        if profile:
+            self._set_profiler(QueryProfiler())
+        # query name to loader, for ``^`` queries with a ``-- @batch`` directive
+        self.batch_loaders: dict[str, BatchLoader] = {}
+        # query name to memoized SQL variants, for queries with template parameters
+        self.variants: dict[str, Any] = {}
 
     #
     # INTERNAL UTILS
@@ -112,16 +203,22 @@ class Queries:
     # NOTE about coverage: because __code__ is set to reflect the actual SQL file
     # source, coverage does note detect that the "fn" functions are actually called,
     # hence the "no cover" hints.
-    def _make_sync_fn(self, query_datum: QueryDatum) -> QueryFn:
-        """Build a synchronous dynamic method from a parsed query."""
+    def _make_sync_fn(self, query_datum: QueryDatum, route: str|None = None) -> QueryFn:
+        """Build a synchronous dynamic method from a parsed query.
+
+        Functions first check that they are given a plain connection, and otherwise
+        defer to a ``_make_provided`` wrapper, so that there is no extra call layer.
+        """
 
-        query_name, doc_comments, operation, sql, record_class, signature, floc, attributes, params = (
+        query_name, doc_comments, operation, sql, record_class, signature, floc, attributes, params, *_ = (
             query_datum
         )
 
         if operation == SQLOperationType.INSERT_RETURNING:
 
             def fn(self, conn, *args, **kwargs):  # pragma: no cover
+                if type(conn) not in _PLAIN:
+                    return pfn(self, conn, *args, **kwargs)
                 return self.driver_adapter.insert_returning(
                     conn, query_name, sql, self._params(attributes, params, args, kwargs)
                 )
@@ -129,6 +226,8 @@ class Queries:
         elif operation == SQLOperationType.INSERT_UPDATE_DELETE:
 
             def fn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                if type(conn) not in _PLAIN:
+                    return pfn(self, conn, *args, **kwargs)
                 return self.driver_adapter.insert_update_delete(
                     conn, query_name, sql, self._params(attributes, params, args, kwargs)
                 )
@@ -136,6 +235,8 @@ class Queries:
         elif operation == SQLOperationType.INSERT_UPDATE_DELETE_MANY:
 
             def fn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                if type(conn) not in _PLAIN:
+                    return pfn(self, conn, *args, **kwargs)
                 assert not kwargs, "cannot use named parameters in many query"  # help type checker
                 return self.driver_adapter.insert_update_delete_many(conn, query_name, sql, *args)
 
@@ -146,6 +247,8 @@ class Queries:
                 raise SQLParseException(f"cannot use named parameters in SQL script: {query_name}")
 
             def fn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                if type(conn) not in _PLAIN:
+                    return pfn(self, conn, *args, **kwargs)
                 assert not args and not kwargs, f"cannot use parameters in SQL script: {query_name}"
                 return self.driver_adapter.execute_script(conn, sql)
 
@@ -157,6 +260,8 @@ class Queries:
                 log.warning(f"query {query_name} at {fname}:{lineno} may not be a select, consider adding an operator, eg '!'")
 
             def fn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                if type(conn) not in _PLAIN:
+                    return pfn(self, conn, *args, **kwargs)
                 return self.driver_adapter.select(
                     conn, query_name, sql, self._params(attributes, params, args, kwargs), record_class
                 )
@@ -164,6 +269,8 @@ class Queries:
         elif operation == SQLOperationType.SELECT_ONE:
 
             def fn(self, conn, *args, **kwargs):  # pragma: no cover
+                if type(conn) not in _PLAIN:
+                    return pfn(self, conn, *args, **kwargs)
                 return self.driver_adapter.select_one(
                     conn, query_name, sql, self._params(attributes, params, args, kwargs), record_class
                 )
@@ -171,6 +278,8 @@ class Queries:
         elif operation == SQLOperationType.SELECT_VALUE:
 
             def fn(self, conn, *args, **kwargs):  # pragma: no cover
+                if type(conn) not in _PLAIN:
+                    return pfn(self, conn, *args, **kwargs)
                 return self.driver_adapter.select_value(
                     conn, query_name, sql, self._params(attributes, params, args, kwargs)
                 )
@@ -178,20 +287,27 @@ class Queries:
         else:
             raise ValueError(f"Unknown operation: {operation}")
 
-        return self._query_fn(
+        qfn = self._query_fn(
             fn, query_name, doc_comments, sql, operation, signature, floc, attributes, params
         )
+        pfn = self._make_provided(qfn, query_datum, route)
+        return qfn
+
+    def _make_async_fn(self, query_datum: QueryDatum, route: str|None = None) -> QueryFn:
+        """Build an asynchronous dynamic method from a parsed query.
 
-    def _make_async_fn(self, query_datum: QueryDatum) -> QueryFn:
-        """Build an asynchronous dynamic method from a parsed query."""
+        As with ``_make_sync_fn``, pools and routers are handled by a ``_make_aprovided`` wrapper.
+        """
 
-        query_name, doc_comments, operation, sql, record_class, signature, floc, attributes, params = (
+        query_name, doc_comments, operation, sql, record_class, signature, floc, attributes, params, *_ = (
             query_datum
         )
 
         if operation == SQLOperationType.INSERT_RETURNING:
 
-            async def afn(self, conn, *args, **kwargs):  # pragma: no cover
+            async def afn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                if type(conn) not in _APLAIN:
+                    return await pfn(self, conn, *args, **kwargs)
                 return await self.driver_adapter.insert_returning(
                     conn, query_name, sql, self._params(attributes, params, args, kwargs)
                 )
@@ -199,6 +315,8 @@ class Queries:
         elif operation == SQLOperationType.INSERT_UPDATE_DELETE:
 
             async def afn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                if type(conn) not in _APLAIN:
+                    return await pfn(self, conn, *args, **kwargs)
                 return await self.driver_adapter.insert_update_delete(
                     conn, query_name, sql, self._params(attributes, params, args, kwargs)
                 )
@@ -206,6 +324,8 @@ class Queries:
         elif operation == SQLOperationType.INSERT_UPDATE_DELETE_MANY:
 
             async def afn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                if type(conn) not in _APLAIN:
+                    return await pfn(self, conn, *args, **kwargs)
                 assert not kwargs, "cannot use named parameters in many query"  # help type checker
                 return await self.driver_adapter.insert_update_delete_many(conn, query_name, sql, *args)
 
@@ -216,6 +336,8 @@ class Queries:
                 raise SQLParseException(f"cannot use named parameters in SQL script: {query_name}")
 
             async def afn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                if type(conn) not in _APLAIN:
+                    return await pfn(self, conn, *args, **kwargs)
                 assert not args and not kwargs, f"cannot use parameters in SQL script: {query_name}"
                 return await self.driver_adapter.execute_script(conn, sql)
 
@@ -228,6 +350,10 @@ class Queries:
 
             # async generator
             async def afn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                if type(conn) not in _APLAIN:
+                    async for row in pfn(self, conn, *args, **kwargs):
+                        yield row
+                    return
                 async for row in self.driver_adapter.select(
                     conn, query_name, sql, self._params(attributes, params, args, kwargs), record_class
                 ):
@@ -236,6 +362,8 @@ class Queries:
         elif operation == SQLOperationType.SELECT_ONE:
 
             async def afn(self, conn, *args, **kwargs):  # pragma: no cover
+                if type(conn) not in _APLAIN:
+                    return await pfn(self, conn, *args, **kwargs)
                 return await self.driver_adapter.select_one(
                     conn, query_name, sql, self._params(attributes, params, args, kwargs), record_class
                 )
@@ -243,6 +371,8 @@ class Queries:
         elif operation == SQLOperationType.SELECT_VALUE:
 
             async def afn(self, conn, *args, **kwargs):  # pragma: no cover
+                if type(conn) not in _APLAIN:
+                    return await pfn(self, conn, *args, **kwargs)
                 return await self.driver_adapter.select_value(
                     conn, query_name, sql, self._params(attributes, params, args, kwargs)
                 )
@@ -250,31 +380,1298 @@ class Queries:
         else:
             raise ValueError(f"Unknown operation: {operation}")  # pragma: no cover
 
-        return self._query_fn(
+        qfn = self._query_fn(
             afn, query_name, doc_comments, sql, operation, signature, floc, attributes, params
         )
+        pfn = self._make_aprovided(qfn, query_datum, route)
+        return qfn
+
+    def _make_templated(self, query_datum: QueryDatum, is_aio: bool) -> QueryFn:
+        """Build a dynamic method for a query with template parameters, eg ``:i:table``.
+
+        Each combination of identifier values, list sizes and kept optional blocks
+        gives a processed SQL variant and its function, which are memoized in a
+        bounded LRU cache.
+        With a ``-- @temp`` directive, large lists are loaded in temporary tables.
+        """
+
+        query_name, doc_comments, operation, sql, record_class, signature, floc, attributes, params, *_ = (
+            query_datum
+        )
+
+        refs = template_refs(query_name, sql)
+        blocks = optional_blocks(query_name, sql)
+        quote = getattr(self.driver_adapter, "identifier_quote", '"')
+        driver_adapter = self.driver_adapter
+        make_fn = self._make_async_fn if is_aio else self._make_sync_fn
+
+        directive = (query_datum.options or {}).get("temp")
+        threshold, sql_type = 0, ""
+        if directive is not None:
+            args = directive_args(query_name, "temp", directive, ("threshold", "type"))
+            try:
+                threshold = int(args.get("threshold", "1000"))
+            except ValueError as e:
+                raise SQLParseException(f"invalid @temp argument in query {query_name}: {e}")
+            sql_type = args.get("type", "BIGINT")
+            if not re.fullmatch(r"\w+(\s*\(\s*\d+(\s*,\s*\d+)?\s*\))?", sql_type):
+                raise SQLParseException(f"invalid @temp argument in query {query_name}: type={sql_type}")
+            # lists below the threshold are bound as arrays
+            if getattr(driver_adapter, "array_binding", False):
+                refs = {name: "a*" if kind == "v*" else kind for name, kind in refs.items()}
+
+        @functools.lru_cache(maxsize=MAX_VARIANTS)
+        def variant(key):
+            vsql = substitute_templates(query_name, sql, refs, key, quote)
+            # list sizes change parameters, which some adapters track per query name
+            vname = query_name
+            if "v*" in refs.values():
+                vname += str([size for ref, size in zip(refs, key) if refs[ref] == "v*"])
+            if blocks:
+                vname += "{" + "".join("1" if kept else "0" for kept in key[len(refs):]) + "}"
+            vsql = driver_adapter.process_sql(vname, operation, vsql)
+            return make_fn(query_datum._replace(query_name=vname, sql=vsql))
+
+        self.variants[query_name.rpartition(".")[2]] = variant
+        variant.refs = refs  # type: ignore
+        variant.blocks = blocks  # type: ignore
+
+        if directive is None:
+
+            # works for both sync and async functions, which are returned as is
+            def tfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                fn = variant(template_key(query_name, refs, kwargs, blocks=blocks))
+                return fn(self, conn, *args, **kwargs)
+
+        elif is_aio:
+
+            async def aload(self, conn, loads):  # pragma: no cover
+                for name, values in loads.items():
+                    await self.driver_adapter.load_list(conn, temp_table(name), values, sql_type)
+
+            async def aselect(self, conn, loads, fn, args, kwargs):  # pragma: no cover
+                await aload(self, conn, loads)
+                async for row in fn(self, conn, *args, **kwargs):
+                    yield row
+
+            async def acall(self, conn, loads, fn, args, kwargs):  # pragma: no cover
+                await aload(self, conn, loads)
+                return await fn(self, conn, *args, **kwargs)
+
+            def tfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                loads = dict()
+                fn = variant(template_key(query_name, refs, kwargs, loads, threshold, blocks))
+                if not loads:
+                    return fn(self, conn, *args, **kwargs)
+                elif operation == SQLOperationType.SELECT:
+                    return aselect(self, conn, loads, fn, args, kwargs)
+                else:
+                    return acall(self, conn, loads, fn, args, kwargs)
+
+        else:
+
+            def load(self, conn, loads):  # pragma: no cover
+                for name, values in loads.items():
+                    self.driver_adapter.load_list(conn, temp_table(name), values, sql_type)
+
+            # lists are loaded when the generator is first advanced
+            def select(self, conn, loads, fn, args, kwargs):  # pragma: no cover
+                load(self, conn, loads)
+                yield from fn(self, conn, *args, **kwargs)
+
+            def tfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                loads = dict()
+                fn = variant(template_key(query_name, refs, kwargs, loads, threshold, blocks))
+                if not loads:
+                    return fn(self, conn, *args, **kwargs)
+                elif operation == SQLOperationType.SELECT:
+                    return select(self, conn, loads, fn, args, kwargs)
+                load(self, conn, loads)
+                return fn(self, conn, *args, **kwargs)
+
+        return self._query_fn(
+            tfn, query_name, doc_comments, sql, operation, signature, floc, attributes, params
+        )
+
+    def _make_paged(self, query_datum: QueryDatum, is_aio: bool, route: str|None = None) -> QueryFn:
+        """Build a ``<name>_pages`` method which iterates over pages of a select, with keyset pagination.
 
-    def _make_ctx_mgr(self, fn: QueryFn) -> QueryFn:
+        Each page is a list of rows which starts after the key of the last row
+        of the previous page, so that its cost does not depend on its position,
+        unlike with ``OFFSET``. With ``prefetch=True``, the next page is fetched
+        while the current one is processed.
+        """
+
+        query_name, doc_comments, operation, sql, record_class, signature, floc, attributes, params, *_ = (
+            query_datum
+        )
+
+        options = query_datum.options or {}
+        nkeys = len(pages_args(query_name, options["pages"])[0])
+        names = (f"{query_name}_pages[first]", f"{query_name}_pages[next]")
+        sqls = (options["pages_first"], options["pages_next"])
+
+        # key columns are removed before building records
+        if record_class is not None:
+
+            def convert(**row):
+                key = tuple(row.pop(f"{KEY}{i}") for i in range(nkeys))
+                return record_class(**row), key
+
+            def split(row):  # type: ignore
+                return row
+
+        else:
+            convert = None  # type: ignore
+
+            def split(row):
+                return split_row(row, nkeys)
+
+        def page_params(self, after, page_size, args, kwargs):
+            kwargs = dict(kwargs)
+            kwargs[LIMIT] = page_size
+            if after is not None:
+                kwargs.update((f"{KEY}{i}", value) for i, value in enumerate(after))
+            return self._params(attributes, params, args, kwargs)
+
+        def check(page_size):
+            if not isinstance(page_size, int) or page_size <= 0:
+                raise ValueError(f"page_size must be a positive integer for {query_name}_pages: {page_size}")
+
+        if is_aio:
+
+            async def afetch(self, conn, after, page_size, args, kwargs):  # pragma: no cover
+                part = 0 if after is None else 1
+                parameters = page_params(self, after, page_size, args, kwargs)
+                rows = [
+                    split(row) async for row in self.driver_adapter.select(
+                        conn, names[part], sqls[part], parameters, convert
+                    )
+                ]
+                return [row for row, _ in rows], rows[-1][1] if rows else None
+
+            async def pages(self, conn, *args, page_size=100, prefetch=False, **kwargs):  # type: ignore # pragma: no cover
+                check(page_size)
+                page, after = await afetch(self, conn, None, page_size, args, kwargs)
+                task = None
+                try:
+                    while page:
+                        if len(page) < page_size:
+                            yield page
+                            return
+                        if prefetch:
+                            task = asyncio.ensure_future(afetch(self, conn, after, page_size, args, kwargs))
+                        yield page
+                        if task is not None:
+                            page, after = await task
+                            task = None
+                        else:
+                            page, after = await afetch(self, conn, after, page_size, args, kwargs)
+                finally:
+                    if task is not None:
+                        task.cancel()
+
+        else:
+
+            def fetch(self, conn, after, page_size, args, kwargs):  # pragma: no cover
+                part = 0 if after is None else 1
+                parameters = page_params(self, after, page_size, args, kwargs)
+                rows = [
+                    split(row) for row in self.driver_adapter.select(
+                        conn, names[part], sqls[part], parameters, convert
+                    )
+                ]
+                return [row for row, _ in rows], rows[-1][1] if rows else None
+
+            # the connection must allow use from another thread when prefetching
+            def pages(  # type: ignore # pragma: no cover
+                self, conn, *args, page_size=100, prefetch=False, **kwargs
+            ):
+                check(page_size)
+                page, after = fetch(self, conn, None, page_size, args, kwargs)
+                executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+                future = None
+                try:
+                    while page:
+                        if len(page) < page_size:
+                            yield page
+                            return
+                        if executor is not None:
+                            future = executor.submit(fetch, self, conn, after, page_size, args, kwargs)
+                        yield page
+                        if future is not None:
+                            page, after = future.result()
+                            future = None
+                        else:
+                            page, after = fetch(self, conn, after, page_size, args, kwargs)
+                finally:
+                    if executor is not None:
+                        executor.shutdown(cancel_futures=True)
+
+        if signature is not None:
+            signature = signature.replace(parameters=[
+                *signature.parameters.values(),
+                inspect.Parameter("page_size", inspect.Parameter.KEYWORD_ONLY, default=100),
+                inspect.Parameter("prefetch", inspect.Parameter.KEYWORD_ONLY, default=False),
+            ])
+        paged_datum = query_datum._replace(query_name=f"{query_name}_pages", signature=signature)
+        fn = self._query_fn(
+            pages, f"{query_name}_pages", doc_comments, sql, operation, signature, floc, attributes, params
+        )
+        if is_aio:
+            return self._make_aprovided(fn, paged_datum, route)
+        return self._make_provided(fn, paged_datum, route)
+
+    def _make_exported(self, query_datum: QueryDatum, is_aio: bool, route: str|None = None) -> QueryFn:
+        """Build a ``<name>_to_file`` method which streams the result of a select to a file.
+
+        The driver native export is used when available, e.g. ``COPY … TO``,
+        otherwise rows are fetched and written by batches of ``batch_size``.
+        Calls return an ``ExportReport`` with the number of rows and elapsed time.
+        """
+
+        query_name, doc_comments, operation, sql, record_class, signature, floc, attributes, params, *_ = (
+            query_datum
+        )
+
+        options = query_datum.options or {}
+        default_format = export_args(query_name, options["export"])
+        name = f"{query_name}_to_file"
+        perf_counter = time.perf_counter
+
+        def check(dest, file_format, batch_size):
+            if not isinstance(batch_size, int) or batch_size <= 0:
+                raise ValueError(f"batch_size must be a positive integer for {name}: {batch_size}")
+            return export_format(query_name, dest, file_format or default_format)
+
+        def report(file_format, rows, start):
+            done = ExportReport(rows, perf_counter() - start)
+            log.info(f"exported query {query_name}: {rows} rows as {file_format} in {done.elapsed:.3f} s, "
+                     f"{done.throughput:.0f} rows/s")
+            return done
+
+        if is_aio:
+
+            async def to_file(  # type: ignore # pragma: no cover
+                self, conn, dest, *args, file_format=None, batch_size=BATCH_SIZE, **kwargs
+            ):
+                file_format = check(dest, file_format, batch_size)
+                parameters = self._params(attributes, params, args, kwargs)
+                start = perf_counter()
+                export = getattr(self.driver_adapter, "export", None)
+                rows = None
+                if export is not None:
+                    rows = await export(conn, query_name, sql, parameters, dest, file_format, batch_size)
+                if rows is None:
+                    async with self.driver_adapter.select_cursor(conn, query_name, sql, parameters) as cur:
+                        rows = await awrite_cursor(cur, dest, file_format, batch_size)
+                return report(file_format, rows, start)
+
+        else:
+
+            def to_file(  # type: ignore # pragma: no cover
+                self, conn, dest, *args, file_format=None, batch_size=BATCH_SIZE, **kwargs
+            ):
+                file_format = check(dest, file_format, batch_size)
+                parameters = self._params(attributes, params, args, kwargs)
+                start = perf_counter()
+                export = getattr(self.driver_adapter, "export", None)
+                rows = None
+                if export is not None:
+                    rows = export(conn, query_name, sql, parameters, dest, file_format, batch_size)
+                if rows is None:
+                    with self.driver_adapter.select_cursor(conn, query_name, sql, parameters) as cur:
+                        rows = write_cursor(cur, dest, file_format, batch_size)
+                return report(file_format, rows, start)
+
+        if signature is not None:
+            first, *others = signature.parameters.values()  # self
+            signature = signature.replace(parameters=[
+                first,
+                inspect.Parameter("dest", inspect.Parameter.POSITIONAL_OR_KEYWORD),
+                *others,
+                inspect.Parameter("file_format", inspect.Parameter.KEYWORD_ONLY, default=None),
+                inspect.Parameter("batch_size", inspect.Parameter.KEYWORD_ONLY, default=BATCH_SIZE),
+            ])
+        # a single call which borrows a connection, rather than an iteration
+        exported_datum = query_datum._replace(
+            query_name=name, signature=signature, operation_type=SQLOperationType.SELECT_VALUE
+        )
+        fn = self._query_fn(to_file, name, doc_comments, sql, operation, signature, floc, attributes, params)
+        if is_aio:
+            fn = self._make_aprovided(fn, exported_datum, route)
+        else:
+            fn = self._make_provided(fn, exported_datum, route)
+        fn.operation = operation
+        return fn
+
+    def _make_returning_many(self, query_datum: QueryDatum, is_aio: bool) -> QueryFn:
+        """Build a dynamic method for an insert of many rows which returns their values (``*<!`` suffix).
+
+        Rows are inserted with multi-row ``INSERT … VALUES (…), (…) RETURNING …``
+        statements of power-of-two sizes, which are processed on first use and
+        memoized, and returned values are collected in a list. Databases do not
+        guarantee that rows are returned in input order.
+        """
+
+        query_name, doc_comments, operation, sql, record_class, signature, floc, attributes, params, *_ = (
+            query_datum
+        )
+
+        start, end, names = values_row(query_name, sql)
+        driver_adapter = self.driver_adapter
+
+        @functools.lru_cache(maxsize=MAX_VARIANTS)
+        def variant(size):
+            vname = f"{query_name}[{size}]"
+            return vname, driver_adapter.process_sql(vname, operation, expand_values(sql, start, end, size))
+
+        def chunks(rows):
+            if not isinstance(rows, (list, tuple)):
+                rows = list(rows)
+            offset = 0
+            for size in row_chunks(len(rows), len(names)):
+                parameters = {}
+                for i, row in enumerate(rows[offset:offset + size]):
+                    values = row if isinstance(row, dict) else dict(zip(names, row))
+                    for name in names:
+                        parameters[list_names(name, size)[i]] = values[name]
+                offset += size
+                yield variant(size), parameters
+
+        # shaped as insert_returning results
+        def value(row):
+            return row[0] if row and len(row) == 1 else row
+
+        if is_aio:
+
+            async def fn(self, conn, rows):  # type: ignore # pragma: no cover
+                results = []
+                for (vname, vsql), parameters in chunks(rows):
+                    async for row in self.driver_adapter.select(conn, vname, vsql, parameters):
+                        results.append(value(row))
+                return results
+
+        else:
+
+            def fn(self, conn, rows):  # type: ignore # pragma: no cover
+                results = []
+                for (vname, vsql), parameters in chunks(rows):
+                    for row in self.driver_adapter.select(conn, vname, vsql, parameters):
+                        results.append(value(row))
+                return results
+
+        return self._query_fn(
+            fn, query_name, doc_comments, sql, operation, signature, floc, attributes, params
+        )
+
+    def _make_ctx_mgr(self, fn: QueryFn, route: str|None = None, variant: Any = None) -> QueryFn:
         """Wrap in a context manager function."""
 
-        def ctx_mgr(self, conn, *args, **kwargs):  # pragma: no cover
+        @contextmanager
+        def borrowed(self, provider, pool, args, kwargs):  # pragma: no cover
+            with provider(pool, SQLOperationType.SELECT, route) as conn:
+                with ctx_mgr(self, conn, *args, **kwargs) as cur:
+                    yield cur
+
+        @asynccontextmanager
+        async def aborrowed(self, provider, pool, args, kwargs):  # pragma: no cover
+            async with provider(pool, SQLOperationType.SELECT, route) as conn:
+                async with ctx_mgr(self, conn, *args, **kwargs) as cur:
+                    yield cur
+
+        # a context manager, asynchronous or not, and borrowing a connection or not
+        def ctx_mgr(self, conn, *args, **kwargs) -> Any:  # pragma: no cover
+            if self.is_aio:
+                try:
+                    provider = _APROVIDERS[type(conn)]
+                except KeyError:
+                    provider = _async_connection_provider(type(conn))
+                if provider is not None:
+                    return aborrowed(self, provider, conn, args, kwargs)
+            else:
+                try:
+                    provider = _PROVIDERS[type(conn)]
+                except KeyError:
+                    provider = _connection_provider(type(conn))
+                if provider is not None:
+                    return borrowed(self, provider, conn, args, kwargs)
+            if variant is None:
+                name, sql = fn.__name__, fn.sql
+            else:
+                vfn = variant(template_key(fn.__name__, variant.refs, kwargs, blocks=variant.blocks))
+                name, sql = vfn.__name__, vfn.sql
             return self.driver_adapter.select_cursor(
-                conn, fn.__name__, fn.sql, self._params(fn.attributes, fn.parameters, args, kwargs)
+                conn, name, sql, self._params(fn.attributes, fn.parameters, args, kwargs)
             )
 
         return self._query_fn(
             ctx_mgr, f"{fn.__name__}_cursor", fn.__doc__, fn.sql, fn.operation, fn.__signature__
         )
 
+    def _make_provided(self, fn: QueryFn, query_datum: QueryDatum, route: str|None = None) -> QueryFn:
+        """Wrap a synchronous query function so that it also accepts a connection pool or router.
+
+        A connection is borrowed for the duration of the call, or of the iteration
+        for a ``select``. Providers may return another provider, e.g. a router may
+        return a pool, hence the recursion.
+        """
+
+        query_name, doc_comments, operation, sql, record_class, signature, floc, attributes, params, *_ = (
+            query_datum
+        )
+
+        if operation == SQLOperationType.SELECT:
+
+            def borrowed(self, provider, pool, args, kwargs):  # pragma: no cover
+                with provider(pool, operation, route) as conn:
+                    yield from wfn(self, conn, *args, **kwargs)
+
+            def wfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                try:
+                    provider = _PROVIDERS[type(conn)]
+                except KeyError:
+                    provider = _connection_provider(type(conn))
+                if provider is None:
+                    return fn(self, conn, *args, **kwargs)
+                return borrowed(self, provider, conn, args, kwargs)
+
+        else:
+
+            def wfn(self, conn, *args, **kwargs):  # pragma: no cover
+                try:
+                    provider = _PROVIDERS[type(conn)]
+                except KeyError:
+                    provider = _connection_provider(type(conn))
+                if provider is None:
+                    return fn(self, conn, *args, **kwargs)
+                with provider(conn, operation, route) as pconn:
+                    return wfn(self, pconn, *args, **kwargs)
+
+        return self._query_fn(
+            wfn, query_name, doc_comments, sql, operation, signature, floc, attributes, params
+        )
+
+    def _make_aprovided(self, fn: QueryFn, query_datum: QueryDatum, route: str|None = None) -> QueryFn:
+        """Wrap an asynchronous query function so that it also accepts a connection pool or router.
+
+        A connection is borrowed for the duration of the call, or of the iteration
+        for a ``select``.
+        """
+
+        query_name, doc_comments, operation, sql, record_class, signature, floc, attributes, params, *_ = (
+            query_datum
+        )
+
+        if operation == SQLOperationType.SELECT:
+
+            async def borrowed(self, provider, pool, args, kwargs):  # pragma: no cover
+                async with provider(pool, operation, route) as conn:
+                    async for row in wfn(self, conn, *args, **kwargs):  # type: ignore
+                        yield row
+
+            # returns an async generator without an extra layer when not pooled
+            def wfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                try:
+                    provider = _APROVIDERS[type(conn)]
+                except KeyError:
+                    provider = _async_connection_provider(type(conn))
+                if provider is None:
+                    return fn(self, conn, *args, **kwargs)
+                return borrowed(self, provider, conn, args, kwargs)
+
+        else:
+
+            async def wfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                try:
+                    provider = _APROVIDERS[type(conn)]
+                except KeyError:
+                    provider = _async_connection_provider(type(conn))
+                if provider is None:
+                    return await fn(self, conn, *args, **kwargs)
+                async with provider(conn, operation, route) as pconn:
+                    return await wfn(self, pconn, *args, **kwargs)
+
+        return self._query_fn(
+            wfn, query_name, doc_comments, sql, operation, signature, floc, attributes, params
+        )
+
+    def _make_cached(self, fn: QueryFn, query_datum: QueryDatum, directive: str) -> QueryFn:
+        """Wrap a ``^`` or ``$`` query function with a result cache, see ``QueryCache``."""
+
+        query_name, doc_comments, operation, sql, record_class, signature, floc, attributes, params, *_ = (
+            query_datum
+        )
+
+        if operation not in (SQLOperationType.SELECT_ONE, SQLOperationType.SELECT_VALUE):
+            raise SQLParseException(f"@cache requires a ^ or $ query: {query_name}")
+        args = directive_args(query_name, "cache", directive, ("ttl", "max", "tables"))
+        try:
+            ttl = float(args["ttl"]) if "ttl" in args else None
+            max_size = int(args.get("max", 128))
+        except ValueError as e:
+            raise SQLParseException(f"invalid @cache argument in query {query_name}: {e}")
+        tables = args["tables"].lower().split(",") if "tables" in args else read_tables(sql)
+        if not tables:
+            log.warning(f"cached query {query_name} does not seem to read any table")
+        assert self.query_cache is not None  # help type checker
+        cache = self.query_cache
+        cache.register(query_name, ttl, max_size, tables)
+
+        if self.is_aio:
+
+            async def cfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                key = _cache_key(attributes, args, kwargs)
+                if key is None or _PIPELINE.get() is not None:
+                    return await fn(self, conn, *args, **kwargs)
+                value, generation = cache.lookup(query_name, key)
+                if value is MISS:
+                    value = await fn(self, conn, *args, **kwargs)
+                    cache.store(query_name, key, value, generation)
+                return value
+
+        else:
+
+            def cfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                key = _cache_key(attributes, args, kwargs)
+                if key is None or _PIPELINE.get() is not None:
+                    return fn(self, conn, *args, **kwargs)
+                value, generation = cache.lookup(query_name, key)
+                if value is MISS:
+                    value = fn(self, conn, *args, **kwargs)
+                    cache.store(query_name, key, value, generation)
+                return value
+
+        return self._query_fn(
+            cfn, query_name, doc_comments, sql, operation, signature, floc, attributes, params
+        )
+
+    def _make_coalesced(self, fn: QueryFn, query_datum: QueryDatum) -> QueryFn:
+        """Wrap a ``^`` or ``$`` query function so that identical concurrent calls are coalesced."""
+
+        query_name, doc_comments, operation, sql, record_class, signature, floc, attributes, params, *_ = (
+            query_datum
+        )
+
+        assert self.single_flight is not None  # help type checker
+        flight = self.single_flight
+
+        if self.is_aio:
+
+            async def sfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                key = _cache_key(attributes, args, kwargs)
+                if key is None or _PIPELINE.get() is not None:
+                    return await fn(self, conn, *args, **kwargs)
+                return await flight.acall(query_name, key, fn, self, conn, *args, **kwargs)
+
+        else:
+
+            def sfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                key = _cache_key(attributes, args, kwargs)
+                if key is None or _PIPELINE.get() is not None:
+                    return fn(self, conn, *args, **kwargs)
+                return flight.call(query_name, key, fn, self, conn, *args, **kwargs)
+
+        return self._query_fn(
+            sfn, query_name, doc_comments, sql, operation, signature, floc, attributes, params
+        )
+
+    def _make_invalidating(self, fn: QueryFn, query_datum: QueryDatum) -> QueryFn:
+        """Wrap a write query function so that it invalidates cached results of related queries."""
+
+        query_name, doc_comments, operation, sql, record_class, signature, floc, attributes, params, *_ = (
+            query_datum
+        )
+
+        # None means all cached queries, when tables are unknown
+        tables = write_tables(sql) if operation != SQLOperationType.SCRIPT else set()
+        invalidated = tables or None
+        assert self.query_cache is not None  # help type checker
+        cache = self.query_cache
+
+        if self.is_aio:
+
+            async def ifn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                try:
+                    return await fn(self, conn, *args, **kwargs)
+                finally:
+                    cache.invalidate(invalidated)
+
+        else:
+
+            def ifn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                try:
+                    return fn(self, conn, *args, **kwargs)
+                finally:
+                    cache.invalidate(invalidated)
+
+        return self._query_fn(
+            ifn, query_name, doc_comments, sql, operation, signature, floc, attributes, params
+        )
+
+    def _make_batched(self, fn: QueryFn, query_datum: QueryDatum, directive: str) -> QueryFn:
+        """Wrap an asynchronous ``^`` query function so that concurrent calls are batched."""
+
+        query_name, doc_comments, operation, sql, record_class, signature, floc, attributes, params, *_ = (
+            query_datum
+        )
+
+        if operation != SQLOperationType.SELECT_ONE:
+            raise SQLParseException(f"@batch requires a ^ query: {query_name}")
+        args = directive_args(query_name, "batch", directive, ("key", "query", "param", "column"))
+        if "key" not in args or "query" not in args:
+            raise SQLParseException(f"@batch requires key and query arguments: {query_name}")
+        if not self.is_aio:
+            log.debug(f"ignoring @batch directive with a synchronous driver: {query_name}")
+            return fn
+        key = args["key"]
+        loader = BatchLoader(
+            query_name,
+            key,
+            args["query"].replace("-", "_"),
+            args.get("param", key + "s"),
+            args.get("column", key),
+        )
+        self.batch_loaders[query_name] = loader
+
+        async def bfn(self, conn, *args, **kwargs):  # pragma: no cover
+            value = kwargs.get(key)
+            if args or key not in kwargs or _PIPELINE.get() is not None:
+                return await fn(self, conn, *args, **kwargs)
+            others = {k: v for k, v in kwargs.items() if k != key}
+            try:
+                hash((conn, value, tuple(others.items())))
+            except TypeError:
+                return await fn(self, conn, *args, **kwargs)
+            return await loader.load(self, conn, value, others)
+
+        return self._query_fn(
+            bfn, query_name, doc_comments, sql, operation, signature, floc, attributes, params
+        )
+
+    def _make_measured(self, fn: QueryFn, query_datum: QueryDatum) -> QueryFn:
+        """Wrap a query function so that its calls are recorded, see ``QueryMetrics``."""
+
+        query_name, doc_comments, operation, sql, record_class, signature, floc, attributes, params, *_ = (
+            query_datum
+        )
+
+        assert self.metrics is not None  # help type checker
+        metrics = self.metrics
+        perf_counter = time.perf_counter
+        # whether the result is one row or None
+        one = operation in (
+            SQLOperationType.SELECT_ONE, SQLOperationType.SELECT_VALUE, SQLOperationType.INSERT_RETURNING
+        )
+        many = operation == SQLOperationType.INSERT_RETURNING_MANY
+
+        if operation == SQLOperationType.SELECT and self.is_aio:
+
+            async def measured(self, conn, args, kwargs):  # type: ignore # pragma: no cover
+                start, rows, first, error = perf_counter(), 0, None, False
+                try:
+                    async for row in fn(self, conn, *args, **kwargs):
+                        if first is None:
+                            first = perf_counter() - start
+                        rows += 1
+                        yield row
+                except Exception:
+                    error = True
+                    raise
+                finally:
+                    metrics.observe(query_name, perf_counter() - start, rows, error, first)
+
+            def mfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                return measured(self, conn, args, kwargs)
+
+        elif operation == SQLOperationType.SELECT:
+
+            def measured(self, conn, args, kwargs):  # type: ignore # pragma: no cover
+                start, rows, first, error = perf_counter(), 0, None, False
+                try:
+                    for row in fn(self, conn, *args, **kwargs):
+                        if first is None:
+                            first = perf_counter() - start
+                        rows += 1
+                        yield row
+                except Exception:
+                    error = True
+                    raise
+                finally:
+                    metrics.observe(query_name, perf_counter() - start, rows, error, first)
+
+            def mfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                return measured(self, conn, args, kwargs)
+
+        elif self.is_aio:
+
+            async def mfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                start = perf_counter()
+                try:
+                    result = await fn(self, conn, *args, **kwargs)
+                except Exception:
+                    metrics.observe(query_name, perf_counter() - start, 0, True)
+                    raise
+                rows = len(result) if many else int(one and result is not None)
+                metrics.observe(query_name, perf_counter() - start, rows, False)
+                return result
+
+        else:
+
+            def mfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                start = perf_counter()
+                try:
+                    result = fn(self, conn, *args, **kwargs)
+                except Exception:
+                    metrics.observe(query_name, perf_counter() - start, 0, True)
+                    raise
+                rows = len(result) if many else int(one and result is not None)
+                metrics.observe(query_name, perf_counter() - start, rows, False)
+                return result
+
+        return self._query_fn(
+            mfn, query_name, doc_comments, sql, operation, signature, floc, attributes, params
+        )
+
+    def _make_traced(self, fn: QueryFn, query_datum: QueryDatum) -> QueryFn:
+        """Wrap a query function so that registered hooks are called around it, see ``QueryHook``."""
+
+        query_name, doc_comments, operation, sql, record_class, signature, floc, attributes, params, *_ = (
+            query_datum
+        )
+
+        assert self.hooks is not None  # help type checker
+        hooks = self.hooks
+
+        def started(args, kwargs):  # pragma: no cover
+            event = QueryEvent(query_name, operation, sql, floc[0], floc[1], len(args) + len(kwargs))
+            # hooks registered during the call are ignored
+            return event, [(hook, hook.start(event)) for hook in list(hooks)]
+
+        def failed(event, contexts, exc):  # pragma: no cover
+            for hook, context in contexts:
+                hook.error(event, context, exc)
+
+        def ended(event, contexts):  # pragma: no cover
+            for hook, context in reversed(contexts):
+                hook.end(event, context)
+
+        if operation == SQLOperationType.SELECT and self.is_aio:
+
+            async def traced(self, conn, args, kwargs):  # type: ignore # pragma: no cover
+                event, contexts = started(args, kwargs)
+                first = True
+                try:
+                    async for row in fn(self, conn, *args, **kwargs):
+                        if first:
+                            first = False
+                            for hook, context in contexts:
+                                hook.first_row(event, context)
+                        yield row
+                except Exception as e:
+                    failed(event, contexts, e)
+                    raise
+                finally:
+                    ended(event, contexts)
+
+            def tfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                if not hooks:
+                    return fn(self, conn, *args, **kwargs)
+                return traced(self, conn, args, kwargs)
+
+        elif operation == SQLOperationType.SELECT:
+
+            def traced(self, conn, args, kwargs):  # type: ignore # pragma: no cover
+                event, contexts = started(args, kwargs)
+                first = True
+                try:
+                    for row in fn(self, conn, *args, **kwargs):
+                        if first:
+                            first = False
+                            for hook, context in contexts:
+                                hook.first_row(event, context)
+                        yield row
+                except Exception as e:
+                    failed(event, contexts, e)
+                    raise
+                finally:
+                    ended(event, contexts)
+
+            def tfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                if not hooks:
+                    return fn(self, conn, *args, **kwargs)
+                return traced(self, conn, args, kwargs)
+
+        elif self.is_aio:
+
+            async def tfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                if not hooks:
+                    return await fn(self, conn, *args, **kwargs)
+                event, contexts = started(args, kwargs)
+                try:
+                    return await fn(self, conn, *args, **kwargs)
+                except Exception as e:
+                    failed(event, contexts, e)
+                    raise
+                finally:
+                    ended(event, contexts)
+
+        else:
+
+            def tfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                if not hooks:
+                    return fn(self, conn, *args, **kwargs)
+                event, contexts = started(args, kwargs)
+                try:
+                    return fn(self, conn, *args, **kwargs)
+                except Exception as e:
+                    failed(event, contexts, e)
+                    raise
+                finally:
+                    ended(event, contexts)
+
+        return self._query_fn(
+            tfn, query_name, doc_comments, sql, operation, signature, floc, attributes, params
+        )
+
+    def _make_logged(self, fn: QueryFn, query_datum: QueryDatum, directive: str|None) -> QueryFn:
+        """Wrap a query function so that slow calls are logged, see ``SlowQueryLog``."""
+
+        query_name, doc_comments, operation, sql, record_class, signature, floc, attributes, params, *_ = (
+            query_datum
+        )
+
+        assert self.slow_log is not None  # help type checker
+        slow_log = self.slow_log
+        args = directive_args(query_name, "slow", directive or "", ("threshold", "explain"))
+        try:
+            threshold = float(args["threshold"]) if "threshold" in args else slow_log.threshold
+        except ValueError as e:
+            raise SQLParseException(f"invalid @slow argument in query {query_name}: {e}")
+        if args.get("explain", "yes") not in ("yes", "no"):
+            raise SQLParseException(
+                f"invalid @slow argument in query {query_name}: explain={args['explain']}"
+            )
+        if threshold is None:
+            return fn
+        # several statements, parameter sets or templates cannot be explained
+        explain = args["explain"] == "yes" if "explain" in args else slow_log.explain
+        explain = explain and operation not in (
+            SQLOperationType.INSERT_UPDATE_DELETE_MANY,
+            SQLOperationType.INSERT_RETURNING_MANY,
+            SQLOperationType.SCRIPT,
+        ) and not is_templated(query_name, sql)
+        explain_sql = getattr(self.driver_adapter, "explain", "EXPLAIN") + " " + sql
+        perf_counter = time.perf_counter
+
+        def plan(self, conn, args, kwargs):  # pragma: no cover
+            try:
+                parameters = self._params(attributes, params, args, kwargs)
+                rows = self.driver_adapter.select(conn, query_name, explain_sql, parameters)
+                return [tuple(row) for row in rows]
+            except Exception as e:
+                log.info(f"cannot explain slow query {query_name}: {e}")
+                return None
+
+        async def aplan(self, conn, args, kwargs):  # pragma: no cover
+            try:
+                parameters = self._params(attributes, params, args, kwargs)
+                rows = self.driver_adapter.select(conn, query_name, explain_sql, parameters)
+                return [tuple(row) async for row in rows]
+            except Exception as e:
+                log.info(f"cannot explain slow query {query_name}: {e}")
+                return None
+
+        def record(self, conn, args, kwargs, duration, failed):  # pragma: no cover
+            explained = None
+            if explain and not failed and slow_log.want_plan(query_name):
+                explained = plan(self, conn, args, kwargs)
+            slow_log.record(query_name, floc, duration, args, kwargs, explained)
+
+        async def arecord(self, conn, args, kwargs, duration, failed):  # pragma: no cover
+            explained = None
+            if explain and not failed and slow_log.want_plan(query_name):
+                explained = await aplan(self, conn, args, kwargs)
+            slow_log.record(query_name, floc, duration, args, kwargs, explained)
+
+        # only the time spent in the query is counted, not in the caller between rows,
+        # and failed calls are logged as well, without a plan
+        if operation == SQLOperationType.SELECT and self.is_aio:
+
+            async def logged(self, conn, args, kwargs):  # type: ignore # pragma: no cover
+                rows, duration, failed = fn(self, conn, *args, **kwargs), 0.0, False
+                try:
+                    while True:
+                        start = perf_counter()
+                        try:
+                            row = await rows.__anext__()
+                        except StopAsyncIteration:
+                            break
+                        finally:
+                            duration += perf_counter() - start
+                        yield row
+                except Exception:
+                    failed = True
+                    raise
+                finally:
+                    # early exit
+                    start = perf_counter()
+                    await rows.aclose()
+                    duration += perf_counter() - start
+                    if duration >= threshold:
+                        await arecord(self, conn, args, kwargs, duration, failed)
+
+            def lfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                return logged(self, conn, args, kwargs)
+
+        elif operation == SQLOperationType.SELECT:
+
+            def logged(self, conn, args, kwargs):  # type: ignore # pragma: no cover
+                rows, duration, failed = iter(fn(self, conn, *args, **kwargs)), 0.0, False
+                try:
+                    while True:
+                        start = perf_counter()
+                        try:
+                            row = next(rows)
+                        except StopIteration:
+                            break
+                        finally:
+                            duration += perf_counter() - start
+                        yield row
+                except Exception:
+                    failed = True
+                    raise
+                finally:
+                    # early exit
+                    if hasattr(rows, "close"):
+                        start = perf_counter()
+                        rows.close()
+                        duration += perf_counter() - start
+                    if duration >= threshold:
+                        record(self, conn, args, kwargs, duration, failed)
+
+            def lfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                return logged(self, conn, args, kwargs)
+
+        elif self.is_aio:
+
+            async def lfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                start, failed = perf_counter(), False
+                try:
+                    return await fn(self, conn, *args, **kwargs)
+                except Exception:
+                    failed = True
+                    raise
+                finally:
+                    duration = perf_counter() - start
+                    if duration >= threshold:
+                        await arecord(self, conn, args, kwargs, duration, failed)
+
+        else:
+
+            def lfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                start, failed = perf_counter(), False
+                try:
+                    return fn(self, conn, *args, **kwargs)
+                except Exception:
+                    failed = True
+                    raise
+                finally:
+                    duration = perf_counter() - start
+                    if duration >= threshold:
+                        record(self, conn, args, kwargs, duration, failed)
+
+        return self._query_fn(
+            lfn, query_name, doc_comments, sql, operation, signature, floc, attributes, params
+        )
+
+    def _make_profiled(self, fn: QueryFn, query_datum: QueryDatum) -> QueryFn:
+        """Wrap a query function so that time spent per phase is recorded, see ``QueryProfiler``.
+
+        Only time spent within the function is counted, not time spent by the caller
+        between rows of a ``select``.
+        """
+
+        query_name, doc_comments, operation, sql, record_class, signature, floc, attributes, params, *_ = (
+            query_datum
+        )
+
+        assert self.profiler is not None  # help type checker
+        profiler = self.profiler
+        perf_counter = time.perf_counter
+
+        if operation == SQLOperationType.SELECT and self.is_aio:
+
+            async def profiled(self, conn, args, kwargs):  # type: ignore # pragma: no cover
+                phases, total = profiler.start(), 0.0
+                rows = fn(self, conn, *args, **kwargs)
+                try:
+                    while True:
+                        token, start = _CURRENT.set(phases), perf_counter()
+                        try:
+                            row = await rows.__anext__()
+                        except StopAsyncIteration:
+                            break
+                        finally:
+                            total += perf_counter() - start
+                            _CURRENT.reset(token)
+                        yield row
+                finally:
+                    # early exit
+                    token, start = _CURRENT.set(phases), perf_counter()
+                    await rows.aclose()
+                    total += perf_counter() - start
+                    _CURRENT.reset(token)
+                    profiler.finish(query_name, total, phases)
+
+            def pfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                return profiled(self, conn, args, kwargs)
+
+        elif operation == SQLOperationType.SELECT:
+
+            def profiled(self, conn, args, kwargs):  # type: ignore # pragma: no cover
+                phases, total = profiler.start(), 0.0
+                token, start = _CURRENT.set(phases), perf_counter()
+                try:
+                    rows = iter(fn(self, ProfiledConnection(conn), *args, **kwargs))
+                finally:
+                    total += perf_counter() - start
+                    _CURRENT.reset(token)
+                try:
+                    while True:
+                        token, start = _CURRENT.set(phases), perf_counter()
+                        try:
+                            row = next(rows)
+                        except StopIteration:
+                            break
+                        finally:
+                            total += perf_counter() - start
+                            _CURRENT.reset(token)
+                        yield row
+                finally:
+                    # early exit
+                    if hasattr(rows, "close"):
+                        token, start = _CURRENT.set(phases), perf_counter()
+                        rows.close()
+                        total += perf_counter() - start
+                        _CURRENT.reset(token)
+                    profiler.finish(query_name, total, phases)
+
+            def pfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                return profiled(self, conn, args, kwargs)
+
+        elif self.is_aio:
+
+            async def pfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                phases = profiler.start()
+                token, start = _CURRENT.set(phases), perf_counter()
+                try:
+                    return await fn(self, conn, *args, **kwargs)
+                finally:
+                    profiler.finish(query_name, perf_counter() - start, phases)
+                    _CURRENT.reset(token)
+
+        else:
+
+            def pfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                phases = profiler.start()
+                token, start = _CURRENT.set(phases), perf_counter()
+                try:
+                    return fn(self, ProfiledConnection(conn), *args, **kwargs)
+                finally:
+                    profiler.finish(query_name, perf_counter() - start, phases)
+                    _CURRENT.reset(token)
+
+        return self._query_fn(
+            pfn, query_name, doc_comments, sql, operation, signature, floc, attributes, params
+        )
+
+    def _make_chunked(self, fn: QueryFn, query_datum: QueryDatum, directive: str) -> QueryFn:
+        """Wrap a ``!`` query function so that it is repeated until no rows are affected.
+
+        The chunk size is passed as a parameter of the query, which must limit the rows
+        it modifies. Each chunk is committed, and runs are throttled by sleeping between
+        chunks or by scaling the chunk size towards a target duration per chunk.
+        Calls return a ``ChunkReport`` with total rows, chunks and elapsed time.
+        """
+
+        query_name, doc_comments, operation, sql, record_class, signature, floc, attributes, params, *_ = (
+            query_datum
+        )
+
+        if operation != SQLOperationType.INSERT_UPDATE_DELETE:
+            raise SQLParseException(f"@chunked requires a ! query: {query_name}")
+        param, size, sleep, target = chunked_args(query_name, directive)
+        if signature is not None and param not in signature.parameters:
+            raise SQLParseException(f"missing @chunked parameter in query {query_name}: {param}")
+        perf_counter = time.perf_counter
+
+        def report(rows, chunks, start):
+            done = ChunkReport(rows, chunks, perf_counter() - start)
+            log.info(f"chunked query {query_name}: {rows} rows in {chunks} chunks, "
+                     f"{done.throughput:.0f} rows/s")
+            return done
+
+        if self.is_aio:
+
+            async def cfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                chunk = kwargs.pop(param, size)
+                rows, chunks, start = 0, 0, perf_counter()
+                while True:
+                    begin = perf_counter()
+                    result = await fn(self, conn, *args, **kwargs, **{param: chunk})
+                    # eg apsw through a threaded connection, which is thread safe
+                    changes = getattr(getattr(conn, "connection", None), "changes", None)
+                    count = row_count(query_name, result, changes)
+                    commit = getattr(conn, "commit", None)  # not with asyncpg
+                    if commit is not None and inspect.isawaitable(done := commit()):
+                        await done
+                    rows, chunks = rows + count, chunks + 1
+                    if count == 0:
+                        return report(rows, chunks, start)
+                    chunk = next_size(chunk, perf_counter() - begin, target)
+                    if sleep:
+                        await asyncio.sleep(sleep)
+
+        else:
+
+            def cfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                chunk = kwargs.pop(param, size)
+                rows, chunks, start = 0, 0, perf_counter()
+                while True:
+                    begin = perf_counter()
+                    result = fn(self, conn, *args, **kwargs, **{param: chunk})
+                    count = row_count(query_name, result, getattr(conn, "changes", None))
+                    commit = getattr(conn, "commit", None)  # not with apsw in autocommit mode
+                    if commit is not None:
+                        commit()
+                    rows, chunks = rows + count, chunks + 1
+                    if count == 0:
+                        return report(rows, chunks, start)
+                    chunk = next_size(chunk, perf_counter() - begin, target)
+                    if sleep:
+                        time.sleep(sleep)
+
+        return self._query_fn(
+            cfn, query_name, doc_comments, sql, operation, signature, floc, attributes, params
+        )
+
+    def _make_pipelined(self, fn: QueryFn, query_datum: QueryDatum) -> QueryFn:
+        """Wrap a query function so that it is queued when its connection is in a pipeline."""
+
+        query_name, doc_comments, operation, sql, record_class, signature, floc, attributes, params, *_ = (
+            query_datum
+        )
+
+        def parameters(self, args, kwargs):
+            if operation == SQLOperationType.INSERT_UPDATE_DELETE_MANY:
+                assert not kwargs and len(args) == 1, "many query expects one sequence of parameters"
+                return args[0]
+            elif operation == SQLOperationType.SCRIPT:
+                assert not args and not kwargs, f"cannot use parameters in SQL script: {query_name}"
+                return None
+            else:
+                return self._params(attributes, params, args, kwargs)
+
+        if self.is_aio:
+
+            async def pfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                pipe = _PIPELINE.get()
+                if pipe is None or pipe.conn is not conn:
+                    return await fn(self, conn, *args, **kwargs)
+                return await pipe.defer(operation, sql, parameters(self, args, kwargs), record_class)
+
+        else:
+
+            def pfn(self, conn, *args, **kwargs):  # type: ignore # pragma: no cover
+                pipe = _PIPELINE.get()
+                if pipe is None or pipe.conn is not conn:
+                    return fn(self, conn, *args, **kwargs)
+                return pipe.defer(operation, sql, parameters(self, args, kwargs), record_class)
+
+        return self._query_fn(
+            pfn, query_name, doc_comments, sql, operation, signature, floc, attributes, params
+        )
+
     def _create_methods(self, query_datum: QueryDatum, is_aio: bool) -> list[QueryFn]:
         """Internal function to feed add_queries."""
 
-        fn = self._make_async_fn(query_datum) if is_aio else self._make_sync_fn(query_datum)
+        # time record class construction
+        if self.profiler is not None and query_datum.record_class is not None:
+            query_datum = query_datum._replace(record_class=_timed("convert", query_datum.record_class))
+
+        options = query_datum.options or {}
+        route = options.get("route")
+        if route is not None and route not in ROUTES:
+            raise SQLParseException(f"unexpected route for query {query_datum.query_name}: {route}")
+        if route == "replica" and query_datum.operation_type not in _READ_OPS:
+            raise SQLLoadException(f"cannot route a write query to a replica: {query_datum.query_name}")
+
+        templated = is_templated(query_datum.query_name, query_datum.sql)
+        base = None
+        if templated:
+            fn = self._make_templated(query_datum, is_aio)
+        elif query_datum.operation_type == SQLOperationType.INSERT_RETURNING_MANY:
+            fn = self._make_returning_many(query_datum, is_aio)
+        else:
+            fn = base = self._make_async_fn(query_datum, route) if is_aio else self._make_sync_fn(query_datum, route)
+
+        # phase profiling, on actual connections
+        if self.profiler is not None:
+            fn = self._make_profiled(fn, query_datum)
+
+        # pipeline mode, where results are deferred
+        if (hasattr(self.driver_adapter, "pipeline") and not templated and "chunked" not in options
+                and query_datum.operation_type not in (
+                    SQLOperationType.SELECT, SQLOperationType.INSERT_RETURNING_MANY)):
+            fn = self._make_pipelined(fn, query_datum)
+
+        # slow query log, on actual connections so that plans can be captured
+        if self.slow_log is not None:
+            fn = self._make_logged(fn, query_datum, options.get("slow"))
+
+        # repeated chunks of a large modification, on one connection
+        if "chunked" in options:
+            fn = self._make_chunked(fn, query_datum, options["chunked"])
+
+        # connection pools and routers, already handled by plain query functions
+        if fn is not base:
+            if is_aio:
+                fn = self._make_aprovided(fn, query_datum, route)
+            else:
+                fn = self._make_provided(fn, query_datum, route)
+
+        # batching of concurrent reads into one set-based query
+        if "batch" in options:
+            fn = self._make_batched(fn, query_datum, options["batch"])
+
+        # coalescing of identical concurrent reads
+        if self.single_flight is not None and query_datum.operation_type in (
+                SQLOperationType.SELECT_ONE, SQLOperationType.SELECT_VALUE):
+            fn = self._make_coalesced(fn, query_datum)
+
+        # result cache, skipping connection acquisition on hits
+        if "cache" in options:
+            fn = self._make_cached(fn, query_datum, options["cache"])
+        elif self.query_cache is not None and query_datum.operation_type in _WRITE_OPS:
+            fn = self._make_invalidating(fn, query_datum)
+
+        # instrumentation, only when enabled
+        if self.hooks is not None:
+            fn = self._make_traced(fn, query_datum)
+        if self.metrics is not None:
+            fn = self._make_measured(fn, query_datum)
 
         # context manager
         if query_datum.operation_type == SQLOperationType.SELECT:
-            ctx_mgr = self._make_ctx_mgr(fn)
-            return [fn, ctx_mgr]
+            variant = self.variants.get(query_datum.query_name.rpartition(".")[2]) if templated else None
+            ctx_mgr = self._make_ctx_mgr(fn, route, variant)
+            fns = [fn, ctx_mgr]
+            if "pages" in options:
+                fns.append(self._make_paged(query_datum, is_aio, route))
+            if "export" in options:
+                fns.append(self._make_exported(query_datum, is_aio, route))
+            return fns
         else:
             return [fn]
 
@@ -292,6 +1689,43 @@ class Queries:
     def __repr__(self) -> str:
         return "Queries(" + self.available_queries.__repr__() + ")"
 
+    def pipeline(self, conn):
+        """Context manager to run queries on a connection in pipeline mode.
+
+        Within the context, query functions called on ``conn`` are sent without
+        waiting for their results, which are returned as deferred values.
+        Use ``result()`` (or ``await``, for asynchronous drivers) to get the
+        value, which is also fetched when leaving the context.
+        ``select`` queries are not deferred.
+
+        This requires driver support, i.e. ``psycopg`` or ``apsycopg``.
+
+        **Parameters:**
+
+        - **conn** - The connection to put in pipeline mode.
+        """
+        if not hasattr(self.driver_adapter, "pipeline"):
+            raise ValueError(f"pipeline mode is not supported by {type(self.driver_adapter).__name__}")
+        return self._apipeline(conn) if self.is_aio else self._pipeline(conn)
+
+    @contextmanager
+    def _pipeline(self, conn):
+        with self.driver_adapter.pipeline(conn) as pipe:  # type: ignore
+            token = _PIPELINE.set(pipe)
+            try:
+                yield pipe
+            finally:
+                _PIPELINE.reset(token)
+
+    @asynccontextmanager
+    async def _apipeline(self, conn):
+        async with self.driver_adapter.pipeline(conn) as pipe:  # type: ignore
+            token = _PIPELINE.set(pipe)
+            try:
+                yield pipe
+            finally:
+                _PIPELINE.reset(token)
+
     def add_query(self, query_name: str, fn: Callable) -> None:
         """Adds a new dynamic method to this class.
 
@@ -327,17 +1761,43 @@ class Queries:
         for child_query_name in child_queries.available_queries:
             self._available_queries.add(f"{child_name}.{child_query_name}")
 
+    def _prepare(self, query_data: list[QueryDatum]|QueryDataTree) -> None:
+        """Set up shared features required by query directives."""
+        if self.query_cache is None and _has_option(query_data, "cache"):
+            self.query_cache = QueryCache()
+        if self.slow_log is None and _has_option(query_data, "slow"):
+            self.slow_log = SlowQueryLog()
+
+    def _set_profiler(self, profiler: QueryProfiler) -> None:
+        """Enable profiling, timing parameter preparation of this instance."""
+        self.profiler = profiler
+        self._params = _timed("params", self._params)  # type: ignore
+
+    def _make_child(self) -> "Queries":
+        """Create child queries which share features with their parent."""
+        child = Queries(self.driver_adapter, self._kwargs_only)
+        child.query_cache = self.query_cache
+        child.single_flight = self.single_flight
+        child.metrics = self.metrics
+        child.hooks = self.hooks
+        child.slow_log = self.slow_log
+        if self.profiler is not None:
+            child._set_profiler(self.profiler)
+        return child
+
     def load_from_list(self, query_data: list[QueryDatum]):
         """Load Queries from a list of `QueryDatum`"""
+        self._prepare(query_data)
         for query_datum in query_data:
             self.add_queries(self._create_methods(query_datum, self.is_aio))
         return self
 
     def load_from_tree(self, query_data_tree: QueryDataTree):
         """Load Queries from a `QueryDataTree`"""
+        self._prepare(query_data_tree)
         for key, value in query_data_tree.items():
             if isinstance(value, dict):
-                self.add_child_queries(key, Queries(self.driver_adapter, self._kwargs_only).load_from_tree(value))
+                self.add_child_queries(key, self._make_child().load_from_tree(value))
             else:
                 self.add_queries(self._create_methods(value, self.is_aio))
         return self
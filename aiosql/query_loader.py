@@ -5,6 +5,10 @@ from typing import Type, Sequence, Any
 
 from .utils import SQLParseException, SQLLoadException, VAR_REF, VAR_REF_DOT, log
 from .types import QueryDatum, QueryDataTree, SQLOperationType, DriverAdapterProtocol
+from .limits import with_row_limit
+from .pages import page_sql, pages_args
+from .export import export_args
+from .variants import bind_arrays, in_lists, optional_blocks, template_refs, unmark_templates, values_row
 
 # identifies name definition comments
 _QUERY_DEF = re.compile(r"--\s*name\s*:\s*")
@@ -20,7 +24,7 @@ _NAME_OP = re.compile(
     # optional list of parameters (foo, bla) or ()
     r"(|\((?P<params>(\s*|\s*\w+\s*(,\s*\w+\s*)*))\))"
     # operation, empty for simple select
-    r"(?P<op>(|\^|\$|!|<!|\*!|#))$"
+    r"(?P<op>(|\^|\$|!|<!|\*!|\*<!|#))$"
 )
 
 # forbid numbers as first character
@@ -29,10 +33,17 @@ _BAD_PREFIX = re.compile(r"^\d")
 # get SQL comment contents
 _SQL_COMMENT = re.compile(r"\s*--\s*(.*)$")
 
+# query directives in comments, eg "-- @route primary"
+_DIRECTIVE = re.compile(r"^@(?P<name>\w+)(\s+(?P<value>.*?))?\s*$")
+
+# known directive names, other comments are kept in the documentation
+_DIRECTIVES = {"route", "cache", "batch", "slow", "temp", "pages", "chunked", "export"}
+
 # map operation suffixes to their type
 _OP_TYPES = {
     "<!": SQLOperationType.INSERT_RETURNING,
     "*!": SQLOperationType.INSERT_UPDATE_DELETE_MANY,
+    "*<!": SQLOperationType.INSERT_RETURNING_MANY,
     "!": SQLOperationType.INSERT_UPDATE_DELETE,
     "#": SQLOperationType.SCRIPT,
     "^": SQLOperationType.SELECT_ONE,
@@ -40,6 +51,13 @@ _OP_TYPES = {
     "": SQLOperationType.SELECT,
 }
 
+# operations without named parameters, where lists cannot be expanded
+_NO_LISTS = (
+    SQLOperationType.INSERT_UPDATE_DELETE_MANY,
+    SQLOperationType.INSERT_RETURNING_MANY,
+    SQLOperationType.SCRIPT,
+)
+
 # extracting comments requires some kind of scanner
 _UNCOMMENT = re.compile(
     # single quote strings
@@ -106,6 +124,7 @@ class QueryLoader:
     - :param driver_adapter: driver name or class.
     - :param record_classes: nothing of dict.
     - :param attribute: string to insert in place of ``.``.
+    - :param limit_one: whether to add a row limit to ``^`` and ``$`` selects without one.
     """
 
     def __init__(
@@ -113,10 +132,12 @@ class QueryLoader:
         driver_adapter: DriverAdapterProtocol,
         record_classes: dict[str, Any]|None,
         attribute: str|None = None,
+        limit_one: bool = False,
     ):
         self.driver_adapter = driver_adapter
         self.record_classes = record_classes if record_classes is not None else {}
         self.attribute = attribute
+        self.limit_one = limit_one
 
     def _make_query_datum(
         self,
@@ -137,17 +158,72 @@ class QueryLoader:
         if len(lines) <= 1:
             raise SQLParseException(f"empty query for: {qname} at {floc[0]}:{floc[1]}")
         record_class = self._get_record_class(lines[1])
-        sql, doc = self._get_sql_doc(lines[2 if record_class else 1 :])
+        sql, doc, options = self._get_sql_doc(lines[2 if record_class else 1 :])
         if re.search("(?s)^[\t\n\r ;]*$", sql):
             raise SQLParseException(f"empty sql for: {qname} at {floc[0]}:{floc[1]}")
-        signature = self._build_signature(sql, qname, qsig)
         query_fqn = ".".join(ns_parts + [qname])
+        templates = template_refs(query_fqn, sql)
+        lists = {name for name, kind in templates.items() if kind == "v*"}
+        if lists and qop in _NO_LISTS:
+            raise SQLParseException(f"cannot use list parameters in query {query_fqn}")
+        blocks = optional_blocks(query_fqn, sql)
+        if blocks and qop in _NO_LISTS:
+            raise SQLParseException(f"cannot use optional blocks in query {query_fqn}")
+        signature = self._build_signature(unmark_templates(sql) if templates else sql, qname, qsig)
+        if blocks:  # parameters of optional blocks default to None
+            optional = {name for names in blocks for name in names}
+            signature = signature.replace(parameters=[
+                param.replace(default=None) if param.name in optional else param
+                for param in signature.parameters.values()
+            ])
         if self.attribute:  # :u.a -> :u__a, **after** signature generation
             sql, attributes = _preprocess_object_attributes(self.attribute, sql)
+            if blocks and attributes:
+                raise SQLParseException(
+                    f"cannot use attribute parameters with optional blocks in query {query_fqn}"
+                )
         else:  # pragma: no cover
             attributes = None
-        sql = self.driver_adapter.process_sql(query_fqn, qop, sql)
-        return QueryDatum(query_fqn, doc, qop, sql, record_class, signature, floc, attributes, qsig)
+        if self.limit_one and qop in (SQLOperationType.SELECT_ONE, SQLOperationType.SELECT_VALUE):
+            # only the first row is used
+            limited = with_row_limit(sql, getattr(self.driver_adapter, "row_limit", "LIMIT"))
+            if limited is not None:
+                log.warning(f"query {query_fqn} at {floc[0]}:{floc[1]} has no row limit, adding one")
+                sql = limited
+        if "temp" in options:
+            # large lists are loaded in temporary tables, see Queries._make_templated
+            if not lists or lists - in_lists(sql):
+                raise SQLParseException(f"@temp requires lists used as x IN (:v*:name) in query {query_fqn}")
+        elif lists and getattr(self.driver_adapter, "array_binding", False):
+            sql = bind_arrays(sql)
+            templates = template_refs(query_fqn, sql)
+        if "pages" in options:
+            # first and next page queries, see Queries._make_paged
+            if qop != SQLOperationType.SELECT or templates or blocks:
+                raise SQLParseException(
+                    f"@pages requires a select without template parameters in query {query_fqn}"
+                )
+            keys, desc = pages_args(query_fqn, options["pages"])
+            for part, after in (("first", False), ("next", True)):
+                options[f"pages_{part}"] = self.driver_adapter.process_sql(
+                    f"{query_fqn}_pages[{part}]", qop, page_sql(sql, keys, desc, after)
+                )
+        if "export" in options:
+            # streamed to files, see Queries._make_exported
+            if qop != SQLOperationType.SELECT or templates or blocks:
+                raise SQLParseException(
+                    f"@export requires a select without template parameters in query {query_fqn}"
+                )
+            export_args(query_fqn, options["export"])
+        if qop == SQLOperationType.INSERT_RETURNING_MANY:
+            # multi-row variants are processed on use, see Queries._make_returning_many
+            values_row(query_fqn, sql)
+        # with templates or optional blocks, SQL variants are processed on use, see Queries._make_templated
+        elif not templates and not blocks:
+            sql = self.driver_adapter.process_sql(query_fqn, qop, sql)
+        return QueryDatum(
+            query_fqn, doc, qop, sql, record_class, signature, floc, attributes, qsig, options or None
+        )
 
     def _get_name_op(self, text: str) -> tuple[str, SQLOperationType, list[str]|None]:
         """Extract name, parameters and operation from spec."""
@@ -173,17 +249,22 @@ class QueryLoader:
         # TODO: Probably will want this to be a class, marshal in, and marshal out
         return self.record_classes.get(rc_name) if isinstance(rc_name, str) else None
 
-    def _get_sql_doc(self, lines: Sequence[str]) -> tuple[str, str]:
-        """Separate SQL-comment documentation and SQL code."""
-        doc, sql = "", ""
+    def _get_sql_doc(self, lines: Sequence[str]) -> tuple[str, str, dict[str, str]]:
+        """Separate SQL-comment documentation, directives and SQL code."""
+        doc, sql, options = "", "", {}
         for line in lines:
             doc_match = _SQL_COMMENT.match(line)
             if doc_match:
-                doc += doc_match.group(1) + "\n"
+                comment = doc_match.group(1)
+                directive = _DIRECTIVE.match(comment)
+                if directive and directive.group("name") in _DIRECTIVES:
+                    options[directive.group("name")] = directive.group("value") or ""
+                else:
+                    doc += comment + "\n"
             else:
                 sql += line + "\n"
 
-        return sql.strip(), doc.rstrip()
+        return sql.strip(), doc.rstrip(), options
 
     def _build_signature(self, sql: str, qname: str, sig: list[str]|None) -> inspect.Signature:
         """Return signature object for generated dynamic function."""
@@ -0,0 +1,128 @@
+import time
+import itertools
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, Sequence
+
+from .types import SQLOperationType
+
+# operations which may be sent to a replica
+_READ_OPS = (
+    SQLOperationType.SELECT,
+    SQLOperationType.SELECT_ONE,
+    SQLOperationType.SELECT_VALUE,
+)
+
+# allowed values for the "-- @route" query directive
+ROUTES = ("primary", "replica")
+
+_STRATEGIES = ("round-robin", "least-loaded")
+
+# time of the last write per router, for the current thread or task
+_LAST_WRITES: ContextVar[dict[Any, float]|None] = ContextVar("aiosql_last_writes", default=None)
+
+
+class ReplicaRouter:
+    """Route queries to a primary or to read replicas depending on their operation.
+
+    Query functions accept a router in place of a connection.
+    Reads (``select``, ``^``, ``$``) go to a replica, other operations go to the primary.
+    A query may force its destination with a ``-- @route primary`` or
+    ``-- @route replica`` line in its comments.
+    Targets may be connections or connection pools.
+
+    - :param primary: connection or pool for writes.
+    - :param replicas: connections or pools for reads, the primary is used if empty.
+    - :param strategy: how to choose a replica, ``round-robin`` (default) or ``least-loaded``,
+      which picks the replica with the fewest queries in progress.
+    - :param read_your_writes: seconds after a write during which reads from the same
+      thread or task also go to the primary, defaults to 0.
+    """
+
+    def __init__(
+        self,
+        primary: Any,
+        replicas: Sequence[Any] = (),
+        strategy: str = "round-robin",
+        read_your_writes: float = 0.0,
+    ):
+        if strategy not in _STRATEGIES:
+            raise ValueError(f"unexpected routing strategy: {strategy}")
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.strategy = strategy
+        self.read_your_writes = read_your_writes
+        self._lock = threading.Lock()
+        self._next = itertools.count()
+        self._load = [0] * len(self.replicas)
+        # statistics
+        self._primary = 0
+        self._sticky = 0
+        self._reads = [0] * len(self.replicas)
+
+    def _choose(self, operation: SQLOperationType, route: str|None) -> int:
+        """Return the index of the target replica, or -1 for the primary."""
+        if operation not in _READ_OPS:
+            if self.read_your_writes:
+                # copied so that other contexts sharing the mapping are not affected
+                _LAST_WRITES.set({**(_LAST_WRITES.get() or {}), self: time.monotonic()})
+            return self._to_primary()
+        if route == "primary" or not self.replicas:
+            return self._to_primary()
+        if route is None and self.read_your_writes:
+            last = (_LAST_WRITES.get() or {}).get(self, -1.0)
+            if last >= 0 and time.monotonic() - last < self.read_your_writes:
+                return self._to_primary(sticky=True)
+        with self._lock:
+            start = next(self._next) % len(self.replicas)
+            if self.strategy == "round-robin":
+                index = start
+            else:  # least-loaded, ties broken round-robin
+                n = len(self._load)
+                index = min(range(n), key=lambda i: (self._load[i], (i - start) % n))
+            self._load[index] += 1
+            self._reads[index] += 1
+        return index
+
+    def _to_primary(self, sticky: bool = False) -> int:
+        with self._lock:
+            self._primary += 1
+            self._sticky += sticky
+        return -1
+
+    def _done(self, index: int) -> None:
+        if index >= 0:
+            with self._lock:
+                self._load[index] -= 1
+
+    @contextmanager
+    def connection(self, operation: SQLOperationType, route: str|None = None):
+        """Context manager which provides the target of a query."""
+        index = self._choose(operation, route)
+        try:
+            yield self.primary if index < 0 else self.replicas[index]
+        finally:
+            self._done(index)
+
+    @asynccontextmanager
+    async def aconnection(self, operation: SQLOperationType, route: str|None = None):
+        """Asynchronous context manager which provides the target of a query."""
+        index = self._choose(operation, route)
+        try:
+            yield self.primary if index < 0 else self.replicas[index]
+        finally:
+            self._done(index)
+
+    def stats(self) -> dict[str, Any]:
+        """Return the number of queries sent to the primary and to each replica.
+
+        ``sticky`` counts reads sent to the primary because of ``read_your_writes``.
+        """
+        with self._lock:
+            return {
+                "primary": self._primary,
+                "sticky": self._sticky,
+                "replicas": list(self._reads),
+                "in_progress": list(self._load),
+            }
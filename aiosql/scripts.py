@@ -0,0 +1,258 @@
+import re
+import time
+import codecs
+import inspect
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, NamedTuple
+
+from .types import DriverAdapterProtocol
+from .utils import SQLParseException, log
+
+# bytes read from script files at once
+CHUNK_SIZE = 1 << 20
+
+# tokens outside strings and comments: semicolons, strings and comments which are
+# skipped at once, and openers which change the scanner state otherwise, the
+# E'' escape strings and $tag$ quotes must not be part of an identifier
+_OPEN = r"""(?P<open>(?<![\w$])[Ee]'|(?<![\w$])\$(?:[A-Za-z_][A-Za-z0-9_]*)?\$|--|/\*|['"`])"""
+_SKIP = r"""(?P<skip>"[^"]*(?:""[^"]*)*"|`[^`]*`|--[^\n]*\n|/\*.*?\*/|"""
+_TOKEN = re.compile(r"(?P<semi>;)|" + _SKIP + r"'[^']*(?:''[^']*)*')|" + _OPEN, re.S)
+_TOKEN_ESCAPED = re.compile(r"(?P<semi>;)|" + _SKIP + r"'(?:[^'\\]|''|\\[\s\S])*')|" + _OPEN, re.S)
+
+# longest token prefix which may be split at the end of a buffer, for dollar-quote tags
+_LOOKBACK = 66
+
+_QUOTED = {q: re.compile(re.escape(q)) for q in ("'", '"', "`")}
+_ESCAPED = {q: re.compile(r"\\[\s\S]?|" + re.escape(q)) for q in ("'", '"', "`")}
+
+# statements made only of comments, and trigger bodies whose statements end with ";"
+_EMPTY = re.compile(r"(?:\s|--[^\n]*|/\*.*?\*/)*", re.S)
+_TRIGGER = re.compile(r"(?i)(?:\s|--[^\n]*|/\*.*?\*/)*CREATE\s+(?:(?:TEMP|TEMPORARY)\s+)?TRIGGER\b", re.S)
+_BEGIN = re.compile(r"(?i)\bBEGIN\b")
+_END = re.compile(r"(?i);\s*END\s*$")
+
+
+class StatementSplitter:
+    """Incremental scanner which splits an SQL script into statements.
+
+    Text is fed by chunks of any size, and only the current statement is kept.
+    Semicolons are ignored in quoted strings and identifiers, with doubled quotes,
+    ``E''`` strings and optionally backslash escapes, in dollar-quoted strings,
+    in line and block comments, and in ``CREATE TRIGGER … BEGIN … END`` bodies.
+
+    - :param backslash_escapes: whether backslashes escape quotes in strings, as with MySQL.
+    """
+
+    def __init__(self, backslash_escapes: bool = False):
+        self.backslash_escapes = backslash_escapes
+        self._token = _TOKEN_ESCAPED if backslash_escapes else _TOKEN
+        self._buf = ""
+        self._start = 0  # current statement
+        self._pos = 0  # scanning position
+        self._state: str|None = None  # current quote, dollar tag or comment
+        self._trigger: bool|None = None  # whether the statement has a trigger body
+
+    def feed(self, text: str) -> list[str]:
+        """Add text to the script, and return the statements which it completes."""
+        self._buf = self._buf[self._start:] + text
+        self._pos -= self._start
+        self._start = 0
+        return self._split(False)
+
+    def close(self) -> list[str]:
+        """Return the last statement, which may lack its final semicolon."""
+        statements = self._split(True)
+        if self._state is not None and self._state != "--":
+            raise SQLParseException(f"unterminated {self._state} at end of script")
+        statements += self._statement(len(self._buf))
+        self._buf, self._start, self._pos = "", 0, 0
+        return statements
+
+    def _statement(self, end: int) -> list[str]:
+        """Return the current statement up to ``end`` unless it is empty, and start the next one."""
+        buf, start = self._buf, self._start
+        self._trigger = None
+        if _EMPTY.fullmatch(buf, start, end):
+            return []
+        return [buf[start:end].strip()]
+
+    def _in_trigger(self, semi: int) -> bool:
+        """Whether a semicolon is within the body of a trigger."""
+        if self._trigger is None:
+            self._trigger = _TRIGGER.match(self._buf, self._start) is not None
+        return (self._trigger and _BEGIN.search(self._buf, self._start, semi) is not None
+                and _END.search(self._buf, self._start, semi) is None)
+
+    def _split(self, final: bool) -> list[str]:
+        buf, pos, state = self._buf, self._pos, self._state
+        size, statements = len(buf), []
+        while pos < size:
+            if state is None:
+                m = self._token.search(buf, pos)
+                if m is None:
+                    pos = size if final else max(pos, size - _LOOKBACK)
+                    break
+                if m.lastgroup == "skip" and m.end() == size and not final:
+                    # the quote may be doubled in the next chunk
+                    pos = m.start()
+                    break
+                pos = m.end()
+                if m.lastgroup == "semi":
+                    if not self._in_trigger(m.start()):
+                        statements += self._statement(m.start())
+                        self._start = pos
+                elif m.lastgroup == "open":
+                    state = m.group(0)
+            elif state == "--":
+                i = buf.find("\n", pos)
+                if i < 0:
+                    pos = size
+                    break
+                pos, state = i + 1, None
+            elif state == "/*":
+                i = buf.find("*/", pos)
+                if i < 0:
+                    pos = max(pos, size - 1)
+                    break
+                pos, state = i + 2, None
+            elif state[0] == "$":
+                i = buf.find(state, pos)
+                if i < 0:
+                    pos = max(pos, size - len(state) + 1)
+                    break
+                pos, state = i + len(state), None
+            else:
+                quote = state[-1]
+                escaped = state == "E'" or self.backslash_escapes and quote != "`"
+                m = (_ESCAPED if escaped else _QUOTED)[quote].search(buf, pos)
+                if m is None:
+                    pos = size
+                    break
+                if m.end() == size and not final:
+                    # a backslash or a quote which may be doubled in the next chunk
+                    pos = m.start()
+                    break
+                pos = m.end()
+                if m.group(0) == quote:
+                    if pos < size and buf[pos] == quote:
+                        pos += 1
+                    else:
+                        state = None
+        self._pos, self._state = pos, state
+        return statements
+
+
+class ScriptProgress(NamedTuple):
+    """Progress of a script execution, see ``aiosql.run_script``."""
+
+    statements: int
+    position: int
+    size: int
+    elapsed: float
+
+    @property
+    def fraction(self) -> float:
+        """Fraction of the script file read so far."""
+        return self.position / self.size if self.size else 1.0
+
+
+def read_script(
+        path: str|Path, encoding: str = "utf-8", chunk_size: int = CHUNK_SIZE
+) -> Iterator[tuple[int, str]]:
+    """Read a script file by chunks, yielding the number of bytes read so far and the decoded text."""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    position = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            position += len(chunk)
+            yield position, decoder.decode(chunk)
+    yield position, decoder.decode(b"", final=True)
+
+
+def script_statements(
+        path: str|Path, encoding: str = "utf-8", backslash_escapes: bool = False, chunk_size: int = CHUNK_SIZE
+) -> Iterator[tuple[int, str]]:
+    """Yield the statements of a script file, with the number of bytes read so far."""
+    splitter = StatementSplitter(backslash_escapes)
+    position = 0
+    for position, text in read_script(path, encoding, chunk_size):
+        for statement in splitter.feed(text):
+            yield position, statement
+    for statement in splitter.close():
+        yield position, statement
+
+
+class _Runner:
+    """Shared bookkeeping of sync and async script executions."""
+
+    def __init__(self, adapter: DriverAdapterProtocol, path: str|Path, encoding: str|None,
+                 batch: int, progress_every: int, progress: Callable[[ScriptProgress], Any]|None):
+        if batch < 0 or progress_every <= 0:
+            raise ValueError(f"invalid script batch or progress interval: {batch}, {progress_every}")
+        self.path, self.batch, self.progress = path, batch, progress
+        self.every = batch or progress_every
+        self.size = Path(path).stat().st_size
+        self.statements: Iterable[tuple[int, str]] = script_statements(
+            path, encoding or "utf-8", getattr(adapter, "backslash_escapes", False)
+        )
+        self.count, self.position, self.start = 0, 0, time.perf_counter()
+
+    def step(self, position: int) -> bool:
+        """Count a statement, and tell whether a batch is complete."""
+        self.count, self.position = self.count + 1, position
+        return self.count % self.every == 0
+
+    def report(self) -> ScriptProgress:
+        done = ScriptProgress(self.count, self.position, self.size, time.perf_counter() - self.start)
+        if self.progress is not None:
+            self.progress(done)
+        return done
+
+    def done(self) -> ScriptProgress:
+        self.position = self.size
+        done = self.report()
+        log.info(f"script {self.path}: {done.statements} statements in {done.elapsed:.3f} s")
+        return done
+
+
+def execute_script_file(
+        adapter: DriverAdapterProtocol, conn: Any, path: str|Path, encoding: str|None = None,
+        batch: int = 0, progress_every: int = 1000, progress: Callable[[ScriptProgress], Any]|None = None
+) -> ScriptProgress:
+    """Execute the statements of a script file one at a time, see ``aiosql.run_script``."""
+    runner = _Runner(adapter, path, encoding, batch, progress_every, progress)
+    execute = getattr(adapter, "execute_statement", adapter.execute_script)
+    commit = getattr(conn, "commit", None) if batch else None  # not with apsw in autocommit mode
+    for position, statement in runner.statements:
+        execute(conn, statement)
+        if runner.step(position):
+            if commit is not None:
+                commit()
+            runner.report()
+    if commit is not None:
+        commit()
+    return runner.done()
+
+
+async def aexecute_script_file(
+        adapter: DriverAdapterProtocol, conn: Any, path: str|Path, encoding: str|None = None,
+        batch: int = 0, progress_every: int = 1000, progress: Callable[[ScriptProgress], Any]|None = None
+) -> ScriptProgress:
+    """Asynchronous version of ``execute_script_file``, the file is still read synchronously."""
+    runner = _Runner(adapter, path, encoding, batch, progress_every, progress)
+    execute: Any = getattr(adapter, "execute_statement", adapter.execute_script)
+
+    async def commit():
+        commit = getattr(conn, "commit", None)  # not with asyncpg
+        if commit is not None and inspect.isawaitable(done := commit()):
+            await done
+
+    for position, statement in runner.statements:
+        await execute(conn, statement)
+        if runner.step(position):
+            if batch:
+                await commit()
+            runner.report()
+    if batch:
+        await commit()
+    return runner.done()
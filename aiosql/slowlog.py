@@ -0,0 +1,94 @@
+import time
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Any, Iterable, NamedTuple
+
+from .utils import log
+
+# shown in place of sensitive parameter values
+REDACTED = "***"
+
+
+class SlowQuery(NamedTuple):
+    """A query call which exceeded its threshold."""
+
+    query_name: str
+    file: Path|str
+    line: int
+    duration: float
+    parameters: Any
+    plan: list[tuple]|None
+
+
+class SlowQueryLog:
+    """Log query calls slower than a threshold, with their plan if possible.
+
+    - :param threshold: duration in seconds above which calls are logged,
+      None to only log queries with a ``-- @slow threshold=…`` directive.
+    - :param explain: whether to capture query plans by running ``EXPLAIN``.
+    - :param explain_interval: minimum delay in seconds between two plan captures
+      for the same query, so that plans do not add load to an already slow database.
+    - :param redact: parameter names, or parts of names, whose values are not shown.
+    - :param max_length: maximum length of parameter values shown.
+    - :param max_entries: number of recent slow calls kept in ``entries``.
+    """
+
+    def __init__(
+        self,
+        threshold: float|None = None,
+        explain: bool = False,
+        explain_interval: float = 60.0,
+        redact: Iterable[str] = ("password", "secret", "token"),
+        max_length: int = 64,
+        max_entries: int = 100,
+    ):
+        self.threshold = threshold
+        self.explain = explain
+        self.explain_interval = explain_interval
+        self.redact = tuple(r.lower() for r in redact)
+        self.max_length = max_length
+        self.entries: deque[SlowQuery] = deque(maxlen=max_entries)
+        self._lock = threading.Lock()
+        # query name to time of the last plan capture
+        self._explained: dict[str, float] = {}
+
+    def want_plan(self, query_name: str) -> bool:
+        """Tell whether the plan of a slow call may be captured now."""
+        now = time.monotonic()
+        with self._lock:
+            last = self._explained.get(query_name)
+            if last is not None and now - last < self.explain_interval:
+                return False
+            self._explained[query_name] = now
+            return True
+
+    def _value(self, name: str|None, value: Any) -> Any:
+        if name is not None and any(r in name.lower() for r in self.redact):
+            return REDACTED
+        if isinstance(value, (str, bytes)) and len(value) > self.max_length:
+            return value[: self.max_length] + (b"..." if isinstance(value, bytes) else "...")  # type: ignore
+        return value
+
+    def parameters(self, args: tuple, kwargs: dict[str, Any]) -> Any:
+        """Return call parameters with sensitive and long values redacted."""
+        if kwargs:
+            return {k: self._value(k, v) for k, v in kwargs.items()}
+        return tuple(self._value(None, v) for v in args)
+
+    def record(
+        self,
+        query_name: str,
+        floc: tuple[Path|str, int],
+        duration: float,
+        args: tuple,
+        kwargs: dict[str, Any],
+        plan: list[tuple]|None = None,
+    ) -> None:
+        """Keep and log a slow call."""
+        entry = SlowQuery(query_name, floc[0], floc[1], duration, self.parameters(args, kwargs), plan)
+        self.entries.append(entry)
+        message = f"slow query {query_name} at {floc[0]}:{floc[1]}: {duration:.3f}s with {entry.parameters}"
+        if plan is not None:
+            message += "\n" + "\n".join(" ".join(str(c) for c in row) for row in plan)
+        log.warning(message)
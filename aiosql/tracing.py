@@ -0,0 +1,95 @@
+import time
+import threading
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, NamedTuple, Protocol
+
+from .types import SQLOperationType
+
+
+class QueryEvent(NamedTuple):
+    """Description of a query call, passed to hooks."""
+
+    query_name: str
+    operation: SQLOperationType
+    sql: str
+    file: Path|str
+    line: int
+    param_count: int
+
+
+class QueryHook(Protocol):
+    """Hooks called around query executions, e.g. to create tracing spans.
+
+    The value returned by ``start`` is passed back to the other methods of the same hook,
+    so that hooks may keep per-call state such as a span. ``first_row`` is only called for
+    ``select`` queries, and ``end`` is called after ``error`` on failures.
+    Contexts are preserved across these calls, including for asynchronous drivers,
+    so hooks may rely on ``contextvars`` to track nested calls.
+    """
+
+    def start(self, event: QueryEvent) -> Any: ...
+
+    def first_row(self, event: QueryEvent, context: Any) -> None: ...
+
+    def error(self, event: QueryEvent, context: Any, exc: BaseException) -> None: ...
+
+    def end(self, event: QueryEvent, context: Any) -> None: ...
+
+
+class Span:
+    """A query execution recorded by ``InMemoryExporter``."""
+
+    def __init__(self, event: QueryEvent, parent: "Span|None") -> None:
+        self.event = event
+        self.parent = parent
+        self.start = time.perf_counter()
+        self.first_row: float|None = None
+        self.end: float|None = None
+        self.error: BaseException|None = None
+
+    @property
+    def duration(self) -> float|None:
+        return self.end - self.start if self.end is not None else None
+
+    def __repr__(self) -> str:
+        return f"Span({self.event.query_name}, duration={self.duration}, error={self.error!r})"
+
+
+class InMemoryExporter:
+    """Hook which keeps finished spans in memory, mostly for tests.
+
+    Spans of queries run while another query is in progress in the same context,
+    e.g. while iterating over the results of a ``select``, get it as their parent.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._current: ContextVar[Span|None] = ContextVar("aiosql_span", default=None)
+        self.spans: list[Span] = []
+
+    def start(self, event: QueryEvent) -> Any:
+        span = Span(event, self._current.get())
+        return span, self._current.set(span)
+
+    def first_row(self, event: QueryEvent, context: Any) -> None:
+        context[0].first_row = time.perf_counter()
+
+    def error(self, event: QueryEvent, context: Any, exc: BaseException) -> None:
+        context[0].error = exc
+
+    def end(self, event: QueryEvent, context: Any) -> None:
+        span, token = context
+        span.end = time.perf_counter()
+        try:
+            self._current.reset(token)
+        except ValueError:  # pragma: no cover
+            # generator finalized in another context
+            pass
+        with self._lock:
+            self.spans.append(span)
+
+    def clear(self) -> None:
+        """Drop recorded spans."""
+        with self._lock:
+            self.spans.clear()
@@ -27,6 +27,7 @@ class SQLOperationType(Enum):
     SELECT = 4
     SELECT_ONE = 5
     SELECT_VALUE = 6
+    INSERT_RETURNING_MANY = 7
 
 
 class QueryDatum(NamedTuple):
@@ -39,6 +40,7 @@ class QueryDatum(NamedTuple):
     floc: tuple[Path|str, int]
     attributes: dict[str, dict[str, str]]|None
     parameters: list[str]|None
+    options: dict[str, str]|None = None
 
 
 class QueryFn(Protocol):
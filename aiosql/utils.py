@@ -35,3 +35,14 @@ class SQLParseException(Exception):
     """Raised when there was a problem parsing the aiosql comment annotations in SQL"""
 
     pass
+
+
+def directive_args(query_name: str, directive: str, text: str, allowed: tuple[str, ...]) -> dict[str, str]:
+    """Parse ``key=value`` arguments of a query directive, eg ``-- @cache ttl=60 max=100``."""
+    args = {}
+    for token in text.split():
+        key, eq, value = token.partition("=")
+        if not eq or not value or key not in allowed:
+            raise SQLParseException(f"unexpected @{directive} argument in query {query_name}: {token}")
+        args[key] = value
+    return args
@@ -0,0 +1,306 @@
+import re
+import functools
+from typing import Any
+
+from .utils import SQLParseException, VAR_REF
+
+# template references, outside of strings:
+# ":i:table" for an identifier, ":i*:columns" for a list of identifiers, ":v*:ids" for a list of values
+TEMPLATE_REF = re.compile(
+    r'(?P<dquote>"(""|[^"])+")|'
+    r"(?P<squote>\'(\'\'|[^\'])*\')|"
+    r"(?P<lead>[^:]):(?P<kind>i\*?|v\*):(?P<var_name>\w+)"
+)
+
+# "x IN (:v*:ids)" lists, bound as arrays with drivers which support it
+IN_LIST = re.compile(r"(?i)\b(?P<not>NOT\s+)?IN\s*\(\s*:v\*:(?P<var_name>\w+)\s*\)")
+
+# optional blocks, "[[ AND name = :name ]]", outside of strings
+OPTIONAL = re.compile(
+    r'(?P<dquote>"(""|[^"])+")|'
+    r"(?P<squote>\'(\'\'|[^\'])*\')|"
+    r"\[\[(?P<block>(\'(\'\'|[^\'])*\'|\"(\"\"|[^\"])+\"|(?!\]\])[^\'\"])*)\]\]"
+)
+
+# processed SQL variants kept per query
+MAX_VARIANTS = 128
+
+
+def template_refs(query_name: str, sql: str) -> dict[str, str]:
+    """Return template parameter names of a query, mapped to their kind, eg ``i*``."""
+    refs: dict[str, str] = {}
+    for m in TEMPLATE_REF.finditer(sql):
+        name = m.group("var_name")
+        if name is None:
+            continue
+        kind = m.group("kind")
+        if refs.setdefault(name, kind) != kind:
+            raise SQLParseException(f"template parameter used as {refs[name]} and {kind} in query {query_name}: {name}")
+    if refs:
+        values = {
+            m.group("var_name") for m in VAR_REF.finditer(unmark_templates(sql, keep=False))
+            if m.group("var_name") is not None
+        }
+        both = sorted(values & set(refs))
+        if both:
+            raise SQLParseException(f"parameter used as template and value in query {query_name}: {both}")
+    return refs
+
+
+# strings, to skip them when looking for lists and blocks
+_STRINGS = re.compile(r"""('(?:''|[^'])*'|"(?:""|[^"])+")""")
+
+
+def _var_names(sql: str) -> list[str]:
+    """Names of parameters in a piece of SQL, in order of first use."""
+    names = (m.group("var_name") for m in VAR_REF.finditer(unmark_templates(sql)))
+    return list(dict.fromkeys(name for name in names if name is not None))
+
+
+def optional_blocks(query_name: str, sql: str) -> tuple[tuple[str, ...], ...]:
+    """Return the parameters of each optional block of a query, which are not used elsewhere.
+
+    A block is kept in an SQL variant when all these parameters are provided and not None.
+    """
+    if "[[" not in sql:
+        return ()
+    blocks, outside, last = [], [], 0
+    for m in OPTIONAL.finditer(sql):
+        block = m.group("block")
+        if block is None:
+            continue
+        if "[[" in " ".join(_STRINGS.split(block)[::2]):
+            raise SQLParseException(f"nested optional blocks in query {query_name}")
+        blocks.append(_var_names(block))
+        outside.append(sql[last:m.start()])
+        last = m.end()
+    outside.append(sql[last:])
+    rest = " ".join(outside)
+    if "[[" in " ".join(_STRINGS.split(rest)[::2]):
+        raise SQLParseException(f"unterminated optional block in query {query_name}")
+    required = set(_var_names(rest))
+    result = []
+    for names in blocks:
+        own = tuple(name for name in names if name not in required)
+        if not own:
+            raise SQLParseException(f"optional block without its own parameters in query {query_name}")
+        result.append(own)
+    return tuple(result)
+
+
+def is_templated(query_name: str, sql: str) -> bool:
+    """Whether a query has template parameters or optional blocks, and thus SQL variants."""
+    return bool(template_refs(query_name, sql) or optional_blocks(query_name, sql))
+
+
+def unmark_templates(sql: str, keep: bool = True) -> str:
+    """Replace template references by plain variables, or drop them."""
+
+    def _replace(m):
+        if m.group("var_name") is None:
+            return m.group(0)
+        return m.group("lead") + (":" + m.group("var_name") if keep else "")
+
+    return TEMPLATE_REF.sub(_replace, sql)
+
+
+def _sub_in_lists(replace, sql: str) -> str:
+    """Substitute ``x IN (:v*:ids)`` lists outside of strings."""
+    parts = _STRINGS.split(sql)
+    return "".join(part if i % 2 else IN_LIST.sub(replace, part) for i, part in enumerate(parts))
+
+
+def in_lists(sql: str) -> set[str]:
+    """Return names of lists which are only used as ``x IN (:v*:ids)``."""
+    code = " ".join(_STRINGS.split(sql)[::2])
+    names = {m.group("var_name") for m in IN_LIST.finditer(code)}
+    return names - {m.group("var_name") for m in TEMPLATE_REF.finditer(IN_LIST.sub("", code))}
+
+
+def bind_arrays(sql: str) -> str:
+    """Rewrite ``x IN (:v*:ids)`` as ``x = ANY(:ids)``, and ``NOT IN`` as ``<> ALL``."""
+
+    def _replace(m):
+        op = "<> ALL" if m.group("not") else "= ANY"
+        return f"{op}(:{m.group('var_name')})"
+
+    return _sub_in_lists(_replace, sql)
+
+
+def temp_table(name: str) -> str:
+    """Name of the temporary table which holds a large list parameter."""
+    return f"_aiosql_{name}"
+
+
+def bucket(size: int) -> int:
+    """Round a list size up to a power of two."""
+    return 1 << (size - 1).bit_length()
+
+
+@functools.lru_cache(maxsize=1024)
+def list_names(name: str, size: int) -> tuple[str, ...]:
+    """Parameter names of an expanded list of values."""
+    return tuple(f"{name}__{i}" for i in range(size))
+
+
+def template_key(
+    query_name: str,
+    refs: dict[str, str],
+    kwargs: dict[str, Any],
+    loads: dict[str, Any]|None = None,
+    threshold: int = 0,
+    blocks: tuple[tuple[str, ...], ...] = (),
+) -> tuple[Any, ...]:
+    """Pop template parameters from named parameters and return the key of their SQL variant.
+
+    Identifiers are part of the key. Lists of values are padded to a power of two
+    by repeating their last value, and added to named parameters as ``name__<i>``,
+    so that only their padded size is part of the key.
+    Lists bound as arrays, of kind ``a*``, are passed as is.
+    When ``loads`` is provided, lists of at least ``threshold`` values are moved there,
+    to be loaded in temporary tables.
+    Optional ``blocks`` add whether they are kept to the key, their parameters
+    are dropped otherwise.
+    """
+    key: list[Any] = []
+    kept = [all(kwargs.get(name) is not None for name in names) for names in blocks]
+    dropped = set()
+    if blocks:
+        dropped = {name for names, keep in zip(blocks, kept) if not keep for name in names}
+        dropped -= {name for names, keep in zip(blocks, kept) if keep for name in names}
+        for name in dropped:
+            kwargs.pop(name, None)
+    for name, kind in refs.items():
+        if name in dropped:
+            key.append(None)
+            continue
+        try:
+            value = kwargs.pop(name)
+        except KeyError:
+            raise ValueError(f"missing template parameter {name} in query {query_name}")
+        if kind in ("v*", "a*"):
+            if not isinstance(value, (list, tuple)) or not value:
+                raise ValueError(f"list {name} of query {query_name} must be a non empty list")
+            if loads is not None and len(value) >= threshold:
+                loads[name] = value
+                key.append("temp")
+            elif kind == "a*":
+                kwargs[name] = list(value)
+                key.append("array")
+            else:
+                size = bucket(len(value))
+                kwargs.update(zip(list_names(name, size), [*value, *[value[-1]] * (size - len(value))]))
+                key.append(size)
+        else:
+            key.append(tuple(value) if isinstance(value, list) else value)
+    return tuple(key + kept)
+
+
+def quote_identifier(name: Any, quote: str = '"') -> str:
+    """Quote a possibly dotted identifier, eg ``public.users`` as ``"public"."users"``."""
+    if not isinstance(name, str):
+        raise ValueError(f"identifier must be a string: {name!r}")
+    parts = name.split(".")
+    if not all(parts) or "\0" in name:
+        raise ValueError(f"invalid identifier: {name!r}")
+    return ".".join(quote + part.replace(quote, quote * 2) + quote for part in parts)
+
+
+def substitute_templates(
+    query_name: str, sql: str, refs: dict[str, str], key: tuple[Any, ...], quote: str = '"'
+) -> str:
+    """Build the named-style SQL variant for a key, see ``template_key``."""
+    values = dict(zip(refs, key))
+
+    kept = iter(key[len(refs):])
+
+    def _replace_block(m):
+        if m.group("block") is None:
+            return m.group(0)
+        return m.group("block") if next(kept) else ""
+
+    if len(key) > len(refs):
+        sql = OPTIONAL.sub(_replace_block, sql)
+
+    def _replace_list(m):
+        name = m.group("var_name")
+        if values[name] == "temp":
+            return f"{m.group('not') or ''}IN (SELECT value FROM {temp_table(name)})"
+        elif values[name] == "array":
+            return f"{'<> ALL' if m.group('not') else '= ANY'}(:{name})"
+        return m.group(0)
+
+    if "temp" in key or "array" in key:
+        sql = _sub_in_lists(_replace_list, sql)
+
+    def _replace(m):
+        name = m.group("var_name")
+        if name is None:
+            return m.group(0)
+        value, kind = values[name], m.group("kind")
+        if kind == "v*":
+            return m.group("lead") + ", ".join(":" + n for n in list_names(name, value))
+        elif kind == "i*":
+            if not isinstance(value, tuple) or not value:
+                raise ValueError(f"identifier list {name} of query {query_name} must be a non empty list")
+            return m.group("lead") + ", ".join(quote_identifier(v, quote) for v in value)
+        return m.group("lead") + quote_identifier(value, quote)
+
+    return TEMPLATE_REF.sub(_replace, sql)
+
+
+# single row of values of an insert, expanded to several rows by "*<!" queries
+_VALUES = re.compile(r"(?i)\bVALUES\s*\(")
+_RETURNING = re.compile(r"(?i)\bRETURNING\b")
+
+# rows per multi-row insert, a power of two, and bound on its parameters
+MAX_ROWS = 1024
+MAX_PARAMETERS = 999
+
+
+def values_row(query_name: str, sql: str) -> tuple[int, int, tuple[str, ...]]:
+    """Return the span and parameter names of the ``VALUES (…)`` row of an insert with ``RETURNING``."""
+    masked = _STRINGS.sub(lambda m: "_" * len(m.group(0)), sql)
+    m = _VALUES.search(masked)
+    if m is None or not _RETURNING.search(masked, m.end()):
+        raise SQLParseException(f"expecting INSERT … VALUES (…) RETURNING … in query {query_name}")
+    start = end = m.end() - 1
+    depth = 0
+    for end, char in enumerate(masked[start:], start):
+        depth += 1 if char == "(" else -1 if char == ")" else 0
+        if depth == 0:
+            break
+    end += 1
+    if depth or masked[end:].lstrip().startswith(","):
+        raise SQLParseException(f"expecting exactly one row of values in query {query_name}")
+    names = tuple(_var_names(sql[start:end]))
+    if not names or _var_names(sql[:start] + sql[end:]):
+        raise SQLParseException(f"expecting parameters in the row of values only in query {query_name}")
+    return start, end, names
+
+
+def row_chunks(count: int, columns: int) -> list[int]:
+    """Split a number of rows in power-of-two chunks, to bound the number of SQL variants."""
+    largest = MAX_ROWS
+    while largest > 1 and largest * columns > MAX_PARAMETERS:
+        largest //= 2
+    chunks = [largest] * (count // largest)
+    rest = count % largest
+    while rest:
+        size = 1 << (rest.bit_length() - 1)
+        chunks.append(size)
+        rest -= size
+    return chunks
+
+
+def expand_values(sql: str, start: int, end: int, size: int) -> str:
+    """Repeat the row of values of an insert, with ``name__<i>`` parameters for the i-th row."""
+
+    def _row(i):
+        def _replace(m):
+            if m.group("var_name") is None:
+                return m.group(0)
+            return m.group("lead") + ":" + list_names(m.group("var_name"), size)[i]
+        return VAR_REF.sub(_replace, sql[start:end])
+
+    return sql[:start] + ", ".join(_row(i) for i in range(size)) + sql[end:]
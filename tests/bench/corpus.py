@@ -0,0 +1,91 @@
+#! /usr/bin/env python
+"""Generate synthetic SQL query trees to benchmark loading.
+
+Usage: python bench/corpus.py DIRECTORY [--files 100] [--queries 10] [--params 3] [--comments 0.5] [--depth 2]
+"""
+
+import random
+import argparse
+from pathlib import Path
+
+# operation suffixes, with plain select more frequent
+OPERATIONS = ("", "", "", "^", "$", "!", "<!", "*!")
+
+
+def make_query(name: str, params: int, comments: float, rnd: random.Random) -> str:
+    """Generate one named query with a given number of parameters.
+
+    - :param comments: comment density, expected number of comment lines per SQL line.
+    """
+    op = rnd.choice(OPERATIONS)
+    cols = [f"col_{i}" for i in range(max(params, 1))]
+    lines = [f"-- name: {name}{op}"]
+    lines += [f"-- Documentation line {i} of {name}." for i in range(int(comments * 3 + rnd.random()))]
+    if op in ("!", "<!", "*!"):
+        body = [
+            f"INSERT INTO {name}_table({', '.join(cols[:params])})",
+            f"  VALUES ({', '.join(':' + c for c in cols[:params])})",
+        ] if params else [f"DELETE FROM {name}_table"]
+    else:
+        body = [f"SELECT {', '.join(cols)}, 'it''s a :string' AS s", f"  FROM {name}_table"]
+        if params:
+            body.append("  WHERE " + "\n    AND ".join(f"{c} = :{c}" for c in cols[:params]))
+        body.append("  ORDER BY 1")
+    for line in body:
+        if rnd.random() < comments:
+            lines.append(f"  /* multi-line comment\n     about {name} */")
+        lines.append(line + (" -- trailing comment" if rnd.random() < comments else ""))
+    return "\n".join(lines) + ";\n"
+
+
+def make_file(prefix: str, queries: int, params: int, comments: float, rnd: random.Random) -> str:
+    """Generate the contents of a SQL file."""
+    header = "-- generated file\n\n" if comments else ""
+    return header + "\n".join(make_query(f"{prefix}_q{i}", params, comments, rnd) for i in range(queries))
+
+
+def make_sql(files: int = 1, queries: int = 10, params: int = 3, comments: float = 0.5, seed: int = 0) -> str:
+    """Generate SQL for ``from_str``, as a single string."""
+    rnd = random.Random(seed)
+    return "\n".join(make_file(f"f{i}", queries, params, comments, rnd) for i in range(files))
+
+
+def make_tree(
+        path: Path,
+        files: int = 100,
+        queries: int = 10,
+        params: int = 3,
+        comments: float = 0.5,
+        depth: int = 2,
+        seed: int = 0,
+    ) -> int:
+    """Generate a tree of SQL files for ``from_path``, return the number of queries.
+
+    Files are spread in directories nested up to ``depth`` levels.
+    """
+    rnd = random.Random(seed)
+    path.mkdir(parents=True, exist_ok=True)
+    for i in range(files):
+        level = i % (depth + 1)
+        directory = path.joinpath(*[f"d{(i // (depth + 1) + j) % 4}_{j}" for j in range(level)])
+        directory.mkdir(parents=True, exist_ok=True)
+        (directory / f"f{i}.sql").write_text(make_file(f"f{i}", queries, params, comments, rnd))
+    return files * queries
+
+
+def main(argv: list[str]|None = None) -> None:
+    ap = argparse.ArgumentParser(description="generate a synthetic SQL tree")
+    ap.add_argument("directory", type=Path, help="output directory")
+    ap.add_argument("--files", type=int, default=100, help="number of files")
+    ap.add_argument("--queries", type=int, default=10, help="queries per file")
+    ap.add_argument("--params", type=int, default=3, help="parameters per query")
+    ap.add_argument("--comments", type=float, default=0.5, help="comment density")
+    ap.add_argument("--depth", type=int, default=2, help="directory nesting depth")
+    ap.add_argument("--seed", type=int, default=0, help="random seed")
+    args = ap.parse_args(argv)
+    n = make_tree(args.directory, args.files, args.queries, args.params, args.comments, args.depth, args.seed)
+    print(f"generated {n} queries in {args.files} files under {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#! /usr/bin/env python
+"""Time query loading per phase on synthetic SQL trees of increasing size.
+
+Phases follow ``QueryLoader`` and ``Queries``: file reading, comment removal,
+splitting, parsing of names and documentation, signature building, attribute
+substitution, ``process_sql`` for several adapters, and ``Queries`` construction.
+The report shows µs per query for each phase and size, and how the time per query
+evolves from the smallest to the largest size, which should stay close to 1.
+
+Usage: python bench/loader.py [--sizes 10,100,1000] [--queries 10] [--params 3] [--comments 0.5] [--depth 2]
+"""
+
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import aiosql
+from aiosql.aiosql import _make_driver_adapter
+from aiosql.queries import Queries
+from aiosql.query_loader import (
+    QueryLoader, _QUERY_DEF, _remove_ml_comments, _preprocess_object_attributes
+)
+
+from corpus import make_tree
+
+# adapters with different process_sql implementations
+ADAPTERS = ("sqlite3", "psycopg", "asyncpg", "duckdb")
+
+
+def bench_tree(path: Path, repeat: int) -> dict[str, float]:
+    """Best time per phase over repeats, in seconds, for loading a tree."""
+    best: dict[str, float] = {}
+
+    def phase(name: str, start: float) -> float:
+        now = time.perf_counter()
+        best[name] = min(best.get(name, float("inf")), now - start)
+        return now
+
+    adapters = {name: _make_driver_adapter(name) for name in ADAPTERS}
+    loader = QueryLoader(adapters["sqlite3"], None, attribute="__")
+    files = sorted(path.rglob("*.sql"))
+    for _ in range(repeat):
+        times = dict.fromkeys(("parse", "signature", "attributes") + ADAPTERS, 0.0)
+        start = time.perf_counter()
+        texts = [f.read_text() for f in files]
+        start = phase("read", start)
+        texts = [_remove_ml_comments(t) for t in texts]
+        start = phase("uncomment", start)
+        qdefs = [qdef for t in texts for qdef in _QUERY_DEF.split(t)[1:]]
+        start = phase("split", start)
+        # same steps as QueryLoader._make_query_datum
+        for qdef in qdefs:
+            t0 = time.perf_counter()
+            lines = [line.rstrip() for line in qdef.strip().splitlines()]
+            qname, qop, qsig = loader._get_name_op(lines[0])
+            sql, _doc, _options = loader._get_sql_doc(lines[1:])
+            t1 = time.perf_counter()
+            loader._build_signature(sql, qname, qsig)
+            t2 = time.perf_counter()
+            sql, _attributes = _preprocess_object_attributes("__", sql)
+            t3 = time.perf_counter()
+            times["parse"] += t1 - t0
+            times["signature"] += t2 - t1
+            times["attributes"] += t3 - t2
+            for name, adapter in adapters.items():
+                t0 = time.perf_counter()
+                adapter.process_sql(qname, qop, sql)
+                times[name] += time.perf_counter() - t0
+        for name, duration in times.items():
+            name = f"process_sql[{name}]" if name in ADAPTERS else name
+            best[name] = min(best.get(name, float("inf")), duration)
+        tree = loader.load_query_data_from_dir_path(path)
+        start = time.perf_counter()
+        Queries(adapters["sqlite3"]).load_from_tree(tree)
+        start = phase("queries", start)
+        aiosql.from_path(path, "sqlite3")
+        phase("from_path", start)
+    return best
+
+
+def report(results: dict[int, dict[str, float]]) -> str:
+    sizes = sorted(results)
+    phases = list(results[sizes[0]])
+    lines = [f"{'phase (µs/query)':<22}" + "".join(f"{n:>10}" for n in sizes) + f"{'scaling':>10}"]
+    for p in phases:
+        per_query = [1e6 * results[n][p] / n for n in sizes]
+        scaling = per_query[-1] / per_query[0] if per_query[0] else float("nan")
+        lines.append(f"{p:<22}" + "".join(f"{t:>10.2f}" for t in per_query) + f"{scaling:>10.2f}")
+    return "\n".join(lines)
+
+
+def main(argv: list[str]|None = None) -> dict[int, dict[str, float]]:
+    ap = argparse.ArgumentParser(description="aiosql loading benchmark")
+    ap.add_argument("--sizes", default="10,100,1000", help="comma-separated numbers of files")
+    ap.add_argument("--queries", type=int, default=10, help="queries per file")
+    ap.add_argument("--params", type=int, default=3, help="parameters per query")
+    ap.add_argument("--comments", type=float, default=0.5, help="comment density")
+    ap.add_argument("--depth", type=int, default=2, help="directory nesting depth")
+    ap.add_argument("--repeat", type=int, default=3, help="number of repeats")
+    args = ap.parse_args(argv)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for files in map(int, args.sizes.split(",")):
+            path = Path(tmp) / f"corpus{files}"
+            n = make_tree(path, files, args.queries, args.params, args.comments, args.depth)
+            results[n] = bench_tree(path, args.repeat)
+    print(report(results))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+#! /usr/bin/env python
+"""Memory footprint of loaded queries and peak allocations per operation, with tracemalloc.
+
+The first part loads a synthetic SQL tree and compares the memory retained per query,
+as measured by tracemalloc, with the estimate of ``aiosql.memory.query_sizes``.
+The second part reports the peak allocation of each operation type for several
+adapters, with large results streamed through ``select`` and ``_cursor``,
+compared to streaming them with the raw driver.
+
+Usage: python bench/memory.py [--files 100] [--queries 10] [--drivers sqlite3,apsw,aiosqlite,duckdb] [--rows 100000]
+"""
+
+import gc
+import sys
+import asyncio
+import argparse
+import tempfile
+import importlib
+import tracemalloc
+from pathlib import Path
+
+import aiosql
+from aiosql.memory import query_sizes
+
+from corpus import make_tree
+from runtime import DRIVERS, MANY, SQL, SMALL
+
+
+def bench_loading(files: int, queries: int, params: int, comments: float) -> dict[str, float]:
+    """Bytes retained per query, measured and estimated by component."""
+    with tempfile.TemporaryDirectory() as tmp:
+        n = make_tree(Path(tmp), files, queries, params, comments)
+        # warm up imports and caches
+        aiosql.from_path(tmp, "sqlite3")
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        q = aiosql.from_path(tmp, "sqlite3")
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+    sizes = query_sizes(q)
+    result = {"measured": retained / n}
+    for component in ("sql", "doc", "signature", "function", "method", "total"):
+        result[component] = sum(s[component] for s in sizes.values()) / n
+    return result
+
+
+def _peak(fn, *args) -> int:
+    """Peak allocation in bytes while running a function."""
+    gc.collect()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    fn(*args)
+    return tracemalloc.get_traced_memory()[1] - base
+
+
+async def _apeak(fn, *args) -> int:
+    gc.collect()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    await fn(*args)
+    return tracemalloc.get_traced_memory()[1] - base
+
+
+def _sync_ops(q, rows: int) -> dict:
+
+    def select(conn):
+        for _ in q.get_range(conn, n=rows):
+            pass
+
+    def cursor(conn):
+        with q.get_range_cursor(conn, n=rows) as cur:
+            while cur.fetchone() is not None:
+                pass
+
+    def raw(conn):
+        cur = conn.cursor()
+        cur.execute(q.get_range.sql, {"n": rows})
+        while cur.fetchone() is not None:
+            pass
+        cur.close()
+
+    return {
+        "raw select": raw,
+        "select": select,
+        "_cursor": cursor,
+        "^": lambda conn: q.get_one(conn, i=1),
+        "$": lambda conn: q.get_value(conn, i=1),
+        "!": lambda conn: q.update(conn, s="updated", i=1),
+        "<!": lambda conn: q.insert(conn, s="inserted"),
+        "*!": lambda conn: q.insert_many(conn, MANY),
+        "#": lambda conn: q.script(conn),
+    }
+
+
+def _async_ops(q, rows: int) -> dict:
+
+    async def select(conn):
+        async for _ in q.get_range(conn, n=rows):
+            pass
+
+    async def cursor(conn):
+        async with q.get_range_cursor(conn, n=rows) as cur:
+            while await cur.fetchone() is not None:
+                pass
+
+    async def raw(conn):
+        async with conn.execute(q.get_range.sql, {"n": rows}) as cur:
+            while await cur.fetchone() is not None:
+                pass
+
+    return {
+        "raw select": raw,
+        "select": select,
+        "_cursor": cursor,
+        "^": lambda conn: q.get_one(conn, i=1),
+        "$": lambda conn: q.get_value(conn, i=1),
+        "!": lambda conn: q.update(conn, s="updated", i=1),
+        "<!": lambda conn: q.insert(conn, s="inserted"),
+        "*!": lambda conn: q.insert_many(conn, MANY),
+        "#": lambda conn: q.script(conn),
+    }
+
+
+def bench_operations(driver: str, rows: int) -> dict[str, int]:
+    """Peak allocation in bytes per operation."""
+    modname, connect, returning = DRIVERS[driver]
+    module = importlib.import_module(modname)
+    q = aiosql.from_str(SQL.replace("{returning}", returning), driver)
+    if driver == "aiosqlite":
+
+        async def run():
+            async with connect(module) as conn:
+                await q.create_schema(conn)
+                await q.fill(conn, rows=rows)
+                ops = _async_ops(q, rows)
+                for fn in ops.values():  # warm up
+                    await fn(conn)
+                return {op: await _apeak(fn, conn) for op, fn in ops.items()}
+
+        tracemalloc.start()
+        try:
+            return asyncio.run(run())
+        finally:
+            tracemalloc.stop()
+    conn = connect(module)
+    q.create_schema(conn)
+    q.fill(conn, rows=rows)
+    ops = _sync_ops(q, rows)
+    for fn in ops.values():  # warm up
+        fn(conn)
+    tracemalloc.start()
+    try:
+        return {op: _peak(fn, conn) for op, fn in ops.items()}
+    finally:
+        tracemalloc.stop()
+        conn.close()
+
+
+def main(argv: list[str]|None = None) -> tuple[dict[str, float], dict[str, dict[str, int]]]:
+    ap = argparse.ArgumentParser(description="aiosql memory benchmark")
+    ap.add_argument("--files", type=int, default=100, help="number of files of the loaded tree")
+    ap.add_argument("--queries", type=int, default=10, help="queries per file")
+    ap.add_argument("--params", type=int, default=3, help="parameters per query")
+    ap.add_argument("--comments", type=float, default=0.5, help="comment density")
+    ap.add_argument("--drivers", default=",".join(DRIVERS), help="comma-separated drivers")
+    ap.add_argument("--rows", type=int, default=100_000, help="rows of large selects")
+    args = ap.parse_args(argv)
+
+    loading = bench_loading(args.files, args.queries, args.params, args.comments)
+    print(f"bytes per query, {args.files * args.queries} queries")
+    for component, size in loading.items():
+        print(f"  {component:<10} {size:>10.0f}")
+
+    peaks = {}
+    for driver in args.drivers.split(","):
+        try:
+            peaks[driver] = bench_operations(driver, args.rows)
+        except ModuleNotFoundError:
+            print(f"skipping {driver}: not installed", file=sys.stderr)
+    if peaks:
+        ops = list(next(iter(peaks.values())))
+        print(f"peak bytes per operation, {args.rows} rows for selects, {SMALL} for *!")
+        print(f"  {'driver':<10}" + "".join(f"{op:>12}" for op in ops))
+        for driver, peak in peaks.items():
+            print(f"  {driver:<10}" + "".join(f"{peak[op]:>12}" for op in ops))
+    return loading, peaks
+
+
+if __name__ == "__main__":
+    main()
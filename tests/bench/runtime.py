@@ -0,0 +1,319 @@
+#! /usr/bin/env python
+"""Per-call overhead of aiosql over raw drivers, with in-memory databases.
+
+Each operation is run through aiosql and through the raw driver with the same
+SQL and parameters, and the best per-call time over several repeats is kept.
+
+Usage: python bench/runtime.py [--drivers sqlite3,apsw,aiosqlite,duckdb] [--number 2000] [--rows 100000]
+"""
+
+import sys
+import time
+import asyncio
+import argparse
+import importlib
+
+import aiosql
+
+SQL = """
+-- name: create-schema#
+CREATE TABLE t(i INTEGER PRIMARY KEY, s TEXT NOT NULL);
+CREATE TABLE u(s TEXT NOT NULL);
+
+-- name: fill!
+INSERT INTO t(i, s)
+  WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < :rows)
+  SELECT x, 'row ' || x FROM c;
+
+-- name: get-range
+SELECT i, s FROM t WHERE i <= :n ORDER BY i;
+
+-- name: get-one^
+SELECT i, s FROM t WHERE i = :i;
+
+-- name: get-value$
+SELECT s FROM t WHERE i = :i;
+
+-- name: update!
+UPDATE t SET s = :s WHERE i = :i;
+
+-- name: insert<!
+INSERT INTO u(s) VALUES (:s){returning};
+
+-- name: insert-many*!
+INSERT INTO u(s) VALUES (:s);
+
+-- name: script#
+DELETE FROM u WHERE s = 'none'; DELETE FROM u WHERE s = 'nothing';
+"""
+
+# driver name to module, connection function and returning clause for <!
+DRIVERS = {
+    "sqlite3": ("sqlite3", lambda m: m.connect(":memory:"), ""),
+    "apsw": ("apsw", lambda m: m.Connection(":memory:"), " RETURNING rowid"),
+    "aiosqlite": ("aiosqlite", lambda m: m.connect(":memory:"), ""),
+    "duckdb": ("duckdb", lambda m: m.connect(":memory:"), " RETURNING s"),
+}
+
+# operations, in report order
+OPERATIONS = ("select", "^", "$", "!", "<!", "*!", "#", "_cursor")
+
+# rows returned by the small select
+SMALL = 10
+
+MANY = [{"s": f"many {i}"} for i in range(SMALL)]
+
+
+def _raw_sync(driver, q):
+    """Raw DB-API implementations of operations, doing what adapters do."""
+
+    def select(conn):
+        cur = conn.cursor()
+        cur.execute(q.get_range.sql, {"n": SMALL})
+        rows = cur.fetchall()
+        cur.close()
+        return rows
+
+    def one(conn):
+        cur = conn.cursor()
+        cur.execute(q.get_one.sql, {"i": 1})
+        row = cur.fetchone()
+        cur.close()
+        return row
+
+    def value(conn):
+        cur = conn.cursor()
+        cur.execute(q.get_value.sql, {"i": 1})
+        row = cur.fetchone()
+        cur.close()
+        return row[0]
+
+    def update(conn):
+        cur = conn.cursor()
+        cur.execute(q.update.sql, {"s": "updated", "i": 1})
+        cur.close()
+
+    def insert(conn):
+        cur = conn.cursor()
+        cur.execute(q.insert.sql, {"s": "inserted"})
+        res = cur.lastrowid if driver == "sqlite3" else cur.fetchone()
+        cur.close()
+        return res
+
+    def many(conn):
+        cur = conn.cursor()
+        cur.executemany(q.insert_many.sql, MANY)
+        cur.close()
+
+    def script(conn):
+        if driver == "sqlite3":
+            conn.executescript(q.script.sql)
+        elif driver == "apsw":
+            conn.cursor().execute(q.script.sql)
+        else:
+            conn.execute(q.script.sql)
+
+    return {"select": select, "^": one, "$": value, "!": update, "<!": insert,
+            "*!": many, "#": script, "_cursor": select}
+
+
+def _aiosql_sync(q):
+    """The same operations through aiosql."""
+
+    def cursor(conn):
+        with q.get_range_cursor(conn, n=SMALL) as cur:
+            return cur.fetchall()
+
+    return {
+        "select": lambda conn: list(q.get_range(conn, n=SMALL)),
+        "^": lambda conn: q.get_one(conn, i=1),
+        "$": lambda conn: q.get_value(conn, i=1),
+        "!": lambda conn: q.update(conn, s="updated", i=1),
+        "<!": lambda conn: q.insert(conn, s="inserted"),
+        "*!": lambda conn: q.insert_many(conn, MANY),
+        "#": lambda conn: q.script(conn),
+        "_cursor": cursor,
+    }
+
+
+def _raw_async(q):
+    """Raw aiosqlite implementations of operations."""
+
+    async def select(conn):
+        async with conn.execute(q.get_range.sql, {"n": SMALL}) as cur:
+            return await cur.fetchall()
+
+    async def one(conn):
+        async with conn.execute(q.get_one.sql, {"i": 1}) as cur:
+            return await cur.fetchone()
+
+    async def value(conn):
+        async with conn.execute(q.get_value.sql, {"i": 1}) as cur:
+            return (await cur.fetchone())[0]
+
+    async def update(conn):
+        async with conn.execute(q.update.sql, {"s": "updated", "i": 1}) as cur:
+            return cur.rowcount
+
+    async def insert(conn):
+        async with conn.execute(q.insert.sql, {"s": "inserted"}) as cur:
+            return cur.lastrowid
+
+    async def many(conn):
+        await conn.executemany(q.insert_many.sql, MANY)
+
+    async def script(conn):
+        await conn.executescript(q.script.sql)
+
+    return {"select": select, "^": one, "$": value, "!": update, "<!": insert,
+            "*!": many, "#": script, "_cursor": select}
+
+
+def _aiosql_async(q):
+    """The same operations through aiosql, asynchronously."""
+
+    async def select(conn):
+        return [r async for r in q.get_range(conn, n=SMALL)]
+
+    async def cursor(conn):
+        async with q.get_range_cursor(conn, n=SMALL) as cur:
+            return await cur.fetchall()
+
+    return {
+        "select": select,
+        "^": lambda conn: q.get_one(conn, i=1),
+        "$": lambda conn: q.get_value(conn, i=1),
+        "!": lambda conn: q.update(conn, s="updated", i=1),
+        "<!": lambda conn: q.insert(conn, s="inserted"),
+        "*!": lambda conn: q.insert_many(conn, MANY),
+        "#": lambda conn: q.script(conn),
+        "_cursor": cursor,
+    }
+
+
+def compare(raw, via, conn, number: int, repeat: int) -> tuple[float, float]:
+    """Best time per call over repeats of raw and aiosql functions, in seconds.
+
+    Repeats alternate between both so that they are similarly affected by noise.
+    """
+    times: tuple[list[float], list[float]] = ([], [])
+    for _ in range(repeat):
+        for fn, fn_times in zip((raw, via), times):
+            start = time.perf_counter()
+            for _ in range(number):
+                fn(conn)
+            fn_times.append((time.perf_counter() - start) / number)
+    return min(times[0]), min(times[1])
+
+
+async def acompare(raw, via, conn, number: int, repeat: int) -> tuple[float, float]:
+    """Same as ``compare`` for asynchronous functions."""
+    times: tuple[list[float], list[float]] = ([], [])
+    for _ in range(repeat):
+        for fn, fn_times in zip((raw, via), times):
+            start = time.perf_counter()
+            for _ in range(number):
+                await fn(conn)
+            fn_times.append((time.perf_counter() - start) / number)
+    return min(times[0]), min(times[1])
+
+
+def bench_sync(driver: str, module, connect, q, number: int, repeat: int, rows: int) -> list[dict]:
+    conn = connect(module)
+    q.create_schema(conn)
+    q.fill(conn, rows=rows)
+    raw, via = _raw_sync(driver, q), _aiosql_sync(q)
+    results = []
+    for op in OPERATIONS:
+        # warm up both paths, e.g. statement caches
+        raw[op](conn), via[op](conn)
+        results.append(_result(driver, op, *compare(raw[op], via[op], conn, number, repeat)))
+
+    def raw_large(conn):
+        cur = conn.cursor()
+        cur.execute(q.get_range.sql, {"n": rows})
+        # duckdb cursors are not iterable
+        for _ in cur.fetchall() if driver == "duckdb" else cur:
+            pass
+        cur.close()
+
+    def via_large(conn):
+        for _ in q.get_range(conn, n=rows):
+            pass
+
+    results.append(_result(driver, "large select", *compare(raw_large, via_large, conn, 1, repeat), rows))
+    conn.close()
+    return results
+
+
+async def bench_async(driver: str, module, connect, q, number: int, repeat: int, rows: int) -> list[dict]:
+    async with connect(module) as conn:
+        await q.create_schema(conn)
+        await q.fill(conn, rows=rows)
+        raw, via = _raw_async(q), _aiosql_async(q)
+        results = []
+        for op in OPERATIONS:
+            await raw[op](conn), await via[op](conn)
+            results.append(_result(driver, op, *await acompare(raw[op], via[op], conn, number, repeat)))
+
+        async def raw_large(conn):
+            async with conn.execute(q.get_range.sql, {"n": rows}) as cur:
+                async for _ in cur:
+                    pass
+
+        async def via_large(conn):
+            async for _ in q.get_range(conn, n=rows):
+                pass
+
+        timings = await acompare(raw_large, via_large, conn, 1, repeat)
+        results.append(_result(driver, "large select", *timings, rows))
+    return results
+
+
+def _result(driver: str, op: str, raw: float, via: float, rows: int = 0) -> dict:
+    result = {"driver": driver, "operation": op, "raw": raw, "aiosql": via, "overhead": via - raw}
+    if rows:
+        result["raw_rows_per_s"] = rows / raw
+        result["aiosql_rows_per_s"] = rows / via
+    return result
+
+
+def report(results: list[dict]) -> str:
+    lines = [f"{'driver':<10} {'operation':<13} {'raw µs':>10} {'aiosql µs':>10} {'overhead µs':>12} {'ratio':>6}"]
+    for r in results:
+        line = (
+            f"{r['driver']:<10} {r['operation']:<13} {1e6 * r['raw']:>10.1f} {1e6 * r['aiosql']:>10.1f}"
+            f" {1e6 * r['overhead']:>12.1f} {r['aiosql'] / r['raw']:>6.2f}"
+        )
+        if "raw_rows_per_s" in r:
+            line += f"  rows/s: raw {r['raw_rows_per_s']:,.0f}, aiosql {r['aiosql_rows_per_s']:,.0f}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv: list[str]|None = None) -> list[dict]:
+    ap = argparse.ArgumentParser(description="aiosql per-call overhead benchmark")
+    ap.add_argument("--drivers", default=",".join(DRIVERS), help="comma-separated drivers")
+    ap.add_argument("--number", type=int, default=2000, help="calls per repeat")
+    ap.add_argument("--repeat", type=int, default=5, help="number of repeats")
+    ap.add_argument("--rows", type=int, default=100_000, help="rows of the large select")
+    args = ap.parse_args(argv)
+    results = []
+    for driver in args.drivers.split(","):
+        modname, connect, returning = DRIVERS[driver]
+        try:
+            module = importlib.import_module(modname)
+        except ModuleNotFoundError:
+            print(f"skipping {driver}: not installed", file=sys.stderr)
+            continue
+        q = aiosql.from_str(SQL.replace("{returning}", returning), driver)
+        if driver == "aiosqlite":
+            results += asyncio.run(bench_async(driver, module, connect, q, args.number, args.repeat, args.rows))
+        else:
+            results += bench_sync(driver, module, connect, q, args.number, args.repeat, args.rows)
+    print(report(results))
+    return results
+
+
+if __name__ == "__main__":
+    main()
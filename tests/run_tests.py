@@ -22,6 +22,7 @@ _DB = {
     "sqlite3": "sqlite3",
     "apsw": "sqlite3",
     "aiosqlite": "sqlite3",
+    "asqlite3": "sqlite3",
     "psycopg": "postgres",
     "apsycopg": "postgres",
     "psycopg2": "postgres",
@@ -34,6 +35,7 @@ _DB = {
     "mysqldb": "mysql",
     "mariadb": "mariadb",
     "duckdb": "duckdb",
+    "aduckdb": "duckdb",
 }
 
 # map databases to SQL subdirectories
@@ -96,7 +98,7 @@ class Queries:
         self._db = _DB[driver]
         self._dir = _DIR[self._db]
         self._queries = queries
-        self.is_async = driver in ("asyncpg", "aiosqlite", "apsycopg")
+        self.is_async = driver in ("asyncpg", "aiosqlite", "apsycopg", "asqlite3", "aduckdb")
         self.driver_adapter = queries.driver_adapter
         assert self.is_async == hasattr(queries.driver_adapter, "is_aio_driver")
 
@@ -429,6 +431,21 @@ def run_modulo(conn, queries):
     assert actual == expected
     conn.commit()
 
+def run_pipeline(conn, queries):
+    get_by_username = queries.f("users.get_by_username")
+    get_count = queries.f("users.get_count")
+    remove_blog = queries.f("blogs.remove_blog")
+    with queries._queries.pipeline(conn):
+        user = get_by_username(conn, username="johndoe")
+        count = get_count(conn)
+        removed = remove_blog(conn, blogid=2)
+        assert count.result() == 3
+    assert to_tuple(user.result()) == (2, "johndoe", "John", "Doe")
+    assert removed.result() == 1
+    # out of the pipeline, results are immediate
+    assert get_count(conn) == 3
+    conn.commit()
+
 #
 # Asynchronous tests
 #
@@ -610,3 +627,17 @@ async def run_async_execute_script(aconn, queries):
     create_table = queries.f("comments.create_table")
     actual = await create_table(aconn)
     assert actual in ("DONE", "CREATE TABLE")
+
+@pytest.mark.asyncio
+async def run_async_pipeline(aconn, queries):
+    get_by_username = queries.f("users.get_by_username")
+    get_count = queries.f("users.get_count")
+    remove_blog = queries.f("blogs.remove_blog")
+    async with queries._queries.pipeline(aconn):
+        user = await get_by_username(aconn, username="johndoe")
+        count = await get_count(aconn)
+        removed = await remove_blog(aconn, blogid=2)
+        assert await count == 3
+    assert tuple(await user.result()) == (2, "johndoe", "John", "Doe")
+    assert await removed == 1
+    assert await get_count(aconn) == 3
@@ -0,0 +1,166 @@
+import asyncio
+
+import aiosql
+from aiosql.pool import AsyncConnectionPool, pool_stats, _async_connection_provider
+import pytest
+
+try:
+    import aiosqlite
+    import pytest_asyncio
+except ModuleNotFoundError as m:
+    pytest.skip(f"missing module: {m}", allow_module_level=True)
+
+pytestmark = [
+    pytest.mark.sqlite3,
+]
+
+SQL = """
+-- name: create-table#
+CREATE TABLE IF NOT EXISTS item(id INTEGER PRIMARY KEY, name TEXT NOT NULL);
+
+-- name: add-item<!
+INSERT INTO item(name) VALUES (:name);
+
+-- name: add-items*!
+INSERT INTO item(name) VALUES (?);
+
+-- name: rename-item!
+UPDATE item SET name = :name WHERE id = :id;
+
+-- name: get-item^
+SELECT id, name FROM item WHERE id = :id;
+
+-- name: count-items$
+SELECT COUNT(*) FROM item;
+
+-- name: get-items
+SELECT id, name FROM item ORDER BY id;
+"""
+
+
+@pytest_asyncio.fixture
+async def pool(tmp_path):
+    dbpath = str(tmp_path / "apool.db")
+    async with AsyncConnectionPool(lambda: aiosqlite.connect(dbpath), max_size=2) as pool:
+        yield pool
+
+
+@pytest.fixture
+def queries():
+    return aiosql.from_str(SQL, "aiosqlite", kwargs_only=False)
+
+
+@pytest.mark.asyncio
+async def test_apool_queries(pool, queries):
+    assert await queries.create_table(pool) == "DONE"
+    assert await queries.add_item(pool, name="Calvin") == 1
+    await queries.add_items(pool, [("Hobbes",), ("Susie",)])
+    await queries.rename_item(pool, name="Rosalyn", id=3)
+    assert await queries.get_item(pool, id=3) == (3, "Rosalyn")
+    assert await queries.count_items(pool) == 3
+    assert [r async for r in queries.get_items(pool)] == [(1, "Calvin"), (2, "Hobbes"), (3, "Rosalyn")]
+    async with queries.get_items_cursor(pool) as cur:
+        assert len(await cur.fetchall()) == 3
+    stats = pool_stats(pool)
+    assert stats["in_use"] == 0 and stats["size"] == 1 and stats["saturation"] == 0.0
+    assert stats["acquired"] == 8 and stats["created"] == 1
+
+
+@pytest.mark.asyncio
+async def test_apool_select_holds_connection(pool, queries):
+    await queries.create_table(pool)
+    await queries.add_items(pool, [("Calvin",), ("Hobbes",)])
+    rows = queries.get_items(pool)
+    assert await rows.__anext__() == (1, "Calvin")
+    assert pool.stats()["in_use"] == 1 and pool.stats()["saturation"] == 0.5
+    assert [r async for r in rows] == [(2, "Hobbes")]
+    assert pool.stats()["in_use"] == 0
+
+
+@pytest.mark.asyncio
+async def test_apool_rollback(pool, queries):
+    await queries.create_table(pool)
+    with pytest.raises(Exception):
+        await queries.add_items(pool, [("Calvin",), (None,)])
+    assert await queries.count_items(pool) == 0
+
+
+@pytest.mark.asyncio
+async def test_apool_timeout_and_wait(pool):
+    c1, c2 = await pool.acquire(), await pool.acquire()
+    assert pool.stats()["saturation"] == 1.0
+    with pytest.raises(TimeoutError):
+        await pool.acquire(timeout=0.01)
+
+    async def release():
+        await asyncio.sleep(0.05)
+        await pool.release(c1)
+
+    task = asyncio.create_task(release())
+    assert await pool.acquire(timeout=5.0) is c1
+    await task
+    await pool.release(c1)
+    await pool.release(c2)
+    stats = pool.stats()
+    assert stats["timeouts"] == 1 and stats["waits"] == 1
+    assert stats["max_wait"] >= 0.04 and stats["max_in_use"] == 2
+
+
+@pytest.mark.asyncio
+async def test_apool_concurrency(pool, queries):
+    await queries.create_table(pool)
+
+    async def work(n):
+        for i in range(5):
+            await queries.add_item(pool, name=f"item {n}.{i}")
+
+    await asyncio.gather(*(work(n) for n in range(4)))
+    assert await queries.count_items(pool) == 20
+    assert pool.stats()["size"] <= 2
+    await pool.close()
+    with pytest.raises(ValueError):
+        await pool.acquire()
+
+
+class FakeAcquirePool:
+    """Mimic an asyncpg pool over an aiosql pool."""
+
+    def __init__(self, pool):
+        self._pool = pool
+
+    def get_max_size(self):
+        return self._pool.max_size
+
+    def acquire(self):
+        return self._pool.connection()
+
+    async def release(self, conn):  # pragma: no cover
+        pass
+
+
+@pytest.mark.asyncio
+async def test_apool_foreign(pool, queries):
+    fake = FakeAcquirePool(pool)
+    assert _async_connection_provider(FakeAcquirePool) is _async_connection_provider(FakeAcquirePool)
+    await queries.create_table(fake)
+    await queries.add_item(fake, name="Calvin")
+    assert await queries.count_items(fake) == 1
+    stats = pool_stats(fake)
+    assert stats["acquired"] == 3 and stats["in_use"] == 0 and stats["max_size"] == 2
+    # plain connections are not pools
+    assert _async_connection_provider(aiosqlite.Connection) is None
+
+
+@pytest.mark.asyncio
+async def test_apool_reaping(pool):
+    conns = [await pool.acquire() for _ in range(2)]
+    for conn in conns:
+        await pool.release(conn)
+    pool.idle_timeout = 0.0
+    await asyncio.sleep(0.001)
+    # reaping holds the pool lock, expired connections are not handed out
+    reaped, conn = await asyncio.gather(pool.reap(), pool.acquire())
+    assert reaped == 2 and conn not in conns
+    assert pool.stats()["size"] == 1 and pool.stats()["reaped"] == 2
+    await pool.release(conn, discard=True)
+    assert pool.stats()["size"] == 0
@@ -63,6 +63,7 @@ from run_tests import (
     run_async_select_cursor_context_manager as test_select_cursor_context_manager,
     run_async_insert_returning as test_insert_returning,
     run_async_insert_many as test_insert_many,
+    run_async_pipeline as test_pipeline,
 )
 
 def test_version():
@@ -0,0 +1,122 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import aiosql
+from aiosql.adapters.athreaded import connect, ThreadedConnection
+import pytest
+import run_tests as t
+import utils
+
+try:
+    import pytest_asyncio
+except ModuleNotFoundError as m:
+    pytest.skip(f"missing module: {m}", allow_module_level=True)
+
+pytestmark = [
+    pytest.mark.sqlite3,
+]
+
+@pytest.fixture(scope="module")
+def driver():
+    return "asqlite3"
+
+@pytest.fixture(scope="module")
+def date():
+    return t.todate
+
+@pytest_asyncio.fixture
+async def rconn(li_dbpath):
+    async with await connect(sqlite3.connect, li_dbpath) as conn:
+        yield conn
+
+@pytest_asyncio.fixture
+def aconn(li_db):
+    yield li_db
+
+@pytest_asyncio.fixture
+def dconn(aconn):
+    utils.run_async(aconn.run(setattr, aconn.connection, "row_factory", sqlite3.Row))
+    yield aconn
+
+from run_tests import (
+  run_async_sanity as test_sanity,
+  run_async_record_query as test_record_query,
+  run_async_parameterized_record_query as test_parameterized_record_query,
+  run_async_parameterized_query as test_parameterized_query,
+  run_async_record_class_query as test_record_class_query,
+  run_async_select_one as test_record_select_one,
+  run_async_select_value as test_record_select_value,
+  run_async_insert_returning as test_record_insert_returning,
+  run_async_delete as test_delete,
+  # KO: returns the rowcount like sqlite3 instead of None like aiosqlite
+  # run_async_insert_many as test_insert_many,
+  run_async_execute_script as test_execute_script,
+  run_async_methods as test_methods,
+  run_async_select_cursor_context_manager as test_select_cursor_context_manager,
+)
+
+SQL = """
+-- name: sleep$
+SELECT sleep(:delay);
+
+-- name: numbers
+WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < :count)
+SELECT i FROM n;
+"""
+
+def _connect():
+    conn = sqlite3.connect(":memory:")
+    conn.create_function("sleep", 1, lambda d: time.sleep(d) or threading.current_thread().name)
+    return conn
+
+@pytest.mark.asyncio
+async def test_threaded_does_not_block():
+    q = aiosql.from_str(SQL, "asqlite3")
+    async with await connect(_connect) as conn:
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        ticker = asyncio.create_task(tick())
+        thread = await q.sleep(conn, delay=0.1)
+        ticker.cancel()
+        assert thread.startswith("aiosql") and thread != threading.current_thread().name
+        assert ticks >= 5
+
+@pytest.mark.asyncio
+async def test_threaded_streaming():
+    q = aiosql.from_str(SQL, "asqlite3", kwargs_only=True)
+    q.driver_adapter.batch_size = 7
+    async with await connect(_connect) as conn:
+        assert [r[0] async for r in q.numbers(conn, count=50)] == list(range(1, 51))
+        # early exit closes the generator in the worker thread
+        async for row in q.numbers(conn, count=50):
+            if row[0] == 10:
+                break
+        async with q.numbers_cursor(conn, count=20) as cur:
+            assert [r[0] async for r in cur] == list(range(1, 21))
+
+@pytest.mark.asyncio
+async def test_threaded_connection_required():
+    q = aiosql.from_str(SQL, "asqlite3")
+    with pytest.raises(ValueError):
+        await q.sleep(sqlite3.connect(":memory:"), delay=0)
+    conn = ThreadedConnection(sqlite3.connect(":memory:", check_same_thread=False))
+    assert await q.driver_adapter.select_value(conn, "one", "SELECT 1", ()) == 1
+    await conn.close()
+
+@pytest.mark.asyncio
+async def test_threaded_cursor():
+    async with await connect(_connect) as conn:
+        cur = await conn.cursor()
+        await cur.execute("SELECT sleep(0)")
+        assert (await cur.fetchone())[0].startswith("aiosql")
+        await cur.execute("SELECT 1 UNION ALL SELECT 2")
+        assert [r[0] async for r in cur] == [1, 2]
+        await cur.close()
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import sqlite3
+
+import aiosql
+from aiosql.adapters.athreaded import connect
+import pytest
+import pytest_asyncio
+
+pytestmark = [
+    pytest.mark.sqlite3,
+]
+
+SQL = """
+-- name: create-schema#
+CREATE TABLE users(id INTEGER PRIMARY KEY, name TEXT NOT NULL, team TEXT NOT NULL);
+INSERT INTO users VALUES (1, 'Calvin', 'a'), (2, 'Hobbes', 'a'), (3, 'Susie', 'b');
+
+-- name: get-user^
+-- Get a user by id.
+-- @batch key=id query=get-users
+SELECT id, name FROM users WHERE id = :id AND team = :team;
+
+-- name: get-users
+SELECT id, name FROM users WHERE id IN (SELECT value FROM json_each(:ids)) AND team = :team;
+
+-- name: get-name^
+-- @batch key=name query=get-names param=names column=name
+SELECT name, id FROM users WHERE name = :name;
+
+-- name: get-names
+SELECT name, id FROM users WHERE name IN (SELECT value FROM json_each(:names));
+
+-- name: get-missing^
+-- @batch key=id query=no-such-query
+SELECT id FROM users WHERE id = :id;
+"""
+
+EXECUTIONS = []
+
+
+@pytest.fixture
+def json_lists():
+    sqlite3.register_adapter(list, json.dumps)
+    yield
+    del sqlite3.adapters[(list, sqlite3.PrepareProtocol)]
+
+
+@pytest_asyncio.fixture
+async def conn(json_lists):
+    conn = await connect(sqlite3.connect, ":memory:", check_same_thread=False)
+    conn.connection.set_trace_callback(EXECUTIONS.append)
+    yield conn
+    await conn.close()
+
+
+@pytest.mark.asyncio
+async def test_batch_select_one(conn):
+    queries = aiosql.from_str(SQL, "asqlite3")
+    assert queries.get_user.__doc__ == "Get a user by id."
+    await queries.create_schema(conn)
+    EXECUTIONS.clear()
+    users = await asyncio.gather(
+        *(queries.get_user(conn, id=i, team="a") for i in (1, 2, 1, 3, 4))
+    )
+    assert users == [(1, "Calvin"), (2, "Hobbes"), (1, "Calvin"), None, None]
+    assert len(EXECUTIONS) == 1 and "json_each" in EXECUTIONS[0]
+    # different parameters are different batches
+    users = await asyncio.gather(
+        queries.get_user(conn, id=1, team="a"), queries.get_user(conn, id=3, team="b")
+    )
+    assert users == [(1, "Calvin"), (3, "Susie")]
+    assert queries.batch_loaders["get_user"].stats() == {"calls": 7, "batches": 3}
+    # explicit parameter and column names
+    assert await asyncio.gather(queries.get_name(conn, name="Susie"), queries.get_name(conn, name="Moe")) == [
+        ("Susie", 3),
+        None,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_batch_errors(conn):
+    queries = aiosql.from_str(SQL, "asqlite3")
+    with pytest.raises(aiosql.SQLLoadException):
+        await queries.get_missing(conn, id=1)
+    # errors are raised to all callers
+    results = await asyncio.gather(
+        queries.get_user(conn, id=1, team="a"), queries.get_user(conn, id=2, team="a"), return_exceptions=True
+    )
+    assert all(isinstance(r, sqlite3.OperationalError) for r in results)
+    with pytest.raises(aiosql.SQLParseException):
+        aiosql.from_str("-- name: foo$\n-- @batch key=id query=bla\nSELECT :id;\n", "asqlite3")
+    with pytest.raises(aiosql.SQLParseException):
+        aiosql.from_str("-- name: foo^\n-- @batch key=id\nSELECT :id;\n", "asqlite3")
+
+
+def test_batch_sync():
+    # ignored with synchronous drivers
+    queries = aiosql.from_str(SQL, "sqlite3")
+    conn = sqlite3.connect(":memory:")
+    queries.create_schema(conn)
+    assert queries.get_user(conn, id=2, team="a") == (2, "Hobbes")
+    assert queries.batch_loaders == {}
@@ -0,0 +1,51 @@
+import sys
+from pathlib import Path
+
+import aiosql
+import pytest
+
+# benchmarks are standalone scripts
+sys.path.insert(0, str(Path(__file__).parent / "bench"))
+
+import corpus  # noqa: E402
+import loader  # noqa: E402
+import memory  # noqa: E402
+import runtime  # noqa: E402
+
+pytestmark = [
+    pytest.mark.sqlite3,
+]
+
+
+def test_bench_runtime(capsys):
+    results = runtime.main(["--drivers", "sqlite3,aiosqlite", "--number", "3", "--repeat", "1", "--rows", "50"])
+    ops = [r["operation"] for r in results if r["driver"] == "sqlite3"]
+    assert ops == list(runtime.OPERATIONS) + ["large select"]
+    assert all(r["raw"] > 0 and r["aiosql"] > 0 for r in results)
+    assert "overhead µs" in capsys.readouterr().out
+
+
+def test_bench_corpus(tmp_path):
+    assert corpus.make_tree(tmp_path, files=7, queries=5, params=2, comments=1.0, depth=3) == 35
+    queries = aiosql.from_path(tmp_path, "sqlite3")
+    assert len([q for q in queries.available_queries if not q.endswith("_cursor")]) == 35
+    assert len(list(tmp_path.rglob("*.sql"))) == 7
+    assert any(p.is_dir() for p in tmp_path.iterdir())
+    sql = corpus.make_sql(files=2, queries=3, params=0, comments=0.0)
+    names = aiosql.from_str(sql, "sqlite3").available_queries
+    assert len([q for q in names if not q.endswith("_cursor")]) == 6
+
+
+def test_bench_loader(capsys):
+    results = loader.main(["--sizes", "1,2", "--queries", "3", "--repeat", "1"])
+    assert sorted(results) == [3, 6]
+    assert {"read", "uncomment", "split", "signature", "process_sql[asyncpg]", "queries"} <= set(results[3])
+    assert "scaling" in capsys.readouterr().out
+
+
+def test_bench_memory(capsys):
+    loading, peaks = memory.main(["--files", "2", "--queries", "3", "--drivers", "sqlite3,aiosqlite", "--rows", "50"])
+    assert loading["measured"] > 0 and loading["total"] > 0
+    assert sorted(peaks) == ["aiosqlite", "sqlite3"]
+    assert {"raw select", "select", "_cursor", "*!", "#"} <= set(peaks["sqlite3"])
+    assert "peak bytes" in capsys.readouterr().out
@@ -0,0 +1,138 @@
+import sqlite3
+import time
+
+import aiosql
+from aiosql.cache import read_tables, write_tables
+import pytest
+
+pytestmark = [
+    pytest.mark.sqlite3,
+]
+
+SQL = """
+-- name: create-schema#
+CREATE TABLE country(code TEXT PRIMARY KEY, name TEXT NOT NULL);
+CREATE TABLE city(name TEXT, code TEXT REFERENCES country);
+
+-- name: country-name$
+-- Get a country name.
+-- @cache max=2
+SELECT name FROM country WHERE code = :code;
+
+-- name: country^
+-- @cache ttl=0.05
+SELECT code, name FROM country WHERE code = :code;
+
+-- name: city-country$
+-- @cache
+SELECT c.name FROM city JOIN country c USING (code) WHERE city.name = :city;
+
+-- name: add-country!
+INSERT INTO country(code, name) VALUES (:code, :name);
+
+-- name: rename-country!
+UPDATE country SET name = :name WHERE code = :code;
+
+-- name: add-city!
+INSERT INTO city(name, code) VALUES (:name, :code);
+"""
+
+
+@pytest.fixture
+def db():
+    conn = sqlite3.connect(":memory:")
+    queries = aiosql.from_str(SQL, "sqlite3")
+    queries.create_schema(conn)
+    queries.add_country(conn, code="fr", name="France")
+    queries.add_country(conn, code="de", name="Germany")
+    queries.add_country(conn, code="it", name="Italy")
+    yield conn, queries
+    conn.close()
+
+
+def test_cache_tables():
+    assert read_tables("SELECT * FROM a JOIN s.b ON TRUE WHERE x IN (SELECT y FROM \"C\")") == {"a", "b", "c"}
+    assert read_tables("SELECT 'FROM nope' -- FROM nope\n") == set()
+    assert write_tables("INSERT OR REPLACE INTO t VALUES (1)") == {"t"}
+    assert write_tables("UPDATE public.u SET x = 1") == {"u"}
+    assert write_tables("DELETE FROM v WHERE x IN (SELECT x FROM w)") == {"v"}
+    assert write_tables("CALL something()") == set()
+
+
+def test_cache_hits_and_invalidation(db):
+    conn, queries = db
+    assert queries.country_name.__doc__ == "Get a country name."
+    assert queries.country_name(conn, code="fr") == "France"
+    # a direct update is not seen
+    conn.execute("UPDATE country SET name = 'République française' WHERE code = 'fr'")
+    assert queries.country_name(conn, code="fr") == "France"
+    # an update through aiosql is
+    queries.rename_country(conn, code="fr", name="France")
+    assert queries.country_name(conn, code="fr") == "France"
+    queries.rename_country(conn, code="de", name="Deutschland")
+    assert queries.country_name(conn, code="de") == "Deutschland"
+    stats = queries.query_cache.stats()["country_name"]
+    assert stats == {"size": 1, "hits": 1, "misses": 3, "evictions": 0, "invalidations": 2}
+
+
+def test_cache_lru_and_ttl(db):
+    conn, queries = db
+    for code in ("fr", "de", "fr", "it", "de"):
+        queries.country_name(conn, code=code)
+    stats = queries.query_cache.stats()["country_name"]
+    assert stats["hits"] == 1 and stats["evictions"] == 2 and stats["size"] == 2
+    assert queries.country(conn, code="it") == ("it", "Italy")
+    assert queries.country(conn, code="it") == ("it", "Italy")
+    time.sleep(0.06)
+    assert queries.country(conn, code="it") == ("it", "Italy")
+    assert queries.query_cache.stats()["country"]["misses"] == 2
+
+
+def test_cache_join(db):
+    conn, queries = db
+    queries.add_city(conn, name="Paris", code="fr")
+    assert queries.city_country(conn, city="Paris") == "France"
+    queries.rename_country(conn, code="fr", name="Francia")
+    assert queries.city_country(conn, city="Paris") == "Francia"
+    queries.add_city(conn, name="Lyon", code="fr")
+    assert queries.query_cache.stats()["city_country"]["invalidations"] == 2
+
+
+def test_cache_errors():
+    with pytest.raises(aiosql.SQLParseException):
+        aiosql.from_str("-- name: foo\n-- @cache\nSELECT 1;\n", "sqlite3")
+    with pytest.raises(aiosql.SQLParseException):
+        aiosql.from_str("-- name: foo$\n-- @cache size=1\nSELECT 1;\n", "sqlite3")
+    with pytest.raises(aiosql.SQLParseException):
+        aiosql.from_str("-- name: foo$\n-- @cache ttl=one\nSELECT 1;\n", "sqlite3")
+    # no cache without directives
+    assert aiosql.from_str("-- name: foo$\nSELECT 1;\n", "sqlite3").query_cache is None
+
+
+def test_cache_tree(tmp_path):
+    (tmp_path / "ref").mkdir()
+    (tmp_path / "ref" / "get.sql").write_text("-- name: count$\n-- @cache\nSELECT COUNT(*) FROM t;\n")
+    (tmp_path / "set.sql").write_text(
+        "-- name: create#\nCREATE TABLE t(i INT);\n\n-- name: add!\nINSERT INTO t VALUES (:i);\n"
+    )
+    queries = aiosql.from_path(tmp_path, "sqlite3")
+    assert queries.ref.query_cache is queries.query_cache
+    conn = sqlite3.connect(":memory:")
+    queries.create(conn)
+    assert queries.ref.count(conn) == 0
+    queries.add(conn, i=1)
+    assert queries.ref.count(conn) == 1
+
+
+@pytest.mark.asyncio
+async def test_cache_async():
+    aiosqlite = pytest.importorskip("aiosqlite")
+    queries = aiosql.from_str(SQL, "aiosqlite")
+    async with aiosqlite.connect(":memory:") as conn:
+        await queries.create_schema(conn)
+        await queries.add_country(conn, code="fr", name="France")
+        assert await queries.country_name(conn, code="fr") == "France"
+        assert await queries.country_name(conn, code="fr") == "France"
+        await queries.rename_country(conn, code="fr", name="Francia")
+        assert await queries.country_name(conn, code="fr") == "Francia"
+        assert queries.query_cache.stats()["country_name"]["hits"] == 1
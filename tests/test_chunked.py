@@ -0,0 +1,137 @@
+import sqlite3
+import logging
+
+import aiosql
+from aiosql.chunks import ChunkReport, chunked_args, next_size, row_count
+from aiosql.utils import SQLParseException
+import pytest
+import pytest_asyncio
+
+pytestmark = [
+    pytest.mark.sqlite3,
+]
+
+SQL = """
+-- name: purge-users!
+-- @chunked size=300
+DELETE FROM users WHERE id IN (SELECT id FROM users WHERE age < :age LIMIT :chunk_size);
+
+-- name: archive-users!
+-- @chunked param=n size=100 target=10.0
+UPDATE users SET age = age + 100 WHERE id IN (SELECT id FROM users WHERE age < 100 LIMIT :n);
+"""
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE users(id INTEGER PRIMARY KEY, age INTEGER)")
+    conn.executemany("INSERT INTO users(age) VALUES (?)", [(i % 50,) for i in range(1000)])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def test_chunked_helpers():
+    assert chunked_args("q", "") == ("chunk_size", 1000, 0.0, 0.0)
+    assert chunked_args("q", "param=n size=10 sleep=0.5 target=2") == ("n", 10, 0.5, 2.0)
+    for directive in ("size=0", "size=many", "sleep=-1", "rows=10"):
+        with pytest.raises(SQLParseException):
+            chunked_args("q", directive)
+    assert row_count("q", 5) == 5
+    assert row_count("q", "DELETE 1000") == 1000
+    assert row_count("q", -1, lambda: 7) == 7
+    with pytest.raises(ValueError, match="cannot count rows"):
+        row_count("q", None)
+    assert next_size(100, 1.0, 0.0) == 100
+    assert next_size(100, 0.5, 1.0) == 200
+    assert next_size(100, 0.01, 1.0) == 200
+    assert next_size(100, 10.0, 1.0) == 50
+    assert ChunkReport(10, 2, 0.0).throughput == 0.0
+
+
+def test_chunked(conn, caplog):
+    q = aiosql.from_str(SQL, "sqlite3")
+    statements = []
+    conn.set_trace_callback(statements.append)
+    with caplog.at_level(logging.INFO, logger="aiosql"):
+        report = q.purge_users(conn, age=20)
+    assert isinstance(report, ChunkReport)
+    # 400 rows in chunks of 300, and a last empty chunk
+    assert (report.rows, report.chunks) == (400, 3)
+    assert report.elapsed > 0 and report.throughput > 0
+    assert "chunked query purge_users: 400 rows in 3 chunks" in caplog.text
+    # each chunk is committed
+    assert statements.count("COMMIT") == 3
+    assert not conn.in_transaction
+    assert conn.execute("SELECT COUNT(*) FROM users").fetchone() == (600,)
+    # explicit chunk size
+    assert q.purge_users(conn, age=30, chunk_size=50).chunks == 5
+    assert q.purge_users(conn, age=30).rows == 0
+
+
+def test_chunked_target(conn):
+    q = aiosql.from_str(SQL, "sqlite3")
+    # fast chunks double in size: 100 + 200 + 400 + 300
+    report = q.archive_users(conn)
+    assert (report.rows, report.chunks) == (1000, 5)
+
+
+def test_chunked_sleep(conn, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr("time.sleep", sleeps.append)
+    q = aiosql.from_str("-- name: purge!\n-- @chunked size=400 sleep=0.25\n"
+                        "DELETE FROM users WHERE id IN (SELECT id FROM users LIMIT :chunk_size);\n", "sqlite3")
+    assert q.purge(conn).rows == 1000
+    assert sleeps == [0.25, 0.25, 0.25]
+
+
+def test_chunked_apsw():
+    apsw = pytest.importorskip("apsw")
+    conn = apsw.Connection(":memory:")
+    conn.execute("CREATE TABLE users(id INTEGER PRIMARY KEY, age INTEGER)")
+    conn.executemany("INSERT INTO users(age) VALUES (?)", [(i % 50,) for i in range(1000)])
+    q = aiosql.from_str(SQL, "apsw")
+    # no row counts nor commit in autocommit mode
+    report = q.purge_users(conn, age=20)
+    assert (report.rows, report.chunks) == (400, 3)
+    assert list(conn.execute("SELECT COUNT(*) FROM users")) == [(600,)]
+    conn.close()
+
+
+def test_chunked_errors():
+    with pytest.raises(SQLParseException, match="requires a ! query"):
+        aiosql.from_str("-- name: foo\n-- @chunked\nSELECT * FROM t LIMIT :chunk_size;\n", "sqlite3")
+    with pytest.raises(SQLParseException, match="missing @chunked parameter"):
+        aiosql.from_str("-- name: foo!\n-- @chunked param=n\nDELETE FROM t LIMIT :chunk_size;\n", "sqlite3")
+
+
+@pytest_asyncio.fixture
+async def aconn():
+    aiosqlite = pytest.importorskip("aiosqlite")
+    async with aiosqlite.connect(":memory:") as conn:
+        await conn.execute("CREATE TABLE users(id INTEGER PRIMARY KEY, age INTEGER)")
+        await conn.executemany("INSERT INTO users(age) VALUES (?)", [(i % 50,) for i in range(1000)])
+        yield conn
+
+
+@pytest.mark.asyncio
+async def test_chunked_async(aconn):
+    q = aiosql.from_str(SQL, "aiosqlite")
+    report = await q.purge_users(aconn, age=10)
+    assert (report.rows, report.chunks) == (200, 2)
+    report = await q.archive_users(aconn)
+    assert (report.rows, report.chunks) == (800, 5)
+
+
+@pytest.mark.asyncio
+async def test_chunked_threaded_apsw():
+    apsw = pytest.importorskip("apsw")
+    from aiosql.adapters.athreaded import connect
+    async with await connect(apsw.Connection, ":memory:") as tconn:
+        await tconn.run(tconn.connection.execute, "CREATE TABLE users(id INTEGER PRIMARY KEY, age INTEGER)")
+        await tconn.run(tconn.connection.executemany, "INSERT INTO users(age) VALUES (?)",
+                        [(i % 50,) for i in range(1000)])
+        q = aiosql.from_str(SQL, "aapsw")
+        report = await q.purge_users(tconn, age=20, chunk_size=150)
+        assert (report.rows, report.chunks) == (400, 4)
@@ -0,0 +1,124 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import aiosql
+from aiosql.adapters.athreaded import connect
+from aiosql.coalesce import SingleFlight
+import pytest
+
+pytestmark = [
+    pytest.mark.sqlite3,
+]
+
+SQL = """
+-- name: slow-square$
+SELECT slow(:n) * :n;
+
+-- name: slow-fail$
+SELECT slow(:n) / 0 FROM nowhere;
+
+-- name: numbers
+SELECT 1 UNION SELECT 2;
+"""
+
+EXECUTIONS = []
+
+
+def _slow(n):
+    EXECUTIONS.append(n)
+    time.sleep(0.1)
+    return n
+
+
+def _connect():
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    conn.create_function("slow", 1, _slow)
+    return conn
+
+
+def test_coalesce_threads():
+    EXECUTIONS.clear()
+    queries = aiosql.from_str(SQL, "sqlite3", single_flight=True)
+    results = []
+
+    def work(n):
+        # one connection per thread
+        results.append(queries.slow_square(_connect(), n=n))
+
+    threads = [threading.Thread(target=work, args=(n % 2,)) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(results) == [0] * 4 + [1] * 4
+    assert sorted(EXECUTIONS) == [0, 1]
+    assert queries.single_flight.stats() == {"slow_square": {"calls": 8, "coalesced": 6}}
+    # other operations are not coalesced
+    assert list(queries.numbers(_connect())) == [(1,), (2,)]
+
+
+def test_coalesce_errors():
+    queries = aiosql.from_str(SQL, "sqlite3", single_flight=True)
+    errors = []
+
+    def work():
+        try:
+            queries.slow_fail(_connect(), n=1)
+        except sqlite3.OperationalError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(errors) == 3
+    # disabled by default
+    assert aiosql.from_str(SQL, "sqlite3").single_flight is None
+
+
+@pytest.mark.asyncio
+async def test_coalesce_async():
+    EXECUTIONS.clear()
+    queries = aiosql.from_str(SQL, "asqlite3", single_flight=True)
+    conns = [await connect(_connect) for _ in range(4)]
+    try:
+        results = await asyncio.gather(*(queries.slow_square(c, n=3) for c in conns))
+        assert results == [9] * 4
+        assert EXECUTIONS == [3]
+        assert queries.single_flight.stats()["slow_square"] == {"calls": 4, "coalesced": 3}
+        # sequential calls are executed
+        assert await queries.slow_square(conns[0], n=3) == 9
+        assert EXECUTIONS == [3, 3]
+    finally:
+        for c in conns:
+            await c.close()
+
+
+@pytest.mark.asyncio
+async def test_coalesce_async_cancel():
+    flight, calls = SingleFlight(), []
+
+    async def slow(n):
+        calls.append(n)
+        await asyncio.sleep(0.05)
+        return n * n
+
+    leader = asyncio.create_task(flight.acall("q", 3, slow, 3))
+    await asyncio.sleep(0.01)
+    followers = [asyncio.create_task(flight.acall("q", 3, slow, 3)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+    # the leader is cancelled, one follower runs the call again for both
+    leader.cancel()
+    assert await asyncio.gather(*followers) == [9, 9]
+    assert leader.cancelled() and calls == [3, 3]
+    assert flight.stats()["q"] == {"calls": 3, "coalesced": 2}
+    # a cancelled follower does not cancel the leader
+    leader = asyncio.create_task(flight.acall("q", 4, slow, 4))
+    await asyncio.sleep(0.01)
+    follower = asyncio.create_task(flight.acall("q", 4, slow, 4))
+    await asyncio.sleep(0.01)
+    follower.cancel()
+    assert await leader == 16 and follower.cancelled()
@@ -0,0 +1,209 @@
+import io
+import csv
+import json
+import sqlite3
+import logging
+import inspect
+
+import aiosql
+from aiosql.export import ExportReport, export_format
+from aiosql.utils import SQLParseException
+import pytest
+import pytest_asyncio
+import utils as u
+
+pytestmark = [
+    pytest.mark.sqlite3,
+]
+
+SQL = """
+-- name: get-users
+-- @export
+SELECT id, name, score FROM users WHERE id < :below ORDER BY id;
+
+-- name: get-names
+-- @export format=jsonl
+SELECT name FROM users ORDER BY id;
+"""
+
+ROWS = [(i, f"user {i}", i / 2 if i % 3 else None) for i in range(1000)]
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE users(id INTEGER PRIMARY KEY, name TEXT, score REAL)")
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?)", ROWS)
+    yield conn
+    conn.close()
+
+
+def test_export_format():
+    assert export_format("q", "out.CSV", None) == "csv"
+    assert export_format("q", "out.ndjson", None) == "jsonl"
+    assert export_format("q", "out.txt", "parquet") == "parquet"
+    with pytest.raises(ValueError, match="cannot guess"):
+        export_format("q", io.StringIO(), None)
+    with pytest.raises(ValueError, match="unexpected export format"):
+        export_format("q", "out.csv", "xlsx")
+
+
+def test_export_csv(conn, tmp_path, caplog):
+    q = aiosql.from_str(SQL, "sqlite3")
+    assert "get_users_to_file" in q.available_queries
+    signature = "(dest, *, below, file_format=None, batch_size=1000)"
+    assert str(inspect.signature(q.get_users_to_file)) == signature
+    path = tmp_path / "users.csv"
+    with caplog.at_level(logging.INFO, logger="aiosql"):
+        report = q.get_users_to_file(conn, path, below=500, batch_size=64)
+    assert isinstance(report, ExportReport) and report.rows == 500 and report.throughput > 0
+    assert "exported query get_users: 500 rows as csv" in caplog.text
+    with open(path, newline="") as f:
+        lines = list(csv.reader(f))
+    assert lines[0] == ["id", "name", "score"]
+    assert lines[1:4] == [["0", "user 0", ""], ["1", "user 1", "0.5"], ["2", "user 2", "1.0"]]
+    assert len(lines) == 501
+    # binary and text file-like objects, and no rows
+    buffer = io.BytesIO()
+    assert q.get_users_to_file(conn, buffer, below=2, file_format="csv").rows == 2
+    assert buffer.getvalue() == b"id,name,score\r\n0,user 0,\r\n1,user 1,0.5\r\n"
+    text = io.StringIO()
+    assert q.get_users_to_file(conn, text, below=0, file_format="csv").rows == 0
+    assert text.getvalue() == "id,name,score\r\n"
+
+
+def test_export_jsonl(conn, tmp_path):
+    q = aiosql.from_str(SQL, "sqlite3")
+    path = tmp_path / "names.out"
+    # default format of the directive
+    assert q.get_names_to_file(conn, path).rows == 1000
+    with open(path) as f:
+        lines = [json.loads(line) for line in f]
+    assert lines[:2] == [{"name": "user 0"}, {"name": "user 1"}] and len(lines) == 1000
+    path = tmp_path / "users.jsonl"
+    q.get_users_to_file(conn, path, below=3)
+    assert path.read_text().splitlines()[0] == '{"id": 0, "name": "user 0", "score": null}'
+
+
+def test_export_parquet(conn, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    q = aiosql.from_str(SQL, "sqlite3")
+    path = tmp_path / "users.parquet"
+    assert q.get_users_to_file(conn, path, below=1000, batch_size=100).rows == 1000
+    table = pq.read_table(path)
+    assert table.column_names == ["id", "name", "score"]
+    assert table.to_pylist()[:2] == [
+        {"id": 0, "name": "user 0", "score": None},
+        {"id": 1, "name": "user 1", "score": 0.5},
+    ]
+    assert table.num_rows == 1000
+    assert q.get_users_to_file(conn, path, below=0).rows == 0
+    assert pq.read_table(path).num_rows == 0
+
+
+def test_export_parquet_nulls(conn, tmp_path, monkeypatch):
+    pq = pytest.importorskip("pyarrow.parquet")
+    import aiosql.export
+    conn.execute("UPDATE users SET score = NULL, name = NULL WHERE id < 250")
+    conn.execute("UPDATE users SET score = 7 WHERE id = 300")
+    q = aiosql.from_str(SQL, "sqlite3")
+    path = tmp_path / "users.parquet"
+    # first batches are only nulls
+    assert q.get_users_to_file(conn, path, below=1000, batch_size=100).rows == 1000
+    table = pq.read_table(path)
+    assert [str(f.type) for f in table.schema] == ["int64", "string", "double"]
+    assert table.to_pylist()[0] == {"id": 0, "name": None, "score": None}
+    assert table.column("score").to_pylist()[299:302] == [149.5, 7.0, 150.5]
+    # a column which is still only nulls is kept as such
+    monkeypatch.setattr(aiosql.export, "PENDING_ROWS", 100)
+    assert q.get_users_to_file(conn, path, below=100, batch_size=10).rows == 100
+    assert str(pq.read_table(path).schema.field("score").type) == "null"
+    # the file is closed on errors
+    with pytest.raises(ValueError, match="cannot export rows to parquet"):
+        q.get_users_to_file(conn, path, below=1000, batch_size=100)
+
+
+def test_export_duckdb(tmp_path):
+    duckdb = pytest.importorskip("duckdb")
+    conn = duckdb.connect(":memory:")
+    conn.execute("CREATE TABLE users(id INTEGER, name TEXT, score DOUBLE)")
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?)", ROWS[:100])
+    q = aiosql.from_str(SQL, "duckdb")
+    # native COPY to files
+    for ext in ("csv", "jsonl", "parquet"):
+        assert q.get_users_to_file(conn, tmp_path / f"users.{ext}", below=50).rows == 50
+    assert (tmp_path / "users.csv").read_text().splitlines()[:2] == ["id,name,score", "0,user 0,"]
+    assert json.loads((tmp_path / "users.jsonl").read_text().splitlines()[1]) == {
+        "id": 1, "name": "user 1", "score": 0.5
+    }
+    # fetched by batches to file-like objects
+    buffer = io.StringIO()
+    assert q.get_users_to_file(conn, buffer, below=10, file_format="csv", batch_size=3).rows == 10
+    assert buffer.getvalue().splitlines()[1] == "0,user 0,"
+    conn.close()
+
+
+@pytest.mark.postgres
+@pytest.mark.skipif(not u.has_pkg("pytest_postgresql"), reason="no pytest_postgresql")
+def test_export_postgres(pg_conn, tmp_path):
+    with pg_conn.cursor() as cur:
+        cur.execute("CREATE TEMPORARY TABLE users(id INTEGER, name TEXT, score DOUBLE PRECISION)")
+        cur.executemany("INSERT INTO users VALUES (%s, %s, %s)", ROWS[:100])
+    q = aiosql.from_str(SQL, "psycopg")
+    # native COPY TO STDOUT for csv
+    path = tmp_path / "users.csv"
+    assert q.get_users_to_file(pg_conn, path, below=50).rows == 50
+    assert path.read_text().splitlines()[:3] == ["id,name,score", "0,user 0,", "1,user 1,0.5"]
+    path = tmp_path / "users.jsonl"
+    assert q.get_users_to_file(pg_conn, path, below=50).rows == 50
+    assert path.read_text().splitlines()[1] == '{"id": 1, "name": "user 1", "score": 0.5}'
+
+
+def test_export_pyformat_fallback(conn, tmp_path):
+    from aiosql.adapters.pyformat import PGPyFormatAdapter
+    # drivers without COPY support, eg pygresql, use the generic fetch loop
+    adapter = PGPyFormatAdapter()
+    assert adapter.export(conn, "q", "SELECT 1", {}, tmp_path / "out.csv", "csv", 100) is None
+    assert not (tmp_path / "out.csv").exists()
+
+
+def test_export_errors(conn):
+    q = aiosql.from_str(SQL, "sqlite3")
+    with pytest.raises(ValueError, match="batch_size"):
+        q.get_users_to_file(conn, "out.csv", below=1, batch_size=0)
+    with pytest.raises(SQLParseException, match="@export requires a select"):
+        aiosql.from_str("-- name: foo$\n-- @export\nSELECT 1;\n", "sqlite3")
+    with pytest.raises(SQLParseException, match="@export requires a select"):
+        aiosql.from_str("-- name: foo\n-- @export\nSELECT * FROM t WHERE TRUE [[AND a = :a]];\n", "sqlite3")
+    with pytest.raises(SQLParseException, match="unexpected @export format"):
+        aiosql.from_str("-- name: foo\n-- @export format=xml\nSELECT 1;\n", "sqlite3")
+
+
+@pytest_asyncio.fixture
+async def aconn():
+    aiosqlite = pytest.importorskip("aiosqlite")
+    async with aiosqlite.connect(":memory:") as conn:
+        await conn.execute("CREATE TABLE users(id INTEGER PRIMARY KEY, name TEXT, score REAL)")
+        await conn.executemany("INSERT INTO users VALUES (?, ?, ?)", ROWS)
+        yield conn
+
+
+@pytest.mark.asyncio
+async def test_export_async(aconn, tmp_path):
+    q = aiosql.from_str(SQL, "aiosqlite")
+    path = tmp_path / "users.csv"
+    report = await q.get_users_to_file(aconn, path, below=300, batch_size=64)
+    assert report.rows == 300
+    assert len(path.read_text().splitlines()) == 301
+
+
+@pytest.mark.asyncio
+async def test_export_threaded(tmp_path):
+    from aiosql.adapters.athreaded import connect
+    async with await connect(sqlite3.connect, ":memory:") as tconn:
+        await tconn.run(tconn.connection.execute, "CREATE TABLE users(id INTEGER, name TEXT, score REAL)")
+        await tconn.run(tconn.connection.executemany, "INSERT INTO users VALUES (?, ?, ?)", ROWS)
+        q = aiosql.from_str(SQL, "asqlite3")
+        path = tmp_path / "names.jsonl"
+        assert (await q.get_names_to_file(tconn, path)).rows == 1000
+        assert path.read_text().count("\n") == 1000
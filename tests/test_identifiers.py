@@ -0,0 +1,108 @@
+import sqlite3
+
+import aiosql
+from aiosql.variants import quote_identifier
+from aiosql.utils import SQLParseException
+import pytest
+import pytest_asyncio
+
+pytestmark = [
+    pytest.mark.sqlite3,
+]
+
+SQL = """
+-- name: get-columns(cols, table)
+SELECT :i*:cols FROM :i:table ORDER BY 1;
+
+-- name: count-rows$
+SELECT COUNT(*) FROM :i:table WHERE id > :min;
+
+-- name: add-rows*!
+INSERT INTO :i:table(id, name) VALUES (:id, :name);
+
+-- name: drop-table#
+DROP TABLE :i:table;
+"""
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE users(id INTEGER, name TEXT)")
+    conn.execute("CREATE TABLE \"odd\"\"name\"(id INTEGER, name TEXT)")
+    yield conn
+    conn.close()
+
+
+def test_quote_identifier():
+    assert quote_identifier("users") == '"users"'
+    assert quote_identifier("public.users") == '"public"."users"'
+    assert quote_identifier('a"b') == '"a""b"'
+    assert quote_identifier("a`b", "`") == "`a``b`"
+    for bad in ("", "a..b", 1, None, "a\0b"):
+        with pytest.raises(ValueError):
+            quote_identifier(bad)
+
+
+def test_identifiers(conn):
+    q = aiosql.from_str(SQL, "sqlite3")
+    assert list(q.get_columns.__signature__.parameters) == ["self", "cols", "table"]
+    assert q.add_rows(conn, [{"id": 1, "name": "calvin"}, {"id": 2, "name": "hobbes"}], table="users") == 2
+    assert q.add_rows(conn, [{"id": 3, "name": "susie"}], table='odd"name') == 1
+    assert list(q.get_columns(conn, cols=["name", "id"], table="users")) == [("calvin", 1), ("hobbes", 2)]
+    with q.get_columns_cursor(conn, cols=["id"], table='odd"name') as cur:
+        assert cur.fetchall() == [(3,)]
+    assert q.count_rows(conn, table="users", min=0) == 2
+    assert q.count_rows(conn, table="users", min=1) == 1
+    assert q.count_rows(conn, table='odd"name', min=0) == 1
+    info = q.variants["count_rows"].cache_info()
+    assert info.misses == 2 and info.hits == 1
+    # identifiers cannot inject sql
+    with pytest.raises(sqlite3.OperationalError):
+        q.count_rows(conn, table="users; DROP TABLE users; --", min=0)
+    assert q.count_rows(conn, table="users", min=0) == 2
+    with pytest.raises(ValueError, match="missing template parameter"):
+        q.count_rows(conn, min=0)
+    with pytest.raises(ValueError, match="non empty list"):
+        list(q.get_columns(conn, cols=[], table="users"))
+    q.drop_table(conn, table="users")
+    with pytest.raises(sqlite3.OperationalError):
+        q.count_rows(conn, table="users", min=0)
+
+
+def test_identifiers_processing():
+    q = aiosql.from_str(SQL, "asyncpg")
+    assert q.count_rows.sql == "SELECT COUNT(*) FROM :i:table WHERE id > :min;"
+    variant = q.variants["count_rows"](("t",))
+    assert variant.sql == 'SELECT COUNT(*) FROM "t" WHERE id > $1;'
+    assert q.driver_adapter.var_sorted["count_rows"] == ["min"]
+    q = aiosql.from_str(SQL, "pymysql")
+    variant = q.variants["get_columns"]((("a", "b"), "s.t"))
+    assert variant.sql == "SELECT `a`, `b` FROM `s`.`t` ORDER BY 1;"
+
+
+def test_identifiers_errors():
+    with pytest.raises(SQLParseException, match="template and value"):
+        aiosql.from_str("-- name: q\nSELECT :i:t, :t FROM x;\n", "sqlite3")
+    with pytest.raises(SQLParseException, match="used as i\\* and i"):
+        aiosql.from_str("-- name: q\nSELECT :i*:t FROM :i:t;\n", "sqlite3")
+    with pytest.raises(SQLParseException, match="undeclared parameter"):
+        aiosql.from_str("-- name: q(a)\nSELECT :a FROM :i:t;\n", "sqlite3")
+
+
+@pytest_asyncio.fixture
+async def aconn():
+    aiosqlite = pytest.importorskip("aiosqlite")
+    async with aiosqlite.connect(":memory:") as conn:
+        await conn.execute("CREATE TABLE users(id INTEGER, name TEXT)")
+        await conn.execute("INSERT INTO users VALUES (1, 'calvin'), (2, 'hobbes')")
+        yield conn
+
+
+@pytest.mark.asyncio
+async def test_identifiers_async(aconn):
+    q = aiosql.from_str(SQL, "aiosqlite")
+    assert [r async for r in q.get_columns(aconn, cols=["name"], table="users")] == [("calvin",), ("hobbes",)]
+    assert await q.count_rows(aconn, table="users", min=1) == 1
+    async with q.get_columns_cursor(aconn, cols=["id"], table="users") as cur:
+        assert await cur.fetchall() == [(1,), (2,)]
@@ -0,0 +1,74 @@
+import sqlite3
+import logging
+
+import aiosql
+from aiosql.aiosql import _make_driver_adapter
+from aiosql.limits import with_row_limit
+import pytest
+
+pytestmark = [
+    pytest.mark.sqlite3,
+]
+
+SQL = """
+-- name: get-user^
+SELECT * FROM users WHERE name LIKE :pattern ORDER BY id;
+
+-- name: get-id$
+-- already limited
+SELECT id FROM users ORDER BY id DESC LIMIT 1;
+
+-- name: get-users
+SELECT * FROM users;
+
+-- name: add-user<!
+INSERT INTO users(name) VALUES (:name) RETURNING id;
+"""
+
+
+def test_with_row_limit():
+    assert with_row_limit("SELECT * FROM t WHERE s = 'a;';") == "SELECT * FROM t WHERE s = 'a;' LIMIT 1;"
+    assert with_row_limit("SELECT * FROM t -- last\n") == "SELECT * FROM t LIMIT 1 -- last\n"
+    assert with_row_limit("WITH a AS (SELECT 1 LIMIT 2) SELECT * FROM a") == (
+        "WITH a AS (SELECT 1 LIMIT 2) SELECT * FROM a LIMIT 1"
+    )
+    assert with_row_limit("SELECT * FROM t WHERE id = :id FOR UPDATE") == (
+        "SELECT * FROM t WHERE id = :id LIMIT 1 FOR UPDATE"
+    )
+    # already limited or not a select
+    assert with_row_limit("SELECT * FROM t LIMIT :n") is None
+    assert with_row_limit("SELECT * FROM t FETCH FIRST 1 ROWS ONLY") is None
+    assert with_row_limit("SELECT 'LIMIT' FROM t") is not None
+    assert with_row_limit("UPDATE t SET x = 1 RETURNING *") is None
+    assert with_row_limit("VALUES (1)") is None
+    # dialects with TOP
+    assert with_row_limit("SELECT DISTINCT a FROM t", "TOP") == "SELECT DISTINCT TOP 1 a FROM t"
+    assert with_row_limit("SELECT TOP 5 a FROM t", "TOP") is None
+    assert with_row_limit("SELECT a FROM t UNION SELECT b FROM u", "TOP") is None
+
+
+def test_limit_one(caplog):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE users(id INTEGER PRIMARY KEY, name TEXT)")
+    conn.executemany("INSERT INTO users(name) VALUES (?)", [(f"user {i}",) for i in range(100)])
+    statements = []
+    conn.set_trace_callback(statements.append)
+    with caplog.at_level(logging.WARNING, logger="aiosql"):
+        q = aiosql.from_str(SQL, "sqlite3", limit_one=True)
+    assert "query get_user at <unknown>:2 has no row limit" in caplog.text
+    assert "get_id" not in caplog.text and "get_users" not in caplog.text
+    assert q.get_user.sql == "SELECT * FROM users WHERE name LIKE :pattern ORDER BY id LIMIT 1;"
+    assert q.get_user(conn, pattern="user 4%") == (5, "user 4")
+    assert statements[-1].endswith("ORDER BY id LIMIT 1;")
+    assert q.get_id(conn) == 100
+    assert len(list(q.get_users(conn))) == 100
+    assert q.add_user(conn, name="calvin") == 101
+    # disabled by default
+    q = aiosql.from_str(SQL, "sqlite3")
+    assert "LIMIT" not in q.get_user.sql
+
+
+def test_row_limit_adapters():
+    assert _make_driver_adapter("pymssql").row_limit == "TOP"
+    assert _make_driver_adapter("apymssql").row_limit == "TOP"
+    assert getattr(_make_driver_adapter("sqlite3"), "row_limit", "LIMIT") == "LIMIT"
@@ -0,0 +1,77 @@
+import sqlite3
+
+import aiosql
+from aiosql.utils import SQLParseException
+from aiosql.variants import bind_arrays, bucket
+import pytest
+
+pytestmark = [
+    pytest.mark.sqlite3,
+]
+
+SQL = """
+-- name: get-users
+SELECT id FROM users WHERE id IN (:v*:ids) AND name NOT IN (:v*:names) ORDER BY id;
+
+-- name: count-users$
+SELECT COUNT(*) FROM users WHERE id IN (:v*:ids);
+"""
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE users(id INTEGER, name TEXT)")
+    conn.executemany("INSERT INTO users VALUES (?, ?)", [(i, f"user {i}") for i in range(20)])
+    yield conn
+    conn.close()
+
+
+def test_bucket():
+    assert [bucket(n) for n in (1, 2, 3, 4, 5, 8, 9, 1000)] == [1, 2, 4, 4, 8, 8, 16, 1024]
+
+
+def test_lists(conn):
+    statements = set()
+    conn.set_trace_callback(statements.add)
+    q = aiosql.from_str(SQL, "sqlite3")
+    assert list(q.get_users.__signature__.parameters) == ["self", "ids", "names"]
+    assert [r[0] for r in q.get_users(conn, ids=[1, 2, 3], names=["user 2"])] == [1, 3]
+    assert [r[0] for r in q.get_users(conn, ids=(4, 5, 6, 7), names=["none"])] == [4, 5, 6, 7]
+    # 3 and 4 values share the same statement, padded with the last value
+    assert q.variants["get_users"].cache_info().currsize == 1
+    assert any("id IN (1, 2, 3, 3)" in s for s in statements)
+    for n in range(1, 17):
+        assert q.count_users(conn, ids=list(range(n))) == n
+    assert q.variants["count_users"].cache_info().currsize == 5
+    with q.get_users_cursor(conn, ids=[5], names=["none"]) as cur:
+        assert cur.fetchall() == [(5,)]
+    with pytest.raises(ValueError, match="non empty list"):
+        q.count_users(conn, ids=[])
+    with pytest.raises(ValueError, match="non empty list"):
+        q.count_users(conn, ids=1)
+    with pytest.raises(ValueError, match="missing template parameter"):
+        q.count_users(conn)
+
+
+def test_lists_arrays():
+    assert bind_arrays("SELECT 1 WHERE x IN (:v*:l)") == "SELECT 1 WHERE x = ANY(:l)"
+    assert bind_arrays("SELECT 1 WHERE x not in ( :v*:l )") == "SELECT 1 WHERE x <> ALL(:l)"
+    assert bind_arrays("SELECT 'x IN (:v*:l)' WHERE x IN (:v*:l, 0)") == "SELECT 'x IN (:v*:l)' WHERE x IN (:v*:l, 0)"
+    q = aiosql.from_str(SQL, "psycopg")
+    assert q.get_users.sql == "SELECT id FROM users WHERE id = ANY(%(ids)s) AND name <> ALL(%(names)s) ORDER BY id;"
+    assert not q.variants
+    q = aiosql.from_str(SQL, "asyncpg")
+    assert q.count_users.sql == "SELECT COUNT(*) FROM users WHERE id = ANY($1);"
+    # other forms are expanded, with a variant name per list size for asyncpg parameter order
+    q = aiosql.from_str("-- name: get^\nSELECT :v*:l, :x;\n", "asyncpg")
+    variant = q.variants["get"]((2,))
+    assert variant.sql == "SELECT $1, $2, $3;" and variant.__name__ == "get[2]"
+    assert q.driver_adapter.var_sorted["get[2]"] == ["l__0", "l__1", "x"]
+
+
+def test_lists_errors():
+    with pytest.raises(SQLParseException, match="cannot use list parameters"):
+        aiosql.from_str("-- name: add*!\nINSERT INTO t VALUES (:v*:l);\n", "sqlite3")
+    with pytest.raises(SQLParseException, match="template and value"):
+        aiosql.from_str("-- name: get\nSELECT * FROM t WHERE a IN (:v*:l) OR a = :l;\n", "sqlite3")
@@ -330,3 +330,21 @@ def test_empty_query():
         pytest.fail("must raise an exception")
     except SQLParseException as e:
         assert "empty sql" in str(e)
+
+
+def test_pipeline_unsupported():
+    for driver in ("sqlite3", "pymysql", "mysql-connector", "pymssql"):
+        queries = aiosql.from_str("-- name: one$\nSELECT 1;\n", driver)
+        # not wrapped for pipelining
+        assert not hasattr(queries.driver_adapter, "pipeline")
+        try:
+            queries.pipeline(sqlite3.connect(":memory:"))
+            pytest.fail("must raise an exception")
+        except ValueError as e:
+            assert "pipeline" in str(e)
+    queries = aiosql.from_str("-- name: one$\nSELECT 1;\n", "psycopg")
+    try:
+        with queries.pipeline(sqlite3.connect(":memory:")):
+            pytest.fail("must raise an exception")  # pragma: no cover
+    except ValueError as e:
+        assert "psycopg 3" in str(e)
@@ -0,0 +1,46 @@
+import aiosql
+from aiosql.memory import query_sizes
+import pytest
+
+pytestmark = [
+    pytest.mark.sqlite3,
+]
+
+SQL = """
+-- name: get-user^
+-- Get a user by id.
+SELECT * FROM users WHERE id = :id;
+
+-- name: add-user<!
+INSERT INTO users(name) VALUES (:name);
+
+-- name: get-users
+SELECT * FROM users ORDER BY id;
+"""
+
+
+def test_query_sizes():
+    queries = aiosql.from_str(SQL, "sqlite3")
+    sizes = query_sizes(queries)
+    assert sorted(sizes) == sorted(queries.available_queries)
+    for size in sizes.values():
+        assert set(size) == {"sql", "doc", "signature", "function", "method", "total"}
+        assert size["total"] == sum(v for k, v in size.items() if k != "total")
+        assert size["function"] > 0 and size["method"] > 0
+    assert sizes["get_user"]["sql"] >= len(queries.get_user.sql)
+    assert sizes["get_user"]["doc"] > 0
+    # same sql string, counted once
+    assert sizes["get_users_cursor"]["sql"] == 0
+
+
+def test_query_sizes_wrappers():
+    plain = query_sizes(aiosql.from_str(SQL, "sqlite3"))
+    wrapped = query_sizes(aiosql.from_str(SQL, "sqlite3", metrics=True, hooks=[]))
+    assert wrapped["get_user"]["function"] > plain["get_user"]["function"]
+
+
+def test_query_sizes_namespaces(tmp_path):
+    (tmp_path / "users").mkdir()
+    (tmp_path / "users" / "users.sql").write_text(SQL)
+    sizes = query_sizes(aiosql.from_path(tmp_path, "sqlite3"))
+    assert "users.get_user" in sizes
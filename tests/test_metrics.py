@@ -0,0 +1,86 @@
+import sqlite3
+
+import aiosql
+from aiosql.metrics import QueryMetrics
+import pytest
+
+pytestmark = [
+    pytest.mark.sqlite3,
+]
+
+SQL = """
+-- name: create-schema#
+CREATE TABLE t(i INTEGER PRIMARY KEY);
+
+-- name: add!
+INSERT INTO t VALUES (:i);
+
+-- name: get-all
+SELECT i FROM t ORDER BY i;
+
+-- name: get-one^
+SELECT i FROM t WHERE i = :i;
+
+-- name: count$
+SELECT COUNT(*) FROM t;
+
+-- name: fail$
+SELECT COUNT(*) FROM nowhere;
+"""
+
+
+def test_metrics_sync():
+    queries = aiosql.from_str(SQL, "sqlite3", metrics=True)
+    conn = sqlite3.connect(":memory:")
+    queries.create_schema(conn)
+    for i in range(3):
+        queries.add(conn, i=i)
+    assert list(queries.get_all(conn)) == [(0,), (1,), (2,)]
+    assert queries.get_one(conn, i=1) == (1,)
+    assert queries.get_one(conn, i=5) is None
+    # partially consumed
+    assert next(iter(queries.get_all(conn))) == (0,)
+    with pytest.raises(sqlite3.OperationalError):
+        queries.fail(conn)
+    data = queries.metrics.as_dict()
+    assert data["add"]["calls"] == 3 and data["add"]["rows"] == 0
+    assert data["get_all"]["calls"] == 2 and data["get_all"]["rows"] == 4
+    assert data["get_all"]["first_row"]["count"] == 2
+    assert data["get_one"]["calls"] == 2 and data["get_one"]["rows"] == 1
+    assert data["get_one"]["first_row"] is None
+    assert data["fail"]["errors"] == 1
+    latency = data["get_one"]["latency"]
+    assert latency["count"] == 2 and 0 < latency["p50"] <= latency["p99"] <= latency["max"]
+    text = queries.metrics.prometheus()
+    assert 'aiosql_query_calls_total{query="add"} 3' in text
+    assert 'aiosql_query_duration_seconds_bucket{query="get_all",le="+Inf"} 2' in text
+    assert "# TYPE aiosql_query_first_row_seconds histogram" in text
+    queries.metrics.reset()
+    assert queries.metrics.as_dict() == {}
+    # disabled by default
+    assert aiosql.from_str(SQL, "sqlite3").metrics is None
+
+
+def test_metrics_quantiles():
+    metrics = QueryMetrics()
+    for i in range(100):
+        metrics.observe("q", 0.002 if i < 90 else 0.2, 1, False)
+    latency = metrics.as_dict()["q"]["latency"]
+    assert 0.001 <= latency["p50"] <= 0.0025
+    assert 0.1 <= latency["p95"] <= 0.2 and latency["max"] == 0.2
+
+
+@pytest.mark.asyncio
+async def test_metrics_async():
+    aiosqlite = pytest.importorskip("aiosqlite")
+    queries = aiosql.from_str(SQL, "aiosqlite", metrics=True)
+    async with aiosqlite.connect(":memory:") as conn:
+        await queries.create_schema(conn)
+        await queries.add(conn, i=1)
+        assert [r async for r in queries.get_all(conn)] == [(1,)]
+        assert await queries.count(conn) == 1
+        with pytest.raises(sqlite3.OperationalError):
+            await queries.fail(conn)
+    data = queries.metrics.as_dict()
+    assert data["get_all"]["rows"] == 1 and data["get_all"]["first_row"]["count"] == 1
+    assert data["count"]["rows"] == 1 and data["fail"]["errors"] == 1
@@ -0,0 +1,100 @@
+import sqlite3
+import inspect
+
+import aiosql
+from aiosql.utils import SQLParseException
+from aiosql.variants import optional_blocks, substitute_templates
+import pytest
+import pytest_asyncio
+
+pytestmark = [
+    pytest.mark.sqlite3,
+]
+
+SQL = """
+-- name: search-users
+SELECT id FROM users
+WHERE name <> :skip
+  [[AND name = :name]]
+  [[AND id IN (:v*:ids)]]
+  [[AND id BETWEEN :lo AND :hi]]
+ORDER BY id;
+
+-- name: count-users$
+SELECT COUNT(*) FROM users WHERE TRUE [[AND id < :below]] [[AND name <> ']]' || :suffix]];
+"""
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE users(id INTEGER, name TEXT)")
+    conn.executemany("INSERT INTO users VALUES (?, ?)", [(i, f"user {i}") for i in range(20)])
+    yield conn
+    conn.close()
+
+
+def test_optional_blocks():
+    assert optional_blocks("q", "SELECT 1") == ()
+    assert optional_blocks("q", SQL) == (("name",), ("ids",), ("lo", "hi"), ("below",), ("suffix",))
+    # parameters used outside blocks are not optional
+    assert optional_blocks("q", "SELECT :a [[AND x = :a AND y = :b]]") == (("b",),)
+    # markers in strings are ignored
+    assert optional_blocks("q", "SELECT '[[' [[AND x = ']]' || :b]]") == (("b",),)
+    sql = "SELECT 1 WHERE TRUE [[AND x = :x]] [[AND y = :y]]"
+    assert substitute_templates("q", sql, {}, (False, True)) == "SELECT 1 WHERE TRUE  AND y = :y"
+    with pytest.raises(SQLParseException, match="nested"):
+        optional_blocks("q", "SELECT 1 [[AND x = :x [[AND y = :y]]]]")
+    with pytest.raises(SQLParseException, match="unterminated"):
+        optional_blocks("q", "SELECT 1 [[AND x = :x")
+    with pytest.raises(SQLParseException, match="its own parameters"):
+        optional_blocks("q", "SELECT :x [[AND x = :x]]")
+
+
+def test_optional_queries(conn):
+    statements = []
+    conn.set_trace_callback(statements.append)
+    q = aiosql.from_str(SQL, "sqlite3")
+    assert str(inspect.signature(q.search_users)) == "(*, skip, name=None, ids=None, lo=None, hi=None)"
+    assert len(list(q.search_users(conn, skip=""))) == 20
+    assert statements[-1] == "SELECT id FROM users\nWHERE name <> ''\n  \n  \n  \nORDER BY id;"
+    assert list(q.search_users(conn, skip="", name="user 3")) == [(3,)]
+    assert list(q.search_users(conn, skip="user 2", ids=[1, 2, 3])) == [(1,), (3,)]
+    # a block is dropped if any of its parameters is None
+    assert len(list(q.search_users(conn, skip="", lo=5, hi=None))) == 20
+    assert list(q.search_users(conn, skip="", ids=[5, 6, 7], lo=6, hi=9)) == [(6,), (7,)]
+    assert "AND id IN (5, 6, 7, 7)\n  AND id BETWEEN 6 AND 9" in statements[-1]
+    # one variant per combination of kept blocks
+    assert q.variants["search_users"].cache_info().currsize == 4
+    assert len(list(q.search_users(conn, skip="", name="user 4"))) == 1
+    assert q.variants["search_users"].cache_info().currsize == 4
+    assert q.count_users(conn) == 20
+    assert q.count_users(conn, below=5) == 5
+    with q.search_users_cursor(conn, skip="", lo=1, hi=2) as cur:
+        assert cur.fetchall() == [(1,), (2,)]
+
+
+def test_optional_errors():
+    with pytest.raises(SQLParseException, match="optional blocks"):
+        aiosql.from_str("-- name: foo*!\nINSERT INTO t VALUES (:a [[, :b]]);\n", "sqlite3")
+    with pytest.raises(SQLParseException, match="attribute parameters"):
+        aiosql.from_str("-- name: foo\nSELECT * FROM t WHERE TRUE [[AND a = :u.a]];\n", "sqlite3")
+    with pytest.raises(SQLParseException, match="@pages"):
+        aiosql.from_str("-- name: foo\n-- @pages key=a\nSELECT * FROM t WHERE TRUE [[AND a = :a]];\n", "sqlite3")
+
+
+@pytest_asyncio.fixture
+async def aconn():
+    aiosqlite = pytest.importorskip("aiosqlite")
+    async with aiosqlite.connect(":memory:") as conn:
+        await conn.execute("CREATE TABLE users(id INTEGER, name TEXT)")
+        await conn.executemany("INSERT INTO users VALUES (?, ?)", [(i, f"user {i}") for i in range(20)])
+        yield conn
+
+
+@pytest.mark.asyncio
+async def test_optional_async(aconn):
+    q = aiosql.from_str(SQL, "aiosqlite")
+    assert [r async for r in q.search_users(aconn, skip="", name="user 3")] == [(3,)]
+    assert len([r async for r in q.search_users(aconn, skip="")]) == 20
+    assert await q.count_users(aconn, below=3) == 3
@@ -0,0 +1,139 @@
+import sqlite3
+import inspect
+from dataclasses import dataclass
+
+import aiosql
+from aiosql.utils import SQLParseException
+import pytest
+import pytest_asyncio
+
+pytestmark = [
+    pytest.mark.sqlite3,
+]
+
+
+@dataclass
+class Item:
+    id: int
+    s: str
+
+
+SQL = """
+-- name: get-items
+-- Items but skipped ones.
+-- @pages key=id
+SELECT id, s FROM items WHERE s <> :skip;
+
+-- name: get-items-by-s
+-- record_class: Item
+-- @pages key=s,id order=desc
+SELECT * FROM items;
+"""
+
+ITEMS = [(i, f"s{i % 3}") for i in range(1, 11)]
+
+
+def _fill(conn):
+    conn.execute("CREATE TABLE items(id INTEGER PRIMARY KEY, s TEXT)")
+    conn.executemany("INSERT INTO items VALUES (?, ?)", ITEMS)
+
+
+def test_pages():
+    conn = sqlite3.connect(":memory:")
+    _fill(conn)
+    statements = []
+    conn.set_trace_callback(statements.append)
+    q = aiosql.from_str(SQL, "sqlite3", record_classes={"Item": Item})
+    pages = list(q.get_items_pages(conn, skip="s0", page_size=3))
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert [row for page in pages for row in page] == [i for i in ITEMS if i[1] != "s0"]
+    # a short page is the last one, no query for an empty page
+    assert len(statements) == 3
+    assert "ORDER BY id" in statements[0] and "WHERE id > 4" in statements[1]
+    # full last page
+    pages = list(q.get_items_pages(conn, skip="s0", page_size=7))
+    assert [len(page) for page in pages] == [7]
+    assert list(q.get_items_pages(conn, skip="s0", page_size=100)) == [pages[0]]
+    # composite descending key and records
+    rows = [row for page in q.get_items_by_s_pages(conn, page_size=4) for row in page]
+    assert rows == [Item(i, s) for i, s in sorted(ITEMS, key=lambda i: (i[1], i[0]), reverse=True)]
+    assert "WHERE (s, id) < (" in statements[-1]
+    # documentation and signature
+    assert q.get_items_pages.__doc__ == "Items but skipped ones."
+    sig = inspect.signature(q.get_items_pages)
+    assert list(sig.parameters) == ["skip", "page_size", "prefetch"]
+    assert sig.parameters["page_size"].default == 100
+    assert "get_items_pages" in q.available_queries
+    with pytest.raises(ValueError, match="page_size"):
+        list(q.get_items_pages(conn, skip="s0", page_size=0))
+
+
+def test_pages_prefetch():
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    _fill(conn)
+    q = aiosql.from_str(SQL, "sqlite3", record_classes={"Item": Item})
+    pages = list(q.get_items_pages(conn, skip="", page_size=3, prefetch=True))
+    assert pages == [ITEMS[0:3], ITEMS[3:6], ITEMS[6:9], ITEMS[9:]]
+    # early exit with a pending page
+    for page in q.get_items_pages(conn, skip="", page_size=2, prefetch=True):
+        break
+    assert page == ITEMS[0:2]
+
+
+def test_pages_rows():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = lambda cur, row: {d[0]: v for d, v in zip(cur.description, row)}
+    _fill(conn)
+    q = aiosql.from_str(SQL, "sqlite3")
+    pages = list(q.get_items_pages(conn, skip="s0", page_size=5))
+    assert pages[0][0] == {"id": 1, "s": "s1"}
+    assert sum(map(len, pages)) == 7
+
+
+def test_pages_errors():
+    with pytest.raises(SQLParseException, match="requires a select"):
+        aiosql.from_str("-- name: foo!\n-- @pages key=id\nDELETE FROM items;\n", "sqlite3")
+    with pytest.raises(SQLParseException, match="requires a select"):
+        aiosql.from_str("-- name: foo\n-- @pages key=id\nSELECT * FROM :i:t;\n", "sqlite3")
+    with pytest.raises(SQLParseException, match="missing @pages key"):
+        aiosql.from_str("-- name: foo\n-- @pages order=asc\nSELECT * FROM items;\n", "sqlite3")
+    with pytest.raises(SQLParseException, match="invalid @pages key"):
+        aiosql.from_str("-- name: foo\n-- @pages key=id;--\nSELECT * FROM items;\n", "sqlite3")
+    with pytest.raises(SQLParseException, match="invalid @pages order"):
+        aiosql.from_str("-- name: foo\n-- @pages key=id order=up\nSELECT * FROM items;\n", "sqlite3")
+
+
+def test_pages_duckdb():
+    duckdb = pytest.importorskip("duckdb")
+    conn = duckdb.connect(":memory:")
+    conn.execute("CREATE TABLE items(id INTEGER PRIMARY KEY, s TEXT)")
+    conn.executemany("INSERT INTO items VALUES (?, ?)", ITEMS)
+    q = aiosql.from_str(SQL, "duckdb", record_classes={"Item": Item})
+    pages = list(q.get_items_pages(conn, skip="s0", page_size=3))
+    assert [row for page in pages for row in page] == [i for i in ITEMS if i[1] != "s0"]
+    rows = [row for page in q.get_items_by_s_pages(conn, page_size=4) for row in page]
+    assert rows[0] == Item(8, "s2") and len(rows) == 10
+    conn.close()
+
+
+@pytest_asyncio.fixture
+async def aconn():
+    aiosqlite = pytest.importorskip("aiosqlite")
+    async with aiosqlite.connect(":memory:") as conn:
+        await conn.execute("CREATE TABLE items(id INTEGER PRIMARY KEY, s TEXT)")
+        await conn.executemany("INSERT INTO items VALUES (?, ?)", ITEMS)
+        yield conn
+
+
+@pytest.mark.asyncio
+async def test_pages_async(aconn):
+    q = aiosql.from_str(SQL, "aiosqlite", record_classes={"Item": Item})
+    for prefetch in (False, True):
+        pages = [page async for page in q.get_items_pages(aconn, skip="", page_size=4, prefetch=prefetch)]
+        assert pages == [ITEMS[0:4], ITEMS[4:8], ITEMS[8:]]
+    rows = [row async for page in q.get_items_by_s_pages(aconn, page_size=3) for row in page]
+    assert rows[0] == Item(8, "s2") and rows[-1] == Item(3, "s0")
+    # early exit with a pending page
+    async for page in q.get_items_pages(aconn, skip="", page_size=2, prefetch=True):
+        break
+    assert page == ITEMS[0:2]
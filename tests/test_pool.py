@@ -0,0 +1,201 @@
+import sqlite3
+import threading
+import time
+
+import aiosql
+from aiosql.pool import ConnectionPool, PoolStats
+import pytest
+
+pytestmark = [
+    pytest.mark.sqlite3,
+]
+
+SQL = """
+-- name: create-table#
+CREATE TABLE IF NOT EXISTS item(id INTEGER PRIMARY KEY, name TEXT NOT NULL);
+
+-- name: add-item<!
+INSERT INTO item(name) VALUES (:name);
+
+-- name: add-items*!
+INSERT INTO item(name) VALUES (?);
+
+-- name: rename-item!
+UPDATE item SET name = :name WHERE id = :id;
+
+-- name: get-item^
+SELECT id, name FROM item WHERE id = :id;
+
+-- name: count-items$
+SELECT COUNT(*) FROM item;
+
+-- name: get-items
+SELECT id, name FROM item ORDER BY id;
+"""
+
+
+@pytest.fixture
+def pool(tmp_path):
+    dbpath = str(tmp_path / "pool.db")
+    with ConnectionPool(lambda: sqlite3.connect(dbpath, check_same_thread=False), max_size=2) as pool:
+        yield pool
+
+
+@pytest.fixture
+def queries():
+    return aiosql.from_str(SQL, "sqlite3", kwargs_only=False)
+
+
+def test_pool_queries(pool, queries):
+    assert queries.create_table(pool) == "DONE"
+    assert queries.add_item(pool, name="Calvin") == 1
+    assert queries.add_items(pool, [("Hobbes",), ("Susie",)]) == 2
+    assert queries.rename_item(pool, name="Rosalyn", id=3) == 1
+    assert queries.get_item(pool, id=3) == (3, "Rosalyn")
+    assert queries.count_items(pool) == 3
+    assert list(queries.get_items(pool)) == [(1, "Calvin"), (2, "Hobbes"), (3, "Rosalyn")]
+    with queries.get_items_cursor(pool) as cur:
+        assert len(cur.fetchall()) == 3
+    # everything was committed and released
+    stats = pool.stats()
+    assert stats["in_use"] == 0 and stats["size"] == 1
+    assert stats["acquired"] == 8 and stats["created"] == 1
+
+
+def test_pool_wrapped_queries(pool):
+    # profiled functions need actual connections, thus borrow before the profiler
+    queries = aiosql.from_str(SQL, "sqlite3", kwargs_only=False, profile=True)
+    queries.create_table(pool)
+    assert queries.add_item(pool, name="Calvin") == 1
+    assert queries.get_item(pool, id=1) == (1, "Calvin")
+    assert list(queries.get_items(pool)) == [(1, "Calvin")]
+    assert pool.stats()["in_use"] == 0
+
+
+def test_pool_select_holds_connection(pool, queries):
+    queries.create_table(pool)
+    queries.add_items(pool, [("Calvin",), ("Hobbes",)])
+    rows = queries.get_items(pool)
+    assert pool.stats()["in_use"] == 0  # not started yet
+    assert next(rows) == (1, "Calvin")
+    assert pool.stats()["in_use"] == 1
+    assert list(rows) == [(2, "Hobbes")]
+    assert pool.stats()["in_use"] == 0
+
+
+def test_pool_rollback(pool, queries):
+    queries.create_table(pool)
+    with pytest.raises(sqlite3.IntegrityError):
+        queries.add_items(pool, [("Calvin",), (None,)])
+    assert queries.count_items(pool) == 0
+    assert pool.stats()["in_use"] == 0
+
+
+def test_pool_timeout_and_wait(pool):
+    c1, c2 = pool.acquire(), pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.01)
+
+    def release():
+        time.sleep(0.05)
+        pool.release(c1)
+
+    thread = threading.Thread(target=release)
+    thread.start()
+    assert pool.acquire(timeout=5.0) is c1
+    thread.join()
+    pool.release(c1)
+    pool.release(c2)
+    stats = pool.stats()
+    assert stats["timeouts"] == 1 and stats["waits"] == 1
+    assert stats["max_wait"] >= 0.04
+
+
+def test_pool_thread_affinity(pool):
+    c1, c2 = pool.acquire(), pool.acquire()
+    pool.release(c1)
+    pool.release(c2)
+    # the last connection acquired by this thread was c2
+    assert pool.acquire() is c2
+    pool.release(c2)
+
+
+def test_pool_reaping(pool):
+    c1 = pool.acquire()
+    pool.release(c1)
+    assert pool.reap() == 0
+    pool.idle_timeout = 0.0
+    time.sleep(0.001)
+    assert pool.reap() == 1
+    stats = pool.stats()
+    assert stats["size"] == 0 and stats["reaped"] == 1
+    # the reaped connection is forgotten by this thread
+    assert pool._local.conn is None
+    c2 = pool.acquire()
+    assert c2 is not c1
+    pool.release(c2, discard=True)
+    assert pool._local.conn is None
+
+
+def test_pool_affinity_reaped_by_other_thread(pool):
+    pool.release(pool.acquire())
+    pool.idle_timeout = 0.0
+    time.sleep(0.001)
+    thread = threading.Thread(target=pool.reap)
+    thread.start()
+    thread.join()
+    # this thread still references the closed connection, which is not idle anymore
+    closed = pool._local.conn
+    assert closed is not None and pool.stats()["idle"] == 0
+    pool.idle_timeout = 600.0
+    conn = pool.acquire()
+    assert conn is not closed
+    pool.release(conn)
+
+
+def test_pool_threads(pool, queries):
+    queries.create_table(pool)
+    errors = []
+
+    def work(n):
+        try:
+            for i in range(10):
+                queries.add_item(pool, name=f"item {n}.{i}")
+        except Exception as e:  # pragma: no cover
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert queries.count_items(pool) == 40
+    assert pool.stats()["size"] <= 2
+
+
+def test_pool_stats_threads():
+    # counters of third-party pools are updated from query threads
+    stats = PoolStats(max_size=4)
+
+    def work():
+        for _ in range(10000):
+            stats.acquire(0.001)
+            stats.release()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    data = stats.as_dict()
+    assert data["acquired"] == 40000 and data["in_use"] == 0
+    assert 1 <= data["max_in_use"] <= 4
+
+
+def test_pool_closed(pool):
+    with pytest.raises(ValueError):
+        ConnectionPool(lambda: None, max_size=0)
+    pool.close()
+    with pytest.raises(ValueError):
+        pool.acquire()
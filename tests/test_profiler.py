@@ -0,0 +1,93 @@
+import sqlite3
+import time
+from dataclasses import dataclass
+
+import aiosql
+from aiosql.profiler import PHASES
+import pytest
+
+pytestmark = [
+    pytest.mark.sqlite3,
+]
+
+SQL = """
+-- name: create-schema#
+CREATE TABLE t(i INTEGER PRIMARY KEY, s TEXT);
+
+-- name: add!
+INSERT INTO t(s) VALUES (:s);
+
+-- name: get-all
+-- record_class: Item
+SELECT i, s FROM t ORDER BY i;
+
+-- name: get-one^
+SELECT i, s FROM t WHERE i = :i;
+
+-- name: count$
+SELECT COUNT(*) FROM t;
+"""
+
+
+@dataclass
+class Item:
+    i: int
+    s: str
+
+
+def test_profiler_sync():
+    queries = aiosql.from_str(SQL, "sqlite3", record_classes={"Item": Item}, profile=True)
+    conn = sqlite3.connect(":memory:")
+    queries.create_schema(conn)
+    for s in "abc":
+        queries.add(conn, s=s)
+    items = []
+    for item in queries.get_all(conn):
+        items.append(item)
+        # caller time is not counted
+        time.sleep(0.01)
+    assert items == [Item(1, "a"), Item(2, "b"), Item(3, "c")]
+    assert queries.get_one(conn, i=2) == (2, "b")
+    assert queries.count(conn) == 3
+    data = queries.profiler.as_dict()
+    assert data["add"]["calls"] == 3 and data["create_schema"]["calls"] == 1
+    get_all = data["get_all"]
+    assert set(get_all["phases"]) == set(PHASES) | {"other"}
+    assert get_all["total"] < 0.03
+    for phase in ("params", "cursor", "execute", "fetch", "convert", "cleanup"):
+        assert get_all["phases"][phase] > 0, phase
+    assert data["get_one"]["phases"]["convert"] == 0
+    assert 0 < get_all["overhead"] < 1
+    report = queries.profiler.report()
+    assert report.splitlines()[0].split()[:3] == ["query", "calls", "total"]
+    assert len(report.splitlines()) == 6
+    queries.profiler.reset()
+    assert queries.profiler.as_dict() == {}
+    assert aiosql.from_str(SQL, "sqlite3").profiler is None
+
+
+def test_profiler_partial():
+    queries = aiosql.from_str(SQL, "sqlite3", record_classes={"Item": Item}, profile=True)
+    conn = sqlite3.connect(":memory:")
+    queries.create_schema(conn)
+    queries.add(conn, s="a")
+    queries.add(conn, s="b")
+    rows = queries.get_all(conn)
+    assert next(rows) == Item(1, "a")
+    rows.close()
+    assert queries.profiler.as_dict()["get_all"]["phases"]["cleanup"] > 0
+
+
+@pytest.mark.asyncio
+async def test_profiler_async():
+    aiosqlite = pytest.importorskip("aiosqlite")
+    queries = aiosql.from_str(SQL, "aiosqlite", record_classes={"Item": Item}, profile=True)
+    async with aiosqlite.connect(":memory:") as conn:
+        await queries.create_schema(conn)
+        await queries.add(conn, s="a")
+        assert [r async for r in queries.get_all(conn)] == [Item(1, "a")]
+    data = queries.profiler.as_dict()
+    assert data["get_all"]["calls"] == 1
+    assert data["get_all"]["phases"]["params"] > 0 and data["get_all"]["phases"]["convert"] > 0
+    # database phases are not available
+    assert data["get_all"]["phases"]["execute"] == 0
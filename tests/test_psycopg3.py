@@ -55,6 +55,7 @@ from run_tests import (
     run_select_cursor_context_manager as test_select_cursor_context_manager,
     run_insert_returning as test_insert_returning,
     run_insert_many as test_insert_many,
+    run_pipeline as test_pipeline,
 )
 
 def test_version():
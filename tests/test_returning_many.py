@@ -0,0 +1,90 @@
+import sqlite3
+
+import aiosql
+from aiosql.utils import SQLParseException
+from aiosql.variants import row_chunks
+import pytest
+import pytest_asyncio
+
+pytestmark = [
+    pytest.mark.sqlite3,
+]
+
+SQL = """
+-- name: add-users*<!
+INSERT INTO users(name, age) VALUES (:name, :age) RETURNING id, name;
+
+-- name: add-names*<!
+INSERT INTO users(name) VALUES (lower(:name)) RETURNING id;
+"""
+
+SCHEMA = "CREATE TABLE users(id INTEGER PRIMARY KEY, name TEXT, age INTEGER)"
+
+
+def test_row_chunks():
+    assert row_chunks(0, 1) == []
+    assert row_chunks(13, 1) == [8, 4, 1]
+    assert row_chunks(2100, 1) == [512, 512, 512, 512, 32, 16, 4]
+    assert row_chunks(600, 3) == [256, 256, 64, 16, 8]
+
+
+def test_returning_many():
+    conn = sqlite3.connect(":memory:")
+    conn.execute(SCHEMA)
+    statements = []
+    conn.set_trace_callback(statements.append)
+    q = aiosql.from_str(SQL, "sqlite3")
+    rows = [{"name": f"user {i}", "age": i} for i in range(1000)]
+    assert sorted(q.add_users(conn, rows)) == [(i + 1, f"user {i}") for i in range(1000)]
+    inserts = [s for s in statements if s.startswith("INSERT")]
+    assert [s.count("), (") + 1 for s in inserts] == row_chunks(1000, 2) == [256, 256, 256, 128, 64, 32, 8]
+    # tuples in order of parameters, any iterable
+    assert sorted(q.add_names(conn, (n for n in [("A",), ("B",), ("C",)]))) == [1001, 1002, 1003]
+    assert conn.execute("SELECT name FROM users WHERE id > 1000 ORDER BY id").fetchall() == [("a",), ("b",), ("c",)]
+    assert q.add_names(conn, []) == []
+
+
+def test_returning_many_errors():
+    for sql in (
+        "INSERT INTO users(name) VALUES (:name)",
+        "INSERT INTO users(name) SELECT :name RETURNING id",
+        "INSERT INTO users(name) VALUES (:name), (:other) RETURNING id",
+        "INSERT INTO users(name) VALUES ('x') RETURNING id",
+        "INSERT INTO users(name, age) VALUES (:name, 1) RETURNING id + :offset",
+    ):
+        with pytest.raises(SQLParseException):
+            aiosql.from_str(f"-- name: foo*<!\n{sql};\n", "sqlite3")
+    with pytest.raises(SQLParseException, match="list"):
+        aiosql.from_str("-- name: foo*<!\nINSERT INTO t(a) VALUES (:v*:a) RETURNING id;\n", "sqlite3")
+
+
+def test_returning_many_metrics():
+    conn = sqlite3.connect(":memory:")
+    conn.execute(SCHEMA)
+    q = aiosql.from_str(SQL, "sqlite3", metrics=True)
+    q.add_names(conn, [{"name": "x"}, {"name": "y"}])
+    assert q.metrics.as_dict()["add_names"]["rows"] == 2
+
+
+def test_returning_many_duckdb():
+    duckdb = pytest.importorskip("duckdb")
+    conn = duckdb.connect(":memory:")
+    conn.execute("CREATE SEQUENCE ids; CREATE TABLE users(id INTEGER DEFAULT nextval('ids'), name TEXT, age INTEGER)")
+    q = aiosql.from_str(SQL, "duckdb")
+    assert sorted(q.add_names(conn, [(f"N{i}",) for i in range(100)])) == list(range(1, 101))
+    conn.close()
+
+
+@pytest_asyncio.fixture
+async def aconn():
+    aiosqlite = pytest.importorskip("aiosqlite")
+    async with aiosqlite.connect(":memory:") as conn:
+        await conn.execute(SCHEMA)
+        yield conn
+
+
+@pytest.mark.asyncio
+async def test_returning_many_async(aconn):
+    q = aiosql.from_str(SQL, "aiosqlite")
+    rows = [(f"user {i}", i) for i in range(300)]
+    assert sorted(await q.add_users(aconn, rows)) == [(i + 1, f"user {i}") for i in range(300)]
@@ -0,0 +1,135 @@
+import sqlite3
+import time
+
+import aiosql
+from aiosql.pool import ConnectionPool
+from aiosql.routing import ReplicaRouter
+import pytest
+
+pytestmark = [
+    pytest.mark.sqlite3,
+]
+
+SQL = """
+-- name: whoami$
+-- Tell which database answers.
+SELECT name FROM whoami;
+
+-- name: whoami-now$
+-- @route primary
+SELECT name FROM whoami;
+
+-- name: whoami-replica$
+-- @route replica
+SELECT name FROM whoami;
+
+-- name: all-names
+SELECT name FROM whoami;
+
+-- name: rename!
+UPDATE whoami SET name = :name;
+"""
+
+
+def _db(path, name):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.executescript(f"CREATE TABLE whoami(name TEXT); INSERT INTO whoami VALUES ('{name}');")
+    return conn
+
+
+@pytest.fixture
+def dbs(tmp_path):
+    conns = [_db(str(tmp_path / f"{n}.db"), n) for n in ("primary", "r1", "r2")]
+    yield conns
+    for c in conns:
+        c.close()
+
+
+@pytest.fixture
+def queries():
+    return aiosql.from_str(SQL, "sqlite3")
+
+
+def test_routing_round_robin(dbs, queries):
+    router = ReplicaRouter(dbs[0], dbs[1:])
+    assert [queries.whoami(router) for _ in range(4)] == ["r1", "r2", "r1", "r2"]
+    assert queries.whoami_now(router) == "primary"
+    assert queries.rename(router, name="main") == 1
+    assert queries.whoami_now(router) == "main"
+    assert [r[0] for r in queries.all_names(router)] == ["r1"]
+    with queries.all_names_cursor(router) as cur:
+        assert cur.fetchall() == [("r2",)]
+    assert router.stats() == {"primary": 3, "sticky": 0, "replicas": [3, 3], "in_progress": [0, 0]}
+    # directives do not appear in the documentation
+    assert queries.whoami.__doc__ == "Tell which database answers."
+    assert queries.whoami_now.__doc__ == ""
+
+
+def test_routing_least_loaded(dbs, queries):
+    router = ReplicaRouter(dbs[0], dbs[1:], strategy="least-loaded")
+    rows = queries.all_names(router)
+    assert next(rows) == ("r1",)  # r1 is busy while iterating
+    assert router.stats()["in_progress"] == [1, 0]
+    assert queries.whoami(router) == "r2"
+    assert queries.whoami(router) == "r2"
+    assert list(rows) == []
+    assert router.stats()["in_progress"] == [0, 0]
+    with pytest.raises(ValueError):
+        ReplicaRouter(dbs[0], strategy="random")
+
+
+def test_routing_read_your_writes(dbs, queries):
+    router = ReplicaRouter(dbs[0], dbs[1:], read_your_writes=0.05)
+    assert queries.whoami(router) == "r1"
+    queries.rename(router, name="main")
+    assert queries.whoami(router) == "main"
+    assert queries.whoami_replica(router) == "r2"
+    time.sleep(0.06)
+    assert queries.whoami(router) == "r1"
+    assert router.stats()["sticky"] == 1
+    # no replicas
+    assert queries.whoami(ReplicaRouter(dbs[0])) == "main"
+    # writes are tracked per router
+    other = ReplicaRouter(dbs[0], dbs[1:], read_your_writes=0.05)
+    queries.rename(router, name="again")
+    assert queries.whoami(router) == "again"
+    assert queries.whoami(other) == "r1"
+
+
+def test_routing_pools(tmp_path, queries):
+    paths = [str(tmp_path / f"{n}.db") for n in ("primary", "replica")]
+    for path, name in zip(paths, ("primary", "replica")):
+        _db(path, name).close()
+    with ConnectionPool(lambda: sqlite3.connect(paths[0], check_same_thread=False)) as primary, \
+         ConnectionPool(lambda: sqlite3.connect(paths[1], check_same_thread=False)) as replica:
+        router = ReplicaRouter(primary, [replica])
+        assert queries.rename(router, name="main") == 1  # committed by the pool
+        assert queries.whoami(router) == "replica"
+        assert queries.whoami_now(router) == "main"
+        assert list(queries.all_names(router)) == [("replica",)]
+        assert replica.stats()["acquired"] == 2 and primary.stats()["acquired"] == 2
+
+
+def test_routing_bad_directive():
+    with pytest.raises(aiosql.SQLParseException):
+        aiosql.from_str("-- name: foo$\n-- @route elsewhere\nSELECT 1;\n", "sqlite3")
+    with pytest.raises(aiosql.SQLLoadException, match="write query to a replica"):
+        aiosql.from_str("-- name: foo!\n-- @route replica\nDELETE FROM t;\n", "sqlite3")
+
+
+@pytest.mark.asyncio
+async def test_routing_async(tmp_path):
+    aiosqlite = pytest.importorskip("aiosqlite")
+    paths = [str(tmp_path / f"{n}.db") for n in ("primary", "replica")]
+    for path, name in zip(paths, ("primary", "replica")):
+        _db(path, name).close()
+    queries = aiosql.from_str(SQL, "aiosqlite")
+    async with aiosqlite.connect(paths[0]) as primary, aiosqlite.connect(paths[1]) as replica:
+        router = ReplicaRouter(primary, [replica], read_your_writes=10.0)
+        assert await queries.whoami(router) == "replica"
+        assert [r[0] async for r in queries.all_names(router)] == ["replica"]
+        async with queries.all_names_cursor(router) as cur:
+            assert await cur.fetchall() == [("replica",)]
+        assert await queries.rename(router, name="main") == 1
+        assert await queries.whoami(router) == "main"
+        assert router.stats() == {"primary": 2, "sticky": 1, "replicas": [3], "in_progress": [0]}
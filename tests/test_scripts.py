@@ -0,0 +1,143 @@
+import sqlite3
+import logging
+
+import aiosql
+from aiosql.scripts import StatementSplitter, script_statements
+from aiosql.utils import SQLLoadException, SQLParseException
+import pytest
+import pytest_asyncio
+
+pytestmark = [
+    pytest.mark.sqlite3,
+]
+
+SCRIPT = """
+-- a script; with comments
+CREATE TABLE users(id INTEGER PRIMARY KEY, name TEXT, "odd;name" TEXT);
+/* block; comment */
+INSERT INTO users(name) VALUES ('it''s; fine');
+CREATE TABLE log(msg TEXT);
+CREATE TRIGGER users_log AFTER INSERT ON users BEGIN
+  INSERT INTO log VALUES ('added; ' || new.name);
+  INSERT INTO log VALUES ('end');
+END;
+;
+INSERT INTO users(name) VALUES ('x'), ('y')
+"""
+
+STATEMENTS = [
+    "-- a script; with comments\nCREATE TABLE users(id INTEGER PRIMARY KEY, name TEXT, \"odd;name\" TEXT)",
+    "/* block; comment */\nINSERT INTO users(name) VALUES ('it''s; fine')",
+    "CREATE TABLE log(msg TEXT)",
+    "CREATE TRIGGER users_log AFTER INSERT ON users BEGIN\n"
+    "  INSERT INTO log VALUES ('added; ' || new.name);\n"
+    "  INSERT INTO log VALUES ('end');\nEND",
+    "INSERT INTO users(name) VALUES ('x'), ('y')",
+]
+
+
+def split(script, size, backslash_escapes=False):
+    splitter = StatementSplitter(backslash_escapes)
+    statements = []
+    for i in range(0, len(script), size):
+        statements += splitter.feed(script[i:i + size])
+    return statements + splitter.close()
+
+
+def test_splitter():
+    # same statements whatever the chunk boundaries
+    for size in (1, 2, 3, 7, 64, 10000):
+        assert split(SCRIPT, size) == STATEMENTS
+    pg = ("SELECT $$a;b$$; CREATE FUNCTION f() RETURNS INT AS $body$ SELECT 1; $body$ LANGUAGE SQL;"
+          " SELECT a$b$c;")
+    for size in (1, 5, 1000):
+        assert split(pg, size) == [
+            "SELECT $$a;b$$",
+            "CREATE FUNCTION f() RETURNS INT AS $body$ SELECT 1; $body$ LANGUAGE SQL",
+            "SELECT a$b$c",
+        ]
+        assert split(r"SELECT E'\';'; SELECT '\'; SELECT 1;", size) == [
+            r"SELECT E'\';'", r"SELECT '\'", "SELECT 1"
+        ]
+        assert split(r"INSERT INTO t VALUES ('O\'Reilly; \\'); SELECT `a;b`;", size, True) == [
+            r"INSERT INTO t VALUES ('O\'Reilly; \\')",
+            "SELECT `a;b`",
+        ]
+    # triggers without a body end at the first semicolon
+    assert split("CREATE TRIGGER t AFTER INSERT ON u EXECUTE FUNCTION f(); SELECT 1;", 4) == [
+        "CREATE TRIGGER t AFTER INSERT ON u EXECUTE FUNCTION f()",
+        "SELECT 1",
+    ]
+    assert split("-- only comments;\n/* here */ ;", 3) == []
+    with pytest.raises(SQLParseException, match="unterminated '"):
+        split("SELECT 'oops;", 4)
+    with pytest.raises(SQLParseException, match=r"unterminated \$x\$"):
+        split("SELECT $x$ oops;", 4)
+
+
+def test_script_statements(tmp_path):
+    path = tmp_path / "script.sql"
+    path.write_text(SCRIPT.replace("fine", "fine é"), encoding="utf-8")
+    positions, statements = zip(*script_statements(path, chunk_size=10))
+    assert statements[1].endswith("('it''s; fine é')")
+    assert list(positions) == sorted(positions) and positions[-1] == path.stat().st_size
+
+
+def test_run_script(tmp_path, caplog):
+    path = tmp_path / "script.sql"
+    inserts = "".join(f"INSERT INTO users(name) VALUES ('u{i}');\n" for i in range(250))
+    path.write_text(SCRIPT + ";\n" + inserts)
+    conn = sqlite3.connect(":memory:")
+    statements, reports = [], []
+    conn.set_trace_callback(statements.append)
+    with caplog.at_level(logging.INFO, logger="aiosql"):
+        done = aiosql.run_script(path, "sqlite3", conn, batch=100, progress=reports.append)
+    assert done.statements == 255 and done.fraction == 1.0
+    assert f"script {path}: 255 statements" in caplog.text
+    assert [r.statements for r in reports] == [100, 200, 255]
+    assert reports[0].position <= reports[1].position <= reports[2].position == path.stat().st_size
+    assert statements.count("COMMIT") == 3 and not conn.in_transaction
+    assert conn.execute("SELECT COUNT(*) FROM users").fetchone() == (253,)
+    assert conn.execute("SELECT COUNT(*) FROM log").fetchone() == (504,)
+    # adapter instance, no commits
+    conn = sqlite3.connect(":memory:")
+    q = aiosql.from_str("-- name: count-users$\nSELECT COUNT(*) FROM users;\n", "sqlite3")
+    reports.clear()
+    aiosql.run_script(path, q.driver_adapter, conn, progress=reports.append, progress_every=50)
+    assert [r.statements for r in reports] == [50, 100, 150, 200, 250, 255]
+    assert conn.in_transaction
+    assert q.count_users(conn) == 253
+
+
+def test_run_script_apsw(tmp_path):
+    apsw = pytest.importorskip("apsw")
+    from aiosql.adapters.generic import GenericAdapter
+    path = tmp_path / "script.sql"
+    path.write_text(SCRIPT)
+    conn = apsw.Connection(":memory:")
+    # an adapter class, and no commit in autocommit mode
+    assert aiosql.run_script(path, GenericAdapter, conn, batch=2).statements == 5
+    assert list(conn.execute("SELECT COUNT(*) FROM log")) == [(4,)]
+    conn.close()
+
+
+def test_run_script_errors(tmp_path):
+    with pytest.raises(SQLLoadException):
+        aiosql.run_script(tmp_path / "missing.sql", "sqlite3", None)
+    path = tmp_path / "script.sql"
+    path.write_text("SELECT 1;")
+    with pytest.raises(ValueError):
+        aiosql.run_script(path, "sqlite3", None, batch=-1)
+
+
+@pytest.mark.asyncio
+async def test_run_script_async(tmp_path):
+    aiosqlite = pytest.importorskip("aiosqlite")
+    path = tmp_path / "script.sql"
+    path.write_text(SCRIPT)
+    async with aiosqlite.connect(":memory:") as conn:
+        done = await aiosql.run_script(path, "aiosqlite", conn, batch=2)
+        assert done.statements == 5
+        assert not conn.in_transaction
+        async with conn.execute("SELECT COUNT(*) FROM log") as cur:
+            assert await cur.fetchone() == (4,)
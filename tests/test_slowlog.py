@@ -0,0 +1,120 @@
+import logging
+import sqlite3
+import time
+
+import aiosql
+from aiosql.slowlog import SlowQueryLog, REDACTED
+import pytest
+
+pytestmark = [
+    pytest.mark.sqlite3,
+]
+
+SQL = """
+-- name: create-schema#
+CREATE TABLE users(id INTEGER PRIMARY KEY, name TEXT, password TEXT);
+
+-- name: add-user!
+INSERT INTO users(name, password) VALUES (:name, :password);
+
+-- name: find-user^
+SELECT id FROM users WHERE name = :name AND slow(:delay);
+
+-- name: find-users
+SELECT id FROM users WHERE slow(:delay);
+
+-- name: quick-user^
+-- @slow threshold=10
+SELECT id FROM users WHERE name = :name AND slow(:delay);
+
+-- name: watched-user$
+-- @slow threshold=0.01 explain=no
+SELECT id FROM users WHERE slow(:delay);
+"""
+
+
+def _slow(delay):
+    if delay == "fail":
+        time.sleep(0.03)
+        raise ValueError(delay)
+    time.sleep(delay)
+    return True
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.create_function("slow", 1, _slow)
+    yield conn
+    conn.close()
+
+
+def test_slowlog_explain(conn, caplog):
+    slow_log = SlowQueryLog(0.02, explain=True, explain_interval=60)
+    queries = aiosql.from_str(SQL, "sqlite3", slow_query=slow_log)
+    queries.create_schema(conn)
+    queries.add_user(conn, name="calvin", password="hobbes")
+    assert not slow_log.entries
+    with caplog.at_level(logging.WARNING, logger="aiosql"):
+        assert queries.find_user(conn, name="calvin", delay=0.0) == (1,)
+        assert queries.find_user(conn, name="calvin", delay=0.03) == (1,)
+        assert queries.find_user(conn, name="calvin", delay=0.03) == (1,)
+    assert len(slow_log.entries) == 2
+    first, second = slow_log.entries
+    assert first.query_name == "find_user" and first.duration >= 0.03 and first.line == 8
+    assert first.parameters == {"name": "calvin", "delay": 0.03}
+    # EXPLAIN QUERY PLAN output, captured once per interval
+    assert first.plan and any("SCAN" in str(row) for row in first.plan)
+    assert second.plan is None
+    assert "slow query find_user at <unknown>:8" in caplog.text
+    # select generators are timed until exhausted
+    assert list(queries.find_users(conn, delay=0.03)) == [(1,)]
+    assert slow_log.entries[-1].query_name == "find_users"
+    # time spent by the caller between rows is not counted
+    count = len(slow_log.entries)
+    for _ in queries.find_users(conn, delay=0.0):
+        time.sleep(0.03)
+    assert len(slow_log.entries) == count
+    # failed calls are logged, without a plan
+    with pytest.raises(sqlite3.OperationalError):
+        queries.find_user(conn, name="calvin", delay="fail")
+    with pytest.raises(sqlite3.OperationalError):
+        list(queries.find_users(conn, delay="fail"))
+    assert [(e.query_name, e.plan) for e in list(slow_log.entries)[count:]] == [("find_user", None), ("find_users", None)]
+
+
+def test_slowlog_directives(conn):
+    queries = aiosql.from_str(SQL, "sqlite3")
+    # created for directives, without global threshold
+    assert queries.slow_log is not None and queries.slow_log.threshold is None
+    queries.create_schema(conn)
+    queries.add_user(conn, name="susie", password="x")
+    assert queries.quick_user(conn, name="susie", delay=0.02) == (1,)
+    assert queries.watched_user(conn, delay=0.02) == 1
+    assert [e.query_name for e in queries.slow_log.entries] == ["watched_user"]
+    assert queries.slow_log.entries[0].plan is None
+    with pytest.raises(aiosql.SQLParseException):
+        aiosql.from_str("-- name: foo$\n-- @slow threshold=soon\nSELECT 1;\n", "sqlite3")
+    with pytest.raises(aiosql.SQLParseException):
+        aiosql.from_str("-- name: foo$\n-- @slow explain=maybe\nSELECT 1;\n", "sqlite3")
+    assert aiosql.from_str("-- name: foo$\nSELECT 1;\n", "sqlite3").slow_log is None
+
+
+def test_slowlog_redaction():
+    slow_log = SlowQueryLog(max_length=4, redact=("pass",))
+    assert slow_log.parameters((), {"password": "x", "name": "calvin"}) == {"password": REDACTED, "name": "calv..."}
+    assert slow_log.parameters((1, "hobbes"), {}) == (1, "hobb...")
+
+
+@pytest.mark.asyncio
+async def test_slowlog_async():
+    aiosqlite = pytest.importorskip("aiosqlite")
+    queries = aiosql.from_str(SQL, "aiosqlite", slow_query=SlowQueryLog(0.02, explain=True))
+    async with aiosqlite.connect(":memory:") as conn:
+        await conn.create_function("slow", 1, _slow)
+        await queries.create_schema(conn)
+        await queries.add_user(conn, name="calvin", password="hobbes")
+        assert await queries.find_user(conn, name="calvin", delay=0.03) == (1,)
+        assert [r async for r in queries.find_users(conn, delay=0.03)] == [(1,)]
+    entries = [e for e in queries.slow_log.entries if e.query_name.startswith("find")]
+    assert len(entries) == 2 and all(e.plan for e in entries)
@@ -0,0 +1,114 @@
+import sqlite3
+
+import aiosql
+from aiosql.utils import SQLParseException
+import pytest
+import pytest_asyncio
+
+pytestmark = [
+    pytest.mark.sqlite3,
+]
+
+SQL = """
+-- name: get-users
+-- @temp threshold=10
+SELECT id FROM users WHERE id IN (:v*:ids) AND id NOT IN (:v*:skip) ORDER BY id;
+
+-- name: count-users$
+-- @temp threshold=10 type=INTEGER
+SELECT COUNT(*) FROM users WHERE id IN (:v*:ids);
+"""
+
+
+def _fill(conn):
+    conn.execute("CREATE TABLE users(id INTEGER)")
+    conn.executemany("INSERT INTO users VALUES (?)", [(i,) for i in range(1000)])
+
+
+@pytest.mark.parametrize("isolation_level", ["", None])
+def test_temp_lists(isolation_level):
+    conn = sqlite3.connect(":memory:", isolation_level=isolation_level)
+    _fill(conn)
+    statements = []
+    conn.set_trace_callback(statements.append)
+    q = aiosql.from_str(SQL, "sqlite3")
+    assert q.count_users(conn, ids=list(range(0, 1000, 2))) == 500
+    assert "CREATE TEMPORARY TABLE IF NOT EXISTS _aiosql_ids(value INTEGER)" in statements
+    assert sum(s.startswith("INSERT INTO _aiosql_ids") for s in statements) == 500
+    # reused and emptied
+    assert q.count_users(conn, ids=list(range(100))) == 100
+    assert statements.count("DELETE FROM _aiosql_ids") == 2
+    # small lists are expanded
+    statements.clear()
+    assert q.count_users(conn, ids=[1, 2, 3]) == 3
+    assert not any("_aiosql_ids" in s for s in statements)
+    # loaded when the generator starts
+    users = q.get_users(conn, ids=list(range(20)), skip=[0, 1])
+    assert q.count_users(conn, ids=list(range(50))) == 50
+    assert [r[0] for r in users] == list(range(2, 20))
+    with q.get_users_cursor(conn, ids=list(range(20)), skip=[0]) as cur:
+        assert len(cur.fetchall()) == 19
+    assert q.variants["count_users"].cache_info().currsize == 2
+    if isolation_level is None:
+        assert not conn.in_transaction
+    conn.close()
+
+
+def test_temp_lists_duckdb():
+    duckdb = pytest.importorskip("duckdb")
+    conn = duckdb.connect(":memory:")
+    conn.execute("CREATE TABLE users AS SELECT range AS id FROM range(1000)")
+    q = aiosql.from_str(SQL, "duckdb")
+    assert q.count_users(conn, ids=list(range(0, 1000, 2))) == 500
+    assert q.count_users(conn, ids=list(range(100))) == 100
+    assert [r[0] for r in q.get_users(conn, ids=list(range(20)), skip=[0])] == list(range(1, 20))
+    # both lists on the cursor of the query
+    assert [r[0] for r in q.get_users(conn, ids=list(range(30)), skip=list(range(25)))] == list(range(25, 30))
+    # tables are scoped to the call, and not left in the schema
+    assert conn.execute("SELECT COUNT(*) FROM duckdb_tables() WHERE table_name LIKE '_aiosql%'").fetchone() == (0,)
+    # without cursors, tables are replaced on the connection
+    q = aiosql.from_str(SQL, "duckdb", kwargs={"use_cursor": False})
+    assert len(list(q.get_users(conn, ids=list(range(0, 1000, 4)), skip=[1]))) == 250
+    assert len(list(q.get_users(conn, ids=list(range(10)), skip=[1]))) == 9
+    conn.close()
+
+
+def test_temp_lists_postgres():
+    q = aiosql.from_str(SQL, "psycopg")
+    variants = q.variants["get_users"]
+    assert variants.refs == {"ids": "a*", "skip": "a*"}
+    assert variants(("temp", "array")).sql == (
+        "SELECT id FROM users WHERE id IN (SELECT value FROM _aiosql_ids) AND id <> ALL(%(skip)s) ORDER BY id;"
+    )
+    assert variants(("array", "temp")).sql == (
+        "SELECT id FROM users WHERE id = ANY(%(ids)s) AND id NOT IN (SELECT value FROM _aiosql_skip) ORDER BY id;"
+    )
+
+
+def test_temp_lists_errors():
+    with pytest.raises(SQLParseException, match="@temp requires"):
+        aiosql.from_str("-- name: q\n-- @temp\nSELECT * FROM t WHERE a = :a;\n", "sqlite3")
+    with pytest.raises(SQLParseException, match="@temp requires"):
+        aiosql.from_str("-- name: q\n-- @temp\nSELECT * FROM t WHERE a IN (:v*:l) OR b = (:v*:l);\n", "sqlite3")
+    with pytest.raises(SQLParseException, match="invalid @temp argument"):
+        aiosql.from_str("-- name: q\n-- @temp type=INT;DROP\nSELECT * FROM t WHERE a IN (:v*:l);\n", "sqlite3")
+    with pytest.raises(SQLParseException, match="invalid @temp argument"):
+        aiosql.from_str("-- name: q\n-- @temp threshold=many\nSELECT * FROM t WHERE a IN (:v*:l);\n", "sqlite3")
+
+
+@pytest_asyncio.fixture
+async def aconn():
+    aiosqlite = pytest.importorskip("aiosqlite")
+    async with aiosqlite.connect(":memory:") as conn:
+        await conn.execute("CREATE TABLE users(id INTEGER)")
+        await conn.executemany("INSERT INTO users VALUES (?)", [(i,) for i in range(1000)])
+        yield conn
+
+
+@pytest.mark.asyncio
+async def test_temp_lists_async(aconn):
+    q = aiosql.from_str(SQL, "aiosqlite")
+    assert await q.count_users(aconn, ids=list(range(300))) == 300
+    assert await q.count_users(aconn, ids=[1, 2]) == 2
+    users = [r[0] async for r in q.get_users(aconn, ids=list(range(20)), skip=[0])]
+    assert users == list(range(1, 20))
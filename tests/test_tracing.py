@@ -0,0 +1,82 @@
+import sqlite3
+
+import aiosql
+from aiosql.tracing import InMemoryExporter
+from aiosql.types import SQLOperationType
+import pytest
+
+pytestmark = [
+    pytest.mark.sqlite3,
+]
+
+SQL = """
+-- name: create-schema#
+CREATE TABLE t(i INTEGER PRIMARY KEY);
+
+-- name: add!
+INSERT INTO t VALUES (:i);
+
+-- name: get-all
+SELECT i FROM t ORDER BY i;
+
+-- name: get-one^
+SELECT i FROM t WHERE i = :i;
+
+-- name: fail$
+SELECT COUNT(*) FROM nowhere;
+"""
+
+
+def test_tracing_sync():
+    exporter = InMemoryExporter()
+    queries = aiosql.from_str(SQL, "sqlite3", hooks=[exporter])
+    conn = sqlite3.connect(":memory:")
+    queries.create_schema(conn)
+    queries.add(conn, i=1)
+    queries.add(conn, i=2)
+    for (i,) in queries.get_all(conn):
+        assert queries.get_one(conn, i=i) == (i,)
+    with pytest.raises(sqlite3.OperationalError):
+        queries.fail(conn)
+    names = [s.event.query_name for s in exporter.spans]
+    assert names == ["create_schema", "add", "add", "get_one", "get_one", "get_all", "fail"]
+    add, get_one, get_all, fail = exporter.spans[1], exporter.spans[3], exporter.spans[5], exporter.spans[6]
+    assert add.event.operation == SQLOperationType.INSERT_UPDATE_DELETE
+    assert add.event.sql.startswith("INSERT") and add.event.param_count == 1
+    assert add.event.line == 5 and add.event.file == "<unknown>"
+    # nested spans
+    assert get_one.parent is get_all and get_all.parent is None
+    assert get_all.first_row is not None and get_one.first_row is None
+    assert isinstance(fail.error, sqlite3.OperationalError) and fail.duration > 0
+    exporter.clear()
+    assert exporter.spans == []
+
+
+def test_tracing_registration():
+    queries = aiosql.from_str(SQL, "sqlite3", hooks=[])
+    conn = sqlite3.connect(":memory:")
+    queries.create_schema(conn)
+    exporter = InMemoryExporter()
+    queries.hooks.append(exporter)
+    queries.add(conn, i=1)
+    assert len(exporter.spans) == 1
+    # not instrumented by default
+    assert aiosql.from_str(SQL, "sqlite3").hooks is None
+
+
+@pytest.mark.asyncio
+async def test_tracing_async():
+    aiosqlite = pytest.importorskip("aiosqlite")
+    exporter = InMemoryExporter()
+    queries = aiosql.from_str(SQL, "aiosqlite", hooks=[exporter])
+    async with aiosqlite.connect(":memory:") as conn:
+        await queries.create_schema(conn)
+        await queries.add(conn, i=1)
+        async for (i,) in queries.get_all(conn):
+            assert await queries.get_one(conn, i=i) == (i,)
+        with pytest.raises(sqlite3.OperationalError):
+            await queries.fail(conn)
+    names = [s.event.query_name for s in exporter.spans]
+    assert names == ["create_schema", "add", "get_one", "get_all", "fail"]
+    assert exporter.spans[2].parent is exporter.spans[3]
+    assert exporter.spans[4].error is not None